@@ -1,7 +1,7 @@
 import { useEffect, useRef } from 'react';
 import { ChatMessage } from './ChatMessage';
 
-export function ChatHistory({ history, isLoading }) {
+export function ChatHistory({ history, isLoading, onReplay }) {
     const endOfMessagesRef = useRef(null);
 
     useEffect(() => {
@@ -11,7 +11,7 @@ export function ChatHistory({ history, isLoading }) {
     return (
         <div className="flex-1 overflow-y-auto pr-2 space-y-4 flex flex-col">
             {history.map((msg, index) => (
-                <ChatMessage key={index} message={msg} />
+                <ChatMessage key={index} message={msg} onReplay={onReplay} />
             ))}
             {isLoading && <ChatMessage message={{ role: 'assistant' }} isLoading={true} />}
             <div ref={endOfMessagesRef} />
@@ -1,5 +1,6 @@
 import { marked } from 'marked';
 import { motion } from 'framer-motion';
+import { Volume2 } from 'lucide-react';
 
 const Loader = () => (
     <div className="loader">
@@ -9,7 +10,7 @@ const Loader = () => (
     </div>
 );
 
-export function ChatMessage({ message, isLoading }) {
+export function ChatMessage({ message, isLoading, onReplay }) {
     const isAgent = message.role === 'assistant';
 
     const renderContent = () => {
@@ -29,7 +30,16 @@ export function ChatMessage({ message, isLoading }) {
             transition={{ duration: 0.3 }}
             className={`max-w-xs sm:max-w-md text-sm rounded-lg p-3 break-words ${isAgent ? 'bg-gray-200 self-start' : 'bg-gray-800 text-white self-end'}`}
         >
-            {isAgent && !isLoading && <p className="font-semibold text-gray-800 mb-1">Agent</p>}
+            {isAgent && !isLoading && (
+                <p className="font-semibold text-gray-800 mb-1">
+                    Agent
+                    {message.audio?.length > 0 && onReplay && (
+                        <button onClick={() => onReplay(message.audio)} className="ml-2 align-middle text-indigo-600" aria-label="Replay message">
+                            <Volume2 size={14} />
+                        </button>
+                    )}
+                </p>
+            )}
             {renderContent()}
         </motion.div>
     );
@@ -1,7 +1,8 @@
 import { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
+import { Volume2 } from 'lucide-react';
 
-export function DealCard({ deal }) {
+export function DealCard({ deal, onPlayAudio }) {
     const [timeLeft, setTimeLeft] = useState(300); // 5 minutes in seconds
 
     useEffect(() => {
@@ -34,7 +35,14 @@ export function DealCard({ deal }) {
             className="border border-gray-200 p-4 rounded-lg shadow-md bg-gradient-to-br from-gray-50 to-gray-100"
         >
             <div className="flex justify-between items-start">
-                <h3 className="font-bold text-lg text-gray-800">{deal.heading}</h3>
+                <h3 className="font-bold text-lg text-gray-800">
+                    {deal.heading}
+                    {deal.audio_url && onPlayAudio && (
+                        <button onClick={() => onPlayAudio(deal.audio_url)} className="ml-2 align-middle text-indigo-600" aria-label="Play deal">
+                            <Volume2 size={18} />
+                        </button>
+                    )}
+                </h3>
                 <div className={`text-sm font-medium px-2 py-1 rounded-md ${isExpired ? 'bg-gray-200 text-gray-600' : 'bg-red-100 text-red-700'}`}>
                     {isExpired ? 'Expired' : formatTime(timeLeft)}
                 </div>
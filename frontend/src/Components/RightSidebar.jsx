@@ -21,7 +21,7 @@ const LANGUAGE_OPTIONS = [
   { code: 'ar-SA', name: 'Arabic', voiceId: 'ar-SA-hamed' },
 ];
 
-export function RightSidebar({ history, onSendMessage, isLoading, isSpeaking, onStopSpeech, isMobileView = false }) {
+export function RightSidebar({ history, onSendMessage, isLoading, isSpeaking, onStopSpeech, onReplay, isMobileView = false }) {
   const [selectedLanguage, setSelectedLanguage] = useState('en-US');
 
   const handleSendMessage = (message) => {
@@ -41,7 +41,7 @@ export function RightSidebar({ history, onSendMessage, isLoading, isSpeaking, on
         />
       </div>
 
-      <ChatHistory history={history} isLoading={isLoading} />
+      <ChatHistory history={history} isLoading={isLoading} onReplay={onReplay} />
 
       <div>
         {isSpeaking && (
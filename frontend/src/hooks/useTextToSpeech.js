@@ -8,6 +8,8 @@ function tryResumeAudioContext() {
 export function useTextToSpeech() {
   const [isSpeaking, setIsSpeaking] = useState(false);
   const audioRef = useRef(null);
+  // Sentence clips from /chat/stream waiting for the current one to finish
+  const queueRef = useRef([]);
   // State to hold audio that was blocked by autoplay policy
   const [pendingAudioUrl, setPendingAudioUrl] = useState(null);
 
@@ -21,7 +23,7 @@ export function useTextToSpeech() {
         // Clear the pending URL before playing to avoid loops
         const urlToPlay = pendingAudioUrl;
         setPendingAudioUrl(null); 
-        playSpeech(urlToPlay);
+        startClip(urlToPlay);
       }
       
       // Clean up listeners after the first successful interaction
@@ -45,12 +47,16 @@ export function useTextToSpeech() {
     };
   }, [pendingAudioUrl]); // Rerun this effect if a pending URL is set
 
-  const playSpeech = async (audioUrl) => {
-    if (!audioUrl) {
-      console.error("No audio URL provided.");
-      return;
+  // Starts the next queued clip, if any. Called when a clip ends, fails or can't be played.
+  const playNext = () => {
+    audioRef.current = null;
+    setIsSpeaking(false);
+    if (queueRef.current.length > 0) {
+      startClip(queueRef.current.shift());
     }
-    
+  };
+
+  const startClip = async (audioUrl) => {
     if (audioRef.current) {
       audioRef.current.pause();
       audioRef.current.currentTime = 0;
@@ -60,35 +66,56 @@ export function useTextToSpeech() {
     audio.crossOrigin = "anonymous";
     audioRef.current = audio;
 
+    // Events of a clip that was stopped or replaced must not touch the queue.
     audio.onended = () => {
-      setIsSpeaking(false);
-      audioRef.current = null;
+      if (audioRef.current === audio) playNext();
     };
     
     audio.onerror = (e) => {
       console.error("Audio playback error:", e);
-      setIsSpeaking(false);
-      audioRef.current = null;
+      if (audioRef.current === audio) playNext();
     };
 
     try {
       await audio.play();
-      setIsSpeaking(true);
+      if (audioRef.current === audio) setIsSpeaking(true);
     } catch (error) {
+      if (audioRef.current !== audio) return;
       // Check if the error is the specific autoplay block error
-      if (error.name === 'NotAllowedError') {
+      if (error.name === 'NotAllowedError' && !isAudioContextUnlocked) {
+        // Later clips stay queued behind this one and follow it once the user interacts.
         console.warn('Playback blocked by browser. It will start after the first user interaction.');
-        
         setPendingAudioUrl(audioUrl);
+        setIsSpeaking(false);
       } else {
+        // Skip the clip rather than silencing the rest of the reply.
         console.error("Error playing speech:", error);
+        playNext();
       }
-      // Do NOT set isSpeaking(true) if it fails
-      setIsSpeaking(false);
+    }
+  };
+
+  // Plays a clip right away, dropping anything still queued.
+  const playSpeech = (audioUrl) => {
+    if (!audioUrl) {
+      console.error("No audio URL provided.");
+      return;
+    }
+    queueRef.current = [];
+    startClip(audioUrl);
+  };
+
+  const enqueueSpeech = (audioUrl) => {
+    if (!audioUrl) return;
+    if (audioRef.current) {
+      queueRef.current.push(audioUrl);
+    } else {
+      startClip(audioUrl);
     }
   };
 
   const stopSpeech = () => {
+    queueRef.current = [];
     if (audioRef.current) {
       audioRef.current.pause();
       audioRef.current.currentTime = 0;
@@ -101,5 +128,5 @@ export function useTextToSpeech() {
     setIsSpeaking(false);
   };
 
-  return { playSpeech, stopSpeech, isSpeaking };
+  return { playSpeech, enqueueSpeech, stopSpeech, isSpeaking };
 }
\ No newline at end of file
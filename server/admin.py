@@ -0,0 +1,63 @@
+"""
+One-off administration commands, kept out of the server's startup path.
+
+    python admin.py provision-index [--recreate]   # create the Pinecone index (or fix its dimension)
+    python admin.py seed                           # load the sample catalog if the store is empty
+    python admin.py status                         # vector count and backend
+"""
+import argparse
+
+from config import (
+    PINECONE_API_KEY, PINECONE_INDEX_NAME, PINECONE_EMBEDDING_DIMENSION, VECTOR_STORE_BACKEND,
+    require_api_key,
+)
+
+def provision_pinecone_index(recreate: bool = False):
+    """Creates the Pinecone index if it doesn't exist. A dimension mismatch is only fixed with `recreate`."""
+    from pinecone import Pinecone, ServerlessSpec
+    pc = Pinecone(api_key=require_api_key("PINECONE_API_KEY", PINECONE_API_KEY))
+    existing_indexes = [index_info["name"] for index_info in pc.list_indexes()]
+
+    if PINECONE_INDEX_NAME in existing_indexes:
+        index_description = pc.describe_index(PINECONE_INDEX_NAME)
+        if index_description.dimension == PINECONE_EMBEDDING_DIMENSION:
+            print(f"Index '{PINECONE_INDEX_NAME}' already exists with correct dimension.")
+        elif not recreate:
+            raise SystemExit(
+                f"Index '{PINECONE_INDEX_NAME}' has dimension {index_description.dimension}, expected "
+                f"{PINECONE_EMBEDDING_DIMENSION}. Re-run with --recreate to delete and recreate it."
+            )
+        else:
+            print(f"Index '{PINECONE_INDEX_NAME}' exists but has wrong dimension. Deleting and recreating...")
+            pc.delete_index(PINECONE_INDEX_NAME)
+            existing_indexes.remove(PINECONE_INDEX_NAME)
+
+    if PINECONE_INDEX_NAME not in existing_indexes:
+        print(f"Creating index '{PINECONE_INDEX_NAME}'...")
+        pc.create_index(
+            name=PINECONE_INDEX_NAME,
+            dimension=PINECONE_EMBEDDING_DIMENSION,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1")
+        )
+        print("Index created successfully.")
+
+    print(f"Index host: {pc.describe_index(PINECONE_INDEX_NAME).host} (set PINECONE_INDEX_HOST to skip the lookup at startup)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    provision = commands.add_parser("provision-index", help="create the Pinecone index")
+    provision.add_argument("--recreate", action="store_true", help="delete and recreate an index with the wrong dimension")
+    commands.add_parser("seed", help="load the bundled sample catalog if the vector store is empty")
+    commands.add_parser("status", help="show the vector store backend and vector count")
+    args = parser.parse_args()
+
+    if args.command == "provision-index":
+        provision_pinecone_index(recreate=args.recreate)
+    elif args.command == "seed":
+        from ingest import populate_sample_data
+        populate_sample_data()
+    elif args.command == "status":
+        from vector_store import get_vector_store
+        print(f"Backend: {VECTOR_STORE_BACKEND}, vectors: {get_vector_store().count()}")
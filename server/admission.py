@@ -0,0 +1,255 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from config import (
+    CHAT_MAX_ACTIVE, CHAT_MAX_QUEUED, CHAT_QUEUE_TIMEOUT_SECONDS, ADMISSION_RETRY_AFTER_SECONDS,
+    GEMINI_MAX_CONCURRENCY, GEMINI_RATE_PER_SECOND, EMBEDDING_MAX_CONCURRENCY, EMBEDDING_RATE_PER_SECOND,
+    PINECONE_MAX_CONCURRENCY, PINECONE_RATE_PER_SECOND, MURF_MAX_CONCURRENCY_PER_HOST, MURF_RATE_PER_SECOND,
+    TTS_SHED_QUEUE_DEPTH,
+)
+from tracing import get_logger, span
+
+log = get_logger("admission")
+
+class Overloaded(Exception):
+    """Raised when a request can't be admitted; the API answers 503 with a Retry-After header."""
+
+    def __init__(self, detail: str, retry_after: float = ADMISSION_RETRY_AFTER_SECONDS):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request's deadline passed, or would pass, before an upstream call could complete."""
+
+# --- Deadlines ---
+# Absolute time.monotonic() deadline of the current request. Like the trace ID it follows the
+# request into tasks and worker threads, so graph nodes, tools and the Murf client all see it.
+deadline_var: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+def set_deadline(seconds: Optional[float]):
+    """Starts the current context's deadline `seconds` from now; None or <= 0 removes it."""
+    deadline_var.set(time.monotonic() + seconds if seconds and seconds > 0 else None)
+
+def time_left(cap: Optional[float] = None) -> Optional[float]:
+    """Seconds until the deadline (never negative), capped at `cap`; None if neither is set."""
+    deadline = deadline_var.get()
+    left = None if deadline is None else max(0.0, deadline - time.monotonic())
+    if cap is None:
+        return left
+    return cap if left is None else min(cap, left)
+
+async def within_deadline(awaitable):
+    """Awaits `awaitable`, raising DeadlineExceeded if the request's deadline passes first."""
+    try:
+        return await asyncio.wait_for(awaitable, time_left())
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded("Request deadline exceeded") from e
+
+# --- Limiters ---
+
+class Limiter:
+    """
+    Concurrency cap plus token-bucket rate limit for one upstream, shared by async callers and
+    worker threads. Waiters get slots in FIFO order; a released slot passes straight to the next
+    waiter. Waits never outlast the request deadline. `max_concurrency` or `rate` <= 0 means no
+    limit; `max_waiting` bounds the queue (beyond it, acquiring raises Overloaded at once).
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 0, rate: float = 0.0, burst: Optional[float] = None,
+                 max_waiting: Optional[int] = None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.max_waiting = max_waiting
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: "deque[Callable[[], None]]" = deque()
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _reserve_token(self) -> float:
+        """Takes a token, going into debt if none is left; returns how long to wait for it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def _refund_token(self):
+        if self.rate > 0:
+            with self._lock:
+                self._tokens += 1
+
+    def _token_delay(self, timeout: Optional[float]) -> float:
+        delay = self._reserve_token()
+        if timeout is not None and delay > timeout:
+            self._refund_token()
+            raise DeadlineExceeded(f"{self.name} rate limit wait exceeds the deadline")
+        return delay
+
+    def _enter_or_queue(self, wake: Callable[[], None]) -> bool:
+        """Takes a slot if one is free (True) or queues `wake` to be called with one later (False)."""
+        with self._lock:
+            if self.max_concurrency <= 0 or (self._in_flight < self.max_concurrency and not self._waiters):
+                self._in_flight += 1
+                return True
+            if self.max_waiting is not None and len(self._waiters) >= self.max_waiting:
+                raise Overloaded(f"{self.name} queue is full")
+            self._waiters.append(wake)
+            return False
+
+    def _withdraw(self, wake: Callable[[], None]) -> bool:
+        """Removes a waiter that gave up; False if it was handed a slot in the meantime."""
+        with self._lock:
+            try:
+                self._waiters.remove(wake)
+                return True
+            except ValueError:
+                return False
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._in_flight -= 1
+                return
+            wake = self._waiters.popleft()
+        wake()
+
+    async def acquire(self, timeout: Optional[float] = None):
+        timeout = time_left(timeout)
+        if timeout == 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        started = time.monotonic()
+        delay = self._token_delay(timeout)
+        if delay:
+            await asyncio.sleep(delay)
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def deliver():
+            # Runs on the waiter's loop; if the waiter already gave up, pass the slot on.
+            if granted.done():
+                self.release()
+            else:
+                granted.set_result(None)
+
+        def wake():
+            loop.call_soon_threadsafe(deliver)
+
+        if self._enter_or_queue(wake):
+            return
+        remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+        with span("admission", self.name, waiting=len(self._waiters)):
+            try:
+                await asyncio.wait_for(granted, remaining)
+            except BaseException as e:
+                if not self._withdraw(wake) and granted.done() and not granted.cancelled():
+                    self.release()
+                if isinstance(e, asyncio.TimeoutError):
+                    raise DeadlineExceeded(f"Timed out waiting for {self.name}") from e
+                raise
+
+    def acquire_sync(self, timeout: Optional[float] = None):
+        """Blocking `acquire` for code running in worker threads."""
+        timeout = time_left(timeout)
+        if timeout == 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        started = time.monotonic()
+        delay = self._token_delay(timeout)
+        if delay:
+            time.sleep(delay)
+        granted = threading.Event()
+        wake = granted.set
+        if self._enter_or_queue(wake):
+            return
+        remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+        with span("admission", self.name, waiting=len(self._waiters)):
+            if not granted.wait(remaining) and self._withdraw(wake):
+                raise DeadlineExceeded(f"Timed out waiting for {self.name}")
+
+    @asynccontextmanager
+    async def slot(self, timeout: Optional[float] = None):
+        await self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def sync_slot(self, timeout: Optional[float] = None):
+        self.acquire_sync(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {"in_flight": self._in_flight, "waiting": len(self._waiters),
+                "max_concurrency": self.max_concurrency, "rate_per_second": self.rate}
+
+# One limiter per upstream API, shared by every request in the process.
+UPSTREAMS: Dict[str, Limiter] = {
+    "gemini": Limiter("gemini", GEMINI_MAX_CONCURRENCY, GEMINI_RATE_PER_SECOND),
+    "embeddings": Limiter("embeddings", EMBEDDING_MAX_CONCURRENCY, EMBEDDING_RATE_PER_SECOND),
+    "pinecone": Limiter("pinecone", PINECONE_MAX_CONCURRENCY, PINECONE_RATE_PER_SECOND),
+    "murf": Limiter("murf", MURF_MAX_CONCURRENCY_PER_HOST, MURF_RATE_PER_SECOND),
+}
+
+def upstream(name: str):
+    """`async with upstream("gemini"):` holds a slot of that upstream's limiter."""
+    return UPSTREAMS[name].slot()
+
+def upstream_sync(name: str):
+    """`with upstream_sync("pinecone"):` for calls made from worker threads."""
+    return UPSTREAMS[name].sync_slot()
+
+# --- Request Admission ---
+# Chat turns fan out to several upstreams, so at most CHAT_MAX_ACTIVE run at once and at most
+# CHAT_MAX_QUEUED wait for a turn; anything beyond that is turned away with a 503 up front.
+chat_gate = Limiter("chat", CHAT_MAX_ACTIVE, max_waiting=CHAT_MAX_QUEUED)
+
+@asynccontextmanager
+async def admitted():
+    """Holds a chat turn slot. Raises Overloaded if the queue is full or the wait runs too long."""
+    try:
+        await chat_gate.acquire(CHAT_QUEUE_TIMEOUT_SECONDS)
+    except (Overloaded, DeadlineExceeded) as e:
+        log.warning("admission.rejected", reason=str(e), active=chat_gate.in_flight, waiting=chat_gate.waiting)
+        raise Overloaded("The assistant is busy, please retry shortly") from e
+    try:
+        yield
+    finally:
+        chat_gate.release()
+
+def audio_overloaded() -> bool:
+    """
+    True while chat turns are queueing or Murf's backlog is TTS_SHED_QUEUE_DEPTH deep. Reply audio
+    is skipped then, so the text of every turn still goes out.
+    """
+    return chat_gate.waiting > 0 or UPSTREAMS["murf"].waiting >= TTS_SHED_QUEUE_DEPTH
+
+def admission_stats() -> dict:
+    return {"chat": chat_gate.stats(), **{name: limiter.stats() for name, limiter in UPSTREAMS.items()}}
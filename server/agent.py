@@ -1,81 +1,85 @@
+import asyncio
 import json
 import operator
-import re
-from typing import TypedDict, Annotated, Dict, List
-from langchain_core.messages import AIMessage, ToolMessage, HumanMessage, SystemMessage
+from typing import TypedDict, Annotated, Dict, List, Optional
+from langchain_core.messages import AIMessage, ToolMessage, SystemMessage
 from langgraph.graph import StateGraph, END
-from schemas import Product, FinalAnswer
-from tools import find_product, get_deal
-from config import llm
+from schemas import Product, FinalAnswer, SpecialDeal
+from tools import find_product, get_deal, product_table
+from config import get_llm, AGENT_GRAPH_MODE, TOOL_MAX_CONCURRENCY, TOOL_TIMEOUT_SECONDS, TOOL_RESULT_FORMAT
+from admission import time_left, upstream
+from context_cache import invoke_with_prefix
+from prompts import agent_context, agent_prefix, formatter_context, formatter_prefix, split_formatted_answer
+from tracing import get_logger, span, traced
+
+log = get_logger("agent")
 
 # --- Agent Setup ---
 tools = [find_product, get_deal]
-llm_with_tools = llm.bind_tools(tools)
+# In "single_call" mode the agent can answer directly by calling FinalAnswer as a tool, so turns
+# that need no further formatting cost one model round trip; "two_call" always runs the formatter.
+SINGLE_CALL = AGENT_GRAPH_MODE == "single_call"
+_llm_with_tools = (None, None)  # (model, model with tools bound)
+# find_product hits reach the model as compact tables (tools.product_table), each product once per turn.
+COMPACT_TOOL_RESULTS = TOOL_RESULT_FORMAT == "compact"
+
+def get_llm_with_tools():
+    """The chat model with the agent's tools bound, rebound if the shared model was replaced."""
+    global _llm_with_tools
+    llm = get_llm()
+    if _llm_with_tools[0] is not llm:
+        _llm_with_tools = (llm, llm.bind_tools(tools + [FinalAnswer] if SINGLE_CALL else tools))
+    return _llm_with_tools[1]
 
 class AgentState(TypedDict):
     messages: Annotated[list, operator.add]
     retrieved_products: Annotated[Dict[str, Product], operator.ior]
     product_context_ids: list[str]
     detected_language: str  # Track the detected language
+    conversation_summary: str  # Summary of earlier turns compacted out of `messages`
+    special_deal: Optional[SpecialDeal]  # Latest deal computed by the deal engine this turn
+    described_product_ids: Annotated[list, operator.add]  # Products whose rows tool results sent this turn
+    # Per-turn cost counters, summed across nodes.
+    llm_calls: Annotated[int, operator.add]
+    prompt_tokens: Annotated[int, operator.add]
+    completion_tokens: Annotated[int, operator.add]
 
-def detect_language_from_text(text: str) -> str:
-    """Detect language from text using character patterns."""
-    language_patterns = {
-        'hi-IN': r'[\u0900-\u097F]',  # Hindi
-        'ko-KR': r'[\uAC00-\uD7AF]',  # Korean
-        'ja-JP': r'[\u3040-\u309F\u30A0-\u30FF]',  # Japanese
-        'zh-CN': r'[\u4E00-\u9FFF]',  # Chinese
-        'es-ES': r'[áéíóúñ¿¡]',  # Spanish
-        'fr-FR': r'[àâçéèêëîïôûùüÿœæ]',  # French
-        'de-DE': r'[äöüß]',  # German
-        'it-IT': r'[àèéìíîòóùú]',  # Italian
-        'pt-BR': r'[ãõâêîôûáéíóúç]',  # Portuguese
-        'ar-SA': r'[\u0600-\u06FF]',  # Arabic
+def usage_update(message) -> dict:
+    """Counter increments for one model call, from the provider's usage metadata when present."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return {
+        "llm_calls": 1,
+        "prompt_tokens": usage.get("input_tokens", 0),
+        "completion_tokens": usage.get("output_tokens", 0),
     }
-    
-    for lang_code, pattern in language_patterns.items():
-        if re.search(pattern, text, re.IGNORECASE):
-            return lang_code
-    
-    return 'en-US'  # Default to English
 
-def tool_using_agent_node(state: AgentState):
+def message_text(message) -> str:
+    """Text of a model reply; Gemini may return the content as a list of parts."""
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+
+def final_answer_call(message):
+    """Returns the FinalAnswer tool call on `message` if it has a valid one, else None."""
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        if tool_call["name"] == "FinalAnswer":
+            try:
+                FinalAnswer.model_validate(tool_call["args"])
+            except ValueError:
+                return None
+            return tool_call
+    return None
+
+async def tool_using_agent_node(state: AgentState):
     """Decides to call a tool or respond."""
-    print("--- NODE: Tool Using Agent ---")
     
-    # Detect language from the latest user message
+    # Detected once per turn by the API (language_id.choose_language).
     detected_language = state.get("detected_language", "en-US")
-    for msg in reversed(state["messages"]):
-        if isinstance(msg, HumanMessage):
-            detected_language = detect_language_from_text(msg.content)
-            break
-    
-    product_context = state.get("product_context_ids", [])
-    
-    # VERY STRONG multilingual instruction
-    system_prompt = f"""
-    CRITICAL LANGUAGE INSTRUCTION: YOU MUST RESPOND IN {detected_language.upper()}!
-    
-    You are an expert multilingual mobile sales assistant. The user is speaking in {detected_language}.
-    
-    ABSOLUTE RULES:
-    1. RESPOND ONLY IN {detected_language.upper()} - NEVER IN ENGLISH OR ANY OTHER LANGUAGE
-    2. If user says "사랑해" (Korean), respond in Korean with appropriate mobile sales response
-    3. If user says Hindi text, respond in Hindi
-    4. If user says any non-English text, respond in that same language
-    5. NEVER say "I only speak English" or similar - you are fully multilingual
-    
-    BUSINESS RULES:
-    - You sell mobile phones and accessories
-    - Current Product Context: {product_context if product_context else "None"}
-    - Use `find_product` for new product searches
-    - Use `get_deal` for discounts on current products
-    
-    EXAMPLE RESPONSES:
-    - Korean input: "사랑해" → Korean response about mobile offers
-    - Hindi input: "आप हिंदी में बात कर सकते हैं" → Hindi response confirming multilingual capability
-    - English input: "Hello" → English response
-    """
+
+    # Static per language, so it is identical on every call; the context block follows it.
+    prefix = agent_prefix(detected_language, SINGLE_CALL)
+    context = agent_context(state.get("product_context_ids", []), state.get("conversation_summary"))
     
     # Prepare messages for LLM (keep only non-system messages)
     filtered_messages = []
@@ -83,59 +87,113 @@ def tool_using_agent_node(state: AgentState):
         if not isinstance(msg, SystemMessage) and not (hasattr(msg, 'type') and getattr(msg, 'type', None) == 'system'):
             filtered_messages.append(msg)
     
-    response = llm_with_tools.invoke([SystemMessage(content=system_prompt)] + filtered_messages)
-    return {"messages": [response], "detected_language": detected_language}
+    async with upstream("gemini"):
+        with span("llm", "agent"):
+            response, _ = await invoke_with_prefix(
+                "agent", detected_language, prefix, context, filtered_messages,
+                tools + [FinalAnswer] if SINGLE_CALL else tools,
+                lambda system_prompt: get_llm_with_tools().ainvoke([SystemMessage(content=system_prompt)] + filtered_messages))
+    return {"messages": [response], "detected_language": detected_language, **usage_update(response)}
+
+TOOLS_BY_NAME = {t.name: t for t in tools}
+# Tools without side effects: identical calls within one step are executed once.
+DEDUPLICATED_TOOLS = {"find_product"}
+
+def call_key(tool_call):
+    """Identical side-effect-free calls share a key; everything else is keyed by its call ID."""
+    if tool_call['name'] in DEDUPLICATED_TOOLS:
+        return tool_call['name'], json.dumps(tool_call['args'], sort_keys=True)
+    return tool_call['id']
 
-def tool_node(state: AgentState):
-    """Executes tools."""
-    print("--- NODE: Tool Executor ---")
+async def run_tool(tool_call, semaphore: asyncio.Semaphore):
+    """
+    Runs one tool call with the per-tool timeout (cut short by the request deadline); errors come
+    back as text for the model to read.
+    """
+    async with semaphore:
+        timeout = time_left(TOOL_TIMEOUT_SECONDS)
+        try:
+            with span("tool", tool_call['name']):
+                return await asyncio.wait_for(TOOLS_BY_NAME[tool_call['name']].ainvoke(tool_call['args']),
+                                              timeout=timeout)
+        except asyncio.TimeoutError:
+            log.warning("tool.timeout", tool=tool_call['name'], timeout_s=round(timeout, 2))
+            return f"Error: {tool_call['name']} timed out. Try again or answer without it."
+        except Exception as e:
+            log.error("tool.failed", tool=tool_call['name'], error=str(e))
+            return f"Error: {tool_call['name']} failed: {e}"
+
+async def tool_node(state: AgentState):
+    """Executes the step's tool calls concurrently and returns their results in call order."""
     tool_calls = state["messages"][-1].tool_calls
+    semaphore = asyncio.Semaphore(TOOL_MAX_CONCURRENCY)
+
+    pending = {}
+    for tool_call in tool_calls:
+        if tool_call['name'] == 'FinalAnswer':
+            continue
+        key = call_key(tool_call)
+        if key not in pending:
+            pending[key] = asyncio.ensure_future(run_tool(tool_call, semaphore))
+    results = dict(zip(pending, await asyncio.gather(*pending.values())))
+
     tool_messages = []
     retrieved_products_update = {}
-    current_context_ids = state.get("product_context_ids", [])
-
+    found_ids = []
+    # Tool results are only replayed within a turn, so only rows sent earlier this turn can be referenced.
+    described = set(state.get("described_product_ids", []))
+    newly_described = []
+    deal = None
     for tool_call in tool_calls:
-        tool_output = globals()[tool_call['name']].invoke(tool_call['args'])
-        if tool_call['name'] == 'find_product':
-            current_context_ids = [p['ID'] for p in tool_output]
-            for product_dict in tool_output:
-                product_obj = Product(**product_dict)
+        if tool_call['name'] == 'FinalAnswer':
+            # FinalAnswer mixed with other tool calls: answer again once their results are in.
+            tool_messages.append(ToolMessage(
+                content="Not sent. Call FinalAnswer on its own after reading the other tool results.",
+                tool_call_id=tool_call['id']))
+            continue
+        tool_output = results[call_key(tool_call)]
+        if tool_call['name'] == 'find_product' and isinstance(tool_output, list):
+            products = [Product(**product_dict) for product_dict in tool_output]
+            for product_obj in products:
                 retrieved_products_update[product_obj.id] = product_obj
-            output_str = json.dumps(tool_output)
+                if product_obj.id not in found_ids:
+                    found_ids.append(product_obj.id)
+            if COMPACT_TOOL_RESULTS:
+                output_str = product_table(products, described)
+                fresh = [p.id for p in products if p.id not in described]
+                described.update(fresh)
+                newly_described.extend(fresh)
+            else:
+                output_str = json.dumps(tool_output)
+        elif isinstance(tool_output, SpecialDeal):
+            deal = tool_output
+            for product_obj in deal.products_involved:
+                retrieved_products_update[product_obj.id] = product_obj
+            output_str = json.dumps({
+                "heading": deal.heading,
+                "deal_price": deal.deal_price,
+                "product_ids": [p.id for p in deal.products_involved],
+            }, ensure_ascii=False)
         else:
             output_str = str(tool_output)
         tool_messages.append(ToolMessage(content=output_str, tool_call_id=tool_call['id']))
 
-    return {
+    # Several searches in one step (comparisons) all stay in context.
+    update = {
         "messages": tool_messages,
         "retrieved_products": retrieved_products_update,
-        "product_context_ids": current_context_ids
+        "product_context_ids": found_ids or state.get("product_context_ids", []),
+        "described_product_ids": newly_described,
     }
+    if deal is not None:
+        update["special_deal"] = deal
+    return update
 
-def final_answer_node(state: AgentState):
+async def final_answer_node(state: AgentState):
     """Formats the final response."""
-    print("--- NODE: Final Answer Formatter ---")
-    formatter_llm = llm.with_structured_output(FinalAnswer)
-    
     detected_language = state.get("detected_language", "en-US")
-    
-    # Strong formatting instruction with language enforcement
-    formatting_prompt = f"""
-    FORMAT THE FINAL RESPONSE USING THE `FinalAnswer` TOOL.
-    
-    CRITICAL: YOU MUST RESPOND IN {detected_language.upper()}!
-    
-    RULES:
-    1. Text must be in {detected_language}
-    2. Maintain conversational tone appropriate for {detected_language}
-    3. Include relevant product_ids from find_product tool output
-    4. Never translate to English - keep everything in {detected_language}
-    
-    Examples:
-    - Korean: Use Korean characters and grammar
-    - Hindi: Use Devanagari script
-    - Japanese: Use appropriate Japanese characters
-    """
+    prefix = formatter_prefix(detected_language)
+    context = formatter_context(state.get("conversation_summary"))
     
     # Filter out system messages for the formatting call
     filtered_messages = []
@@ -143,22 +201,42 @@ def final_answer_node(state: AgentState):
         if not isinstance(msg, SystemMessage) and not (hasattr(msg, 'type') and getattr(msg, 'type', None) == 'system'):
             filtered_messages.append(msg)
     
-    response = formatter_llm.invoke([SystemMessage(content=formatting_prompt)] + filtered_messages)
-    return {"messages": [AIMessage(content="", tool_calls=[{"name": "FinalAnswer", "args": response.model_dump(), "id": "final"}])]}
+    # Plain text rather than structured output, so the reply streams token by token (see prompts.py).
+    async with upstream("gemini"):
+        with span("llm", "final_answer_formatter"):
+            result, _ = await invoke_with_prefix(
+                "final_answer_formatter", detected_language, prefix, context, filtered_messages, [],
+                lambda system_prompt: get_llm().ainvoke([SystemMessage(content=system_prompt)] + filtered_messages))
+    text, product_ids = split_formatted_answer(message_text(result))
+    if not text:
+        raise ValueError("Formatter returned an empty reply")
+    if product_ids is None:
+        log.warning("formatter.no_product_ids", language=detected_language)
+        product_ids = state.get("product_context_ids", [])
+    answer = FinalAnswer(text=text, product_ids=product_ids)
+    return {
+        "messages": [AIMessage(content="", tool_calls=[{"name": "FinalAnswer", "args": answer.model_dump(), "id": "final"}])],
+        **usage_update(result),
+    }
 
 def router(state: AgentState) -> str:
     """Decides the next step."""
-    print("--- ROUTER ---")
     last_message = state["messages"][-1]
-    if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-        return "tools"
-    return "final_answer_formatter"
+    tool_calls = getattr(last_message, 'tool_calls', None) or []
+    if any(tool_call['name'] != 'FinalAnswer' for tool_call in tool_calls):
+        route = "tools"
+    elif final_answer_call(last_message):
+        route = END
+    else:
+        route = "final_answer_formatter"
+    log.debug("router", route=route, tool_calls=[tool_call['name'] for tool_call in tool_calls])
+    return route
 
 # --- Graph Definition ---
 workflow = StateGraph(AgentState)
-workflow.add_node("agent", tool_using_agent_node)
-workflow.add_node("tools", tool_node)
-workflow.add_node("final_answer_formatter", final_answer_node)
+workflow.add_node("agent", traced("node", "agent")(tool_using_agent_node))
+workflow.add_node("tools", traced("node", "tools")(tool_node))
+workflow.add_node("final_answer_formatter", traced("node", "final_answer_formatter")(final_answer_node))
 workflow.set_entry_point("agent")
 workflow.add_conditional_edges("agent", router)
 workflow.add_edge("tools", "agent")
@@ -0,0 +1,66 @@
+from typing import List, Tuple
+
+# Formats whose clips can be joined into one playable clip. FLAC files carry a single STREAMINFO
+# header with the total length, so they can't be appended without re-encoding.
+CONCATENABLE_FORMATS = ("MP3", "WAV", "OGG", "PCM", "ALAW", "ULAW")
+
+def _wav_parts(clip: bytes) -> Tuple[bytes, bytes]:
+    """The `fmt ` chunk body and the sample data of a RIFF/WAVE clip."""
+    if clip[:4] != b"RIFF" or clip[8:12] != b"WAVE":
+        raise ValueError("Not a WAV clip")
+    fmt = data = None
+    position = 12
+    while position + 8 <= len(clip):
+        chunk_id = clip[position:position + 4]
+        size = int.from_bytes(clip[position + 4:position + 8], "little")
+        body = clip[position + 8:position + 8 + size]  # streamed WAVs may claim more data than they hold
+        if chunk_id == b"fmt ":
+            fmt = body
+        elif chunk_id == b"data":
+            data = body
+        position += 8 + size + (size & 1)
+    if fmt is None or data is None:
+        raise ValueError("WAV clip has no fmt or data chunk")
+    return fmt, data
+
+def _chunk(chunk_id: bytes, body: bytes) -> bytes:
+    return chunk_id + len(body).to_bytes(4, "little") + body + b"\0" * (len(body) & 1)
+
+def concatenate_wav(clips: List[bytes]) -> bytes:
+    """One WAV with the samples of every clip; all clips must share the same sample format."""
+    parts = [_wav_parts(clip) for clip in clips]
+    fmt = parts[0][0]
+    if any(other != fmt for other, _ in parts):
+        raise ValueError("WAV clips differ in sample format")
+    body = b"WAVE" + _chunk(b"fmt ", fmt) + _chunk(b"data", b"".join(data for _, data in parts))
+    return _chunk(b"RIFF", body)
+
+def _strip_id3(clip: bytes, leading: bool, trailing: bool) -> bytes:
+    if leading and clip[:3] == b"ID3" and len(clip) >= 10:
+        size = 0
+        for byte in clip[6:10]:  # syncsafe: 7 bits per byte
+            size = (size << 7) | (byte & 0x7F)
+        footer = 10 if clip[5] & 0x10 else 0
+        clip = clip[10 + size + footer:]
+    if trailing and len(clip) >= 128 and clip[-128:-125] == b"TAG":
+        clip = clip[:-128]
+    return clip
+
+def concatenate_mp3(clips: List[bytes]) -> bytes:
+    """MP3 frames are self-contained; only the ID3 tags between clips have to go."""
+    last = len(clips) - 1
+    return b"".join(_strip_id3(clip, leading=index > 0, trailing=index < last) for index, clip in enumerate(clips))
+
+def concatenate_audio(clips: List[bytes], format: str) -> bytes:
+    """
+    Joins same-format clips in order. Ogg clips become a chained stream, which the Ogg spec
+    allows; raw PCM, A-law and µ-law are appended as-is. Raises ValueError if they can't be joined.
+    """
+    format = format.upper()
+    if format not in CONCATENABLE_FORMATS:
+        raise ValueError(f"{format} clips can't be concatenated")
+    if format == "WAV" or all(clip[:4] == b"RIFF" for clip in clips):
+        return concatenate_wav(clips)
+    if format == "MP3":
+        return concatenate_mp3(clips)
+    return b"".join(clips)
@@ -0,0 +1 @@
+"""Offline benchmarking and load-testing helpers. Run modules from the server directory, e.g. `python -m bench.murf_stub`."""
@@ -0,0 +1,252 @@
+"""
+Offline end-to-end benchmark of the chat endpoints. Starts the real FastAPI app on a local port
+with a scripted fake Gemini model, fake embeddings, the local NumPy vector store and the Murf
+stub, drives concurrent multi-turn conversations, and reports p50/p95/p99 per endpoint and per
+agent graph node. No API keys or network access are needed.
+
+    python -m bench.chat_load -n 50 -c 10
+    python -m bench.chat_load --endpoint stream --llm-latency lognormal:900:400 --json after.json
+    python -m bench.chat_load --baseline before.json   # exits 1 if any p50/p95 regressed
+
+Latencies are given as distribution:mean_ms:spread_ms with distribution one of
+fixed, normal, lognormal, exponential, uniform.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+
+from bench.fakes import FakeEmbeddings, Latency, ScriptedChatModel
+# Nothing that imports `config` may be imported at module level: configure_environment() runs first.
+
+CONVERSATIONS = [
+    ["Show me Samsung phones under 120000", "Any deal on these?", "Thanks, that's all."],
+    ["I want an iPhone with 256GB storage", "Can I get a discount on it?", "Great, bye!"],
+    ["Hello!", "Which phone has the best camera?", "What's the best price for the first one?"],
+    ["Budget phone with a big battery", "Compare it with a Pixel", "Any offer if I buy today?"],
+]
+
+def parse_latency(spec: str) -> Latency:
+    distribution, mean_ms, spread_ms = (spec.split(":") + ["0", "0"])[:3]
+    return Latency(distribution, float(mean_ms), float(spread_ms))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def configure_environment(murf_port: int):
+    """Points every backend at a local stand-in. Must run before anything imports `config`."""
+    workdir = tempfile.mkdtemp(prefix="chat_bench_")
+    os.environ.update({
+        "MURF_API_KEY": "bench",
+        "GOOGLE_API_KEY": "bench",
+        "MURF_API_URL": f"http://127.0.0.1:{murf_port}/v1/speech/generate",
+        "VECTOR_STORE_BACKEND": "local",
+        "LOCAL_INDEX_DIR": os.path.join(workdir, "vector_index"),
+        "TTS_CACHE_DIR": os.path.join(workdir, "tts_cache"),
+        "SEED_SAMPLE_DATA": "false",
+        "SESSION_STORE_PATH": "",
+    })
+
+class NodeTimer(BaseCallbackHandler):
+    """Records the wall time of every LangGraph node run."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            with self._lock:
+                self._started[run_id] = (node, time.perf_counter())
+
+    def _finish(self, run_id):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+            if started:
+                self.samples[started[0]].append(time.perf_counter() - started[1])
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+class TimedGraph:
+    """Passes the NodeTimer to every run; callbacks bound with `with_config` are lost by astream_events."""
+
+    def __init__(self, graph, timer: NodeTimer):
+        self._graph = graph
+        self._config = {"callbacks": [timer]}
+
+    def ainvoke(self, state, **kwargs):
+        return self._graph.ainvoke(state, self._config, **kwargs)
+
+    def astream_events(self, state, **kwargs):
+        return self._graph.astream_events(state, self._config, **kwargs)
+
+def start_app(port: int):
+    import uvicorn
+    import main
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+async def run_conversation(client: httpx.AsyncClient, turns, endpoint: str, samples, errors):
+    session_id = None
+    for message in turns:
+        payload = {"user_message": message, "session_id": session_id}
+        started = time.perf_counter()
+        try:
+            if endpoint == "chat":
+                response = await client.post("/chat", json=payload)
+                response.raise_for_status()
+                session_id = response.json()["session_id"]
+                samples["/chat"].append(time.perf_counter() - started)
+            else:
+                first_event = first_text = first_audio = None
+                async with client.stream("POST", "/chat/stream", json=payload) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        if first_event is None:
+                            first_event = time.perf_counter() - started
+                            session_id = event.get("session_id", session_id)
+                        if event["type"] == "delta" and first_text is None:
+                            first_text = time.perf_counter() - started
+                        if event["type"] == "audio" and first_audio is None:
+                            first_audio = time.perf_counter() - started
+                samples["/chat/stream first event"].append(first_event or 0.0)
+                if first_text is not None:
+                    samples["/chat/stream first text"].append(first_text)
+                if first_audio is not None:
+                    samples["/chat/stream first audio"].append(first_audio)
+                samples["/chat/stream total"].append(time.perf_counter() - started)
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            errors[endpoint] += 1
+            print(f"{endpoint} turn failed: {e!r}", file=sys.stderr)
+
+async def drive(port: int, conversations: int, concurrency: int, endpoints, seed: int):
+    rng = random.Random(seed)
+    scripts = [rng.choice(CONVERSATIONS) for _ in range(conversations)]
+    samples, errors = defaultdict(list), defaultdict(int)
+    gate = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+        async def one(index: int):
+            async with gate:
+                await run_conversation(client, scripts[index], endpoints[index % len(endpoints)], samples, errors)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(conversations)))
+        elapsed = time.perf_counter() - started
+    return samples, errors, elapsed
+
+def summarize(values):
+    from bench.murf_load import percentile
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.mean(values) * 1000, 1),
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p95_ms": round(percentile(values, 95) * 1000, 1),
+        "p99_ms": round(percentile(values, 99) * 1000, 1),
+    }
+
+def print_table(title: str, rows: dict):
+    print(f"\n{title}")
+    print(f"  {'name':<28}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}   (ms)")
+    for name, row in rows.items():
+        print(f"  {name:<28}{row['count']:>7}{row['mean_ms']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """Prints p50/p95 changes against a previous run and returns True if anything regressed."""
+    regressed = False
+    print(f"\nAgainst baseline (tolerance {tolerance:.0%}):")
+    for section in ("endpoints", "nodes"):
+        for name, row in results[section].items():
+            before = baseline.get(section, {}).get(name)
+            if not before:
+                continue
+            for key in ("p50_ms", "p95_ms"):
+                change = (row[key] - before[key]) / before[key] if before[key] else 0.0
+                flag = "REGRESSED" if change > tolerance else ""
+                regressed = regressed or bool(flag)
+                print(f"  {name:<28}{key:<8}{before[key]:>10}{row[key]:>10}{change:>+9.1%} {flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--conversations", type=int, default=40)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--endpoint", choices=["chat", "stream", "both"], default="both")
+    parser.add_argument("--llm-latency", type=parse_latency, default=parse_latency("lognormal:700:300"))
+    parser.add_argument("--embed-latency", type=parse_latency, default=parse_latency("normal:60:20"))
+    parser.add_argument("--murf-latency", type=parse_latency, default=parse_latency("lognormal:400:200"))
+    parser.add_argument("--murf-error-rate", type=float, default=0.0)
+    parser.add_argument("--catalog", help="CSV/JSONL catalog to ingest instead of the bundled sample")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file from a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed p50/p95 slowdown vs. the baseline")
+    args = parser.parse_args()
+
+    from bench import murf_stub
+    murf_port, app_port = free_port(), free_port()
+    configure_environment(murf_port)
+    murf_stub.start_in_thread(port=murf_port, latency=args.murf_latency, error_rate=args.murf_error_rate)
+
+    import config
+    config.set_llm(ScriptedChatModel(latency=args.llm_latency))
+    config.set_embeddings_model(FakeEmbeddings(latency=args.embed_latency))
+
+    import ingest
+    import main as app_main
+    ingest.ingest_catalog(args.catalog or ingest.SAMPLE_CATALOG_PATH)
+    timer = NodeTimer()
+    app_main.chatbot_graph = TimedGraph(app_main.chatbot_graph, timer)
+    start_app(app_port)
+
+    endpoints = ["chat", "stream"] if args.endpoint == "both" else [args.endpoint]
+    samples, errors, elapsed = asyncio.run(drive(app_port, args.conversations, args.concurrency, endpoints, args.seed))
+
+    turns = sum(len(v) for k, v in samples.items() if k in ("/chat", "/chat/stream total"))
+    results = {
+        "settings": {k: (repr(v) if isinstance(v, Latency) else v) for k, v in vars(args).items()},
+        "throughput_turns_per_s": round(turns / elapsed, 2) if elapsed else 0.0,
+        "errors": dict(errors),
+        "endpoints": {name: summarize(values) for name, values in sorted(samples.items()) if values},
+        "nodes": {name: summarize(values) for name, values in sorted(timer.samples.items()) if values},
+    }
+    print(f"{turns} turns in {elapsed:.1f}s ({results['throughput_turns_per_s']} turns/s), errors: {dict(errors) or 0}")
+    print_table("Per endpoint", results["endpoints"])
+    print_table("Per graph node", results["nodes"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            if compare(results, json.load(f), args.tolerance):
+                sys.exit(1)
+
+if __name__ == "__main__":
+    main()
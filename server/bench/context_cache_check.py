@@ -0,0 +1,167 @@
+"""
+Offline check of the Gemini context cache (context_cache.py) against a fake cache service, a fake
+model and a fake clock: the shipped prompt prefixes are below the minimum and never cached, the real
+agent tools and FinalAnswer convert to Gemini function declarations, and a large enough prefix is created once, hit, refreshed near expiry, backed off after a failed creation
+and invalidated, with a fallback to the full prompt, when a cached call fails. No network needed.
+
+    python -m bench.context_cache_check
+
+Exits 1 if any check fails.
+"""
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from bench.chat_load import configure_environment, free_port
+# Nothing that imports `config` may be imported at module level: configure_environment() runs first.
+
+TTL_SECONDS = 3600
+RETRY_SECONDS = 600
+
+class FakeCacheService:
+    """Stands in for CacheServiceClient: records every creation, optionally failing them."""
+
+    def __init__(self):
+        self.created = []
+        self.fail = False
+
+    def create_cached_content(self, cached_content, timeout=None):
+        if self.fail:
+            raise RuntimeError("429 quota exceeded")
+        self.created.append(cached_content)
+        return SimpleNamespace(name=f"cachedContents/fake-{len(self.created)}")
+
+class FakeGemini:
+    """Just enough of ChatGoogleGenerativeAI for the cache: `model`, `cached_content` and `ainvoke`."""
+
+    def __init__(self):
+        self.model = "gemini-2.5-flash"
+        self.cached_content = None
+        self.calls = []
+        self.reject_cache = False
+
+    async def ainvoke(self, messages, cached_content=None):
+        self.calls.append((messages, cached_content))
+        if cached_content and self.reject_cache:
+            raise RuntimeError("403 CachedContent not found")
+        return AIMessage(content="ok")
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+failures = []
+
+def check(condition: bool, message: str):
+    print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        failures.append(message)
+
+async def run_checks():
+    import context_cache
+    from agent import tools
+    from schemas import FinalAnswer
+    from config import CONTEXT_CACHE_MIN_TOKENS
+    from prompts import agent_prefix, formatter_prefix
+
+    clock = FakeClock()
+    context_cache.time = clock
+    llm = FakeGemini()
+
+    service = FakeCacheService()
+    shipped = context_cache.ContextCache(TTL_SECONDS, CONTEXT_CACHE_MIN_TOKENS, RETRY_SECONDS, client=service)
+    agent_name = await shipped.get(llm, "agent", "en-US", agent_prefix("en-US", False), tools)
+    formatter_name = await shipped.get(llm, "final_answer_formatter", "en-US", formatter_prefix("en-US"), [])
+    await shipped.get(llm, "agent", "en-US", agent_prefix("en-US", False), tools)
+    check(agent_name is None and formatter_name is None and not service.created,
+          f"shipped prefixes are below {CONTEXT_CACHE_MIN_TOKENS} tokens and not cached")
+    check(shipped.stats()["below_minimum"] == 2 and shipped.misses == 2,
+          "a prefix below the minimum is sized once, then skipped")
+    check(await shipped.get(SimpleNamespace(model="gpt-4o"), "agent", "en-US", "x" * 10_000, []) is None,
+          "models without cached_content are never cached")
+
+    prefix = "You are a sales assistant. " * 200
+    cache = context_cache.ContextCache(TTL_SECONDS, 1024, RETRY_SECONDS, client=service)
+    names = await asyncio.gather(*(cache.get(llm, "agent", "en-US", prefix, tools) for _ in range(5)))
+    check(len(set(names)) == 1 and names[0] is not None and len(service.created) == 1,
+          "concurrent calls on a cold prefix create one cache")
+    request = service.created[0]
+    check(request.system_instruction.parts[0].text == prefix and request.model == "models/gemini-2.5-flash",
+          "the cache holds the prefix as the system instruction for the model")
+    check([d.name for d in request.tools[0].function_declarations] == [t.name for t in tools],
+          "the cache holds the agent's tool declarations")
+    check(await cache.get(llm, "agent", "es-ES", prefix, tools) != names[0] and len(service.created) == 2,
+          "each language gets its own cache")
+
+    single_call = context_cache.ContextCache(TTL_SECONDS, 0, RETRY_SECONDS, client=FakeCacheService())
+    single_call._create(llm.model, "agent", "en-US", prefix, tools + [FinalAnswer])
+    declarations = {d.name: d for d in single_call._client.created[0].tools[0].function_declarations}
+    final_answer = declarations.get("FinalAnswer")
+    check(list(declarations) == [t.name for t in tools] + ["FinalAnswer"] and final_answer is not None
+          and list(final_answer.parameters.required) == ["text"]
+          and final_answer.parameters.properties["deal_price"].nullable
+          and final_answer.parameters.properties["product_ids"].items.type_.name == "STRING",
+          "the real agent tools and FinalAnswer convert to Gemini declarations")
+
+    clock.now += TTL_SECONDS * 0.5
+    check(await cache.get(llm, "agent", "en-US", prefix, tools) == names[0] and len(service.created) == 2,
+          "a live cache is reused")
+    clock.now += TTL_SECONDS * 0.45
+    refreshed = await cache.get(llm, "agent", "en-US", prefix, tools)
+    check(refreshed not in (None, names[0]) and len(service.created) == 3,
+          "a cache with under a tenth of its TTL left is replaced")
+
+    service.fail = True
+    clock.now += TTL_SECONDS
+    failed = await cache.get(llm, "agent", "en-US", prefix, tools)
+    clock.now += RETRY_SECONDS / 2
+    during_backoff = await cache.get(llm, "agent", "en-US", prefix, tools)
+    check(failed is None and during_backoff is None and cache.failures == 1,
+          "a failed creation returns None and is not retried during the backoff")
+    service.fail = False
+    clock.now += RETRY_SECONDS
+    check(await cache.get(llm, "agent", "en-US", prefix, tools) is not None,
+          "creation is retried after the backoff")
+
+    context_cache._context_cache = cache
+    import config
+    config.set_llm(llm)
+    llm.calls.clear()
+    uncached_prompts = []
+
+    async def uncached(system_prompt):
+        uncached_prompts.append(system_prompt)
+        return AIMessage(content="full prompt")
+
+    question = [HumanMessage(content="Show me phones")]
+    result, used = await context_cache.invoke_with_prefix("agent", "en-US", prefix, "Context: none", question, tools, uncached)
+    messages, name = llm.calls[-1]
+    check(used and name is not None and messages[0].content == "Context: none" and messages[1:] == question
+          and not uncached_prompts, "a cached call sends only the context block and the conversation")
+
+    llm.reject_cache = True
+    result, used = await context_cache.invoke_with_prefix("agent", "en-US", prefix, "Context: none", question, tools, uncached)
+    check(not used and result.content == "full prompt" and uncached_prompts == [prefix + "Context: none"],
+          "a failed cached call falls back to the full prompt")
+    created = len(service.created)
+    llm.reject_cache = False
+    await context_cache.invoke_with_prefix("agent", "en-US", prefix, "Context: none", question, tools, uncached)
+    check(len(service.created) == created + 1 and llm.calls[-1][1] not in (None, name),
+          "the rejected cache is invalidated and recreated on the next call")
+
+def main():
+    configure_environment(free_port())
+    os.environ["CONTEXT_CACHE_ENABLED"] = "true"
+    asyncio.run(run_checks())
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
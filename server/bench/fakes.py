@@ -0,0 +1,199 @@
+"""
+Local stand-ins for Gemini used by the offline benchmarks: a scripted chat model that calls the
+agent's tools like the real one would, and deterministic embeddings. Both sleep according to a
+configurable latency distribution so timings resemble the real services.
+
+    from bench.fakes import Latency, ScriptedChatModel, FakeEmbeddings
+    config.set_llm(ScriptedChatModel(latency=Latency("lognormal", 800, 300)))
+    config.set_embeddings_model(FakeEmbeddings(latency=Latency("normal", 60, 20)))
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from prompts import PRODUCT_IDS_MARKER
+
+DISTRIBUTIONS = ("fixed", "normal", "lognormal", "exponential", "uniform")
+
+class Latency:
+    """Latency distribution in milliseconds, parameterized by its mean and spread."""
+
+    def __init__(self, distribution: str = "normal", mean_ms: float = 0.0, spread_ms: float = 0.0):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}' (expected one of {DISTRIBUTIONS})")
+        self.distribution = distribution
+        self.mean_ms = mean_ms
+        self.spread_ms = spread_ms
+
+    def sample_seconds(self) -> float:
+        mean, spread = self.mean_ms, self.spread_ms
+        if mean <= 0:
+            return 0.0
+        if self.distribution == "fixed":
+            value = mean
+        elif self.distribution == "normal":
+            value = random.gauss(mean, spread)
+        elif self.distribution == "lognormal":
+            # Long right tail like real API latencies; parameters chosen so the mean is `mean`.
+            sigma = np.sqrt(np.log(1 + (spread / mean) ** 2))
+            value = random.lognormvariate(np.log(mean) - sigma ** 2 / 2, sigma)
+        elif self.distribution == "exponential":
+            value = random.expovariate(1 / mean)
+        else:
+            value = random.uniform(max(0.0, mean - spread), mean + spread)
+        return max(0.0, value) / 1000
+
+    def __repr__(self):
+        return f"Latency({self.distribution!r}, {self.mean_ms}, {self.spread_ms})"
+
+PRODUCT_WORDS = re.compile(r"phone|mobile|iphone|galaxy|pixel|samsung|apple|camera|battery|gb|under|budget", re.I)
+DEAL_WORDS = re.compile(r"deal|discount|offer|cheaper|price|buy", re.I)
+
+def _usage(messages, output_tokens: int = 30) -> dict:
+    prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+    return {"input_tokens": prompt_tokens, "output_tokens": output_tokens, "total_tokens": prompt_tokens + output_tokens}
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model that follows a fixed script instead of calling Gemini. A product question calls
+    `find_product`, a deal question about known products calls `get_deal`, and once tool results
+    are in it answers with `FinalAnswer` (when bound) or plain text for the formatter. As the
+    formatter it replies with text and a PRODUCT_IDS line.
+    """
+    latency: Any = None
+    bound_tools: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        names = [getattr(t, "name", None) or getattr(t, "__name__", str(t)) for t in tools]
+        return self.model_copy(update={"bound_tools": names})
+
+    def _respond(self, messages) -> AIMessage:
+        last = messages[-1]
+        human = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        products = _products_in(messages) or _context_products(messages)
+        if isinstance(last, HumanMessage):
+            if DEAL_WORDS.search(human) and products and "get_deal" in self.bound_tools:
+                return self._tool_call("get_deal", {"conversation_context": human, "product_ids": products[:2]}, messages)
+            if PRODUCT_WORDS.search(human) and "find_product" in self.bound_tools:
+                return self._tool_call("find_product", {"query": human}, messages)
+        if _is_formatter(messages):
+            text = f"Here are the best matches for you.\n{PRODUCT_IDS_MARKER} {', '.join(_products_in(messages))}"
+            return AIMessage(content=text, usage_metadata=_usage(messages))
+        text = f"Here is what I found for '{human[:60]}'. Let me know if you want a deal on any of these."
+        if "FinalAnswer" in self.bound_tools:
+            return self._tool_call("FinalAnswer", {"text": text, "product_ids": _products_in([last])}, messages)
+        return AIMessage(content=text, usage_metadata=_usage(messages))
+
+    def _tool_call(self, name: str, args: dict, messages) -> AIMessage:
+        call_id = f"call_{name}_{hashlib.sha1(json.dumps(args, sort_keys=True).encode()).hexdigest()[:8]}"
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": call_id}],
+                         usage_metadata=_usage(messages, 20))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency.sample_seconds())
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency.sample_seconds())
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        """
+        Streams the reply like Gemini: time to first token, then plain text in pieces. Tool calls,
+        FinalAnswer included, arrive whole in one chunk, as Gemini returns function call arguments.
+        """
+        message = self._respond(messages)
+        total = self.latency.sample_seconds() if self.latency else 0.0
+        await asyncio.sleep(total * 0.4)
+        if message.tool_calls or not message.content:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=message.content, tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                    for i, c in enumerate(message.tool_calls)],
+                usage_metadata=message.usage_metadata))
+            return
+        pieces = [message.content[i:i + 12] for i in range(0, len(message.content), 12)]
+        for index, piece in enumerate(pieces):
+            await asyncio.sleep(total * 0.6 / len(pieces))
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=piece, usage_metadata=message.usage_metadata if index == 0 else None))
+
+def _is_formatter(messages) -> bool:
+    return any(isinstance(m, SystemMessage) and PRODUCT_IDS_MARKER in m.content for m in messages)
+
+def _table_ids(text: str) -> List[str]:
+    """Product IDs in a compact product table (tools.product_table)."""
+    ids = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("Also matching"):
+            ids.extend(part.strip() for part in line.split(":", 1)[1].split(","))
+        elif "|" in line and not line.startswith("id|"):
+            ids.append(line.split("|", 1)[0])
+    return ids
+
+def _products_in(messages) -> List[str]:
+    """Product IDs found in tool results (find_product lists or tables, get_deal product_ids), most recent first."""
+    ids: List[str] = []
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            continue
+        try:
+            result = json.loads(message.content)
+        except (TypeError, ValueError):
+            result = _table_ids(str(message.content))
+        if isinstance(result, dict):
+            found = result.get("product_ids", [])
+        else:
+            found = [item.get("ID") if isinstance(item, dict) else item for item in result]
+        ids.extend(product_id for product_id in found if product_id and product_id not in ids)
+    return ids
+
+def _context_products(messages) -> List[str]:
+    """Product IDs on the "Current Product Context" line of the agent's system prompt."""
+    for message in messages:
+        if isinstance(message, SystemMessage) and "Current Product Context:" in message.content:
+            context = message.content.split("Current Product Context:", 1)[1].split("\n", 1)[0]
+            return [pid for pid in re.split(r"[\s,'\[\]]+", context) if pid and pid != "None"]
+    return []
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic unit vectors derived from a hash of the text, with simulated API latency."""
+
+    def __init__(self, size: int = 768, latency: Optional[Latency] = None):
+        self.size = size
+        self.latency = latency
+        self.model = "fake-embeddings"
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency.sample_seconds())
+
+    def embed_query(self, text: str) -> List[float]:
+        self._wait()
+        return self._vector(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._wait()
+        return [self._vector(text) for text in texts]
@@ -0,0 +1,74 @@
+"""
+Measures worker cold start: wall time to `import main` and then answer `/health`, each in a
+fresh interpreter. Pass --baseline-ref to measure an older commit the same way for comparison
+(it is exported with `git archive`, so the working tree is untouched).
+
+    python -m bench.import_time -n 5 --baseline-ref e308009
+
+No API keys or network are needed for the current tree; a baseline that builds clients or
+provisions the index at import will show up as slow or failing.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter; prints seconds to import main and to the first /health.
+PROBE = """
+import time
+started = time.perf_counter()
+import main
+imported = time.perf_counter() - started
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+status = client.get("/health").status_code
+print(imported, time.perf_counter() - started, status)
+"""
+
+def measure(server_dir: str, runs: int, timeout: float):
+    env = {**os.environ, "SEED_SAMPLE_DATA": "false"}
+    # Dummy keys so older trees that require them at import get as far as they can.
+    for key in ("MURF_API_KEY", "MURF_VOICE_ID", "GOOGLE_API_KEY", "PINECONE_API_KEY"):
+        env.setdefault(key, "bench")
+    imports, ready, statuses = [], [], set()
+    for _ in range(runs):
+        try:
+            result = subprocess.run([sys.executable, "-c", PROBE], cwd=server_dir, env=env,
+                                    capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return None, f"timed out after {timeout}s"
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+        imported, first_response, status = result.stdout.strip().splitlines()[-1].split()
+        imports.append(float(imported))
+        ready.append(float(first_response))
+        statuses.add(status)
+    return (statistics.median(imports), statistics.median(ready), ",".join(sorted(statuses))), None
+
+def export_ref(ref: str, destination: str) -> str:
+    repo_root = os.path.dirname(SERVER_DIR)
+    archive = subprocess.run(["git", "archive", ref], cwd=repo_root, capture_output=True, check=True)
+    subprocess.run(["tar", "-x", "-C", destination], input=archive.stdout, check=True)
+    return os.path.join(destination, os.path.basename(SERVER_DIR))
+
+def report(label: str, timings, error):
+    if error:
+        print(f"{label:<10} failed: {error}")
+    else:
+        print(f"{label:<10} import main: {timings[0] * 1000:8.1f} ms   first /health: {timings[1] * 1000:8.1f} ms (HTTP {timings[2]})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--runs", type=int, default=5, help="fresh interpreters per tree (median reported)")
+    parser.add_argument("--baseline-ref", help="git ref to compare against")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    report("current", *measure(SERVER_DIR, args.runs, args.timeout))
+    if args.baseline_ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            report(args.baseline_ref, *measure(export_ref(args.baseline_ref, tmp), args.runs, args.timeout))
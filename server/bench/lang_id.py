@@ -0,0 +1,92 @@
+"""
+Accuracy and speed of language detection on a labeled set of shopper messages
+(bench/lang_id_samples.jsonl), compared with the per-language regex scan it replaced.
+
+    python -m bench.lang_id
+    python -m bench.lang_id --samples my_samples.jsonl --min-accuracy 0.95   # exits 1 below it
+
+Reports accuracy per language, the confusions, how often the guess was confident enough to be
+used, and microseconds per message (uncached) for both detectors. The first pass starts with an
+empty per-word score table; later rounds reuse it, as a running server does.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+
+from language_id import LANGUAGE_MIN_CONFIDENCE, _ngram_model, detect_language
+
+SAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lang_id_samples.jsonl")
+
+# The detector main.py used before language_id: the first pattern that matches anywhere wins.
+_LEGACY_PATTERNS = {
+    'hi-IN': r'[\u0900-\u097F]', 'ko-KR': r'[\uAC00-\uD7AF]', 'ja-JP': r'[\u3040-\u309F\u30A0-\u30FF]',
+    'zh-CN': r'[\u4E00-\u9FFF]', 'es-ES': r'[áéíóúñ¿¡]', 'fr-FR': r'[àâçéèêëîïôûùüÿœæ]', 'de-DE': r'[äöüß]',
+    'it-IT': r'[àèéìíîòóùú]', 'pt-BR': r'[ãõâêîôûáéíóúç]', 'ar-SA': r'[\u0600-\u06FF]',
+    'ta-IN': r'[\u0B80-\u0BFF]', 'bn-IN': r'[\u0980-\u09FF]', 'pl-PL': r'[ąćęłńóśźż]',
+}
+
+def legacy_detect(text: str) -> str:
+    for language, pattern in _LEGACY_PATTERNS.items():
+        if re.search(pattern, text, re.IGNORECASE):
+            return language
+    return 'en-US'
+
+def load_samples(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def time_per_message_us(detect, texts, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            detect(text)
+    return (time.perf_counter() - started) / (rounds * len(texts)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", default=SAMPLES_PATH)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--min-accuracy", type=float, default=0.0)
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    texts = [sample["text"] for sample in samples]
+    per_language = defaultdict(lambda: [0, 0, 0])  # correct, legacy correct, total
+    confusions = Counter()
+    confident = 0
+    for sample in samples:
+        guess = detect_language(sample["text"])
+        row = per_language[sample["language"]]
+        row[0] += guess.language == sample["language"]
+        row[1] += legacy_detect(sample["text"]) == sample["language"]
+        row[2] += 1
+        confident += guess.confidence >= LANGUAGE_MIN_CONFIDENCE
+        if guess.language != sample["language"]:
+            confusions[(sample["language"], guess.language)] += 1
+
+    print(f"  {'language':<10}{'samples':>9}{'accuracy':>10}{'legacy':>10}")
+    for language, (correct, legacy, total) in sorted(per_language.items()):
+        print(f"  {language:<10}{total:>9}{correct / total:>10.0%}{legacy / total:>10.0%}")
+    correct = sum(row[0] for row in per_language.values())
+    legacy = sum(row[1] for row in per_language.values())
+    accuracy = correct / len(samples)
+    print(f"  {'all':<10}{len(samples):>9}{accuracy:>10.1%}{legacy / len(samples):>10.1%}")
+    print(f"\nConfident (>= {LANGUAGE_MIN_CONFIDENCE}): {confident / len(samples):.0%} of samples")
+    for (expected, got), count in confusions.most_common():
+        print(f"  {expected} -> {got}: {count}")
+
+    uncached = detect_language.__wrapped__
+    _ngram_model.clear_word_scores()
+    first_pass = time_per_message_us(uncached, texts, 1)
+    print(f"\nPer message: {time_per_message_us(uncached, texts, args.rounds):.1f} us, first pass {first_pass:.1f} us "
+          f"(legacy {time_per_message_us(legacy_detect, texts, args.rounds):.1f} us)")
+
+    if accuracy < args.min_accuracy:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
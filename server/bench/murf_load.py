@@ -0,0 +1,55 @@
+"""
+Fires concurrent synthesis requests through the shared `MurfClient` and reports throughput
+and latency percentiles. Intended to run against `bench.murf_stub`:
+
+    python -m bench.murf_load --url http://127.0.0.1:8100/v1/speech/generate -n 500 -c 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from murf_client import MurfClient, MurfError
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run(url: str, total: int, concurrency: int, max_per_host: int):
+    client = MurfClient(api_key="stub", url=url, max_concurrency_per_host=max_per_host)
+    gate = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(i: int):
+        nonlocal failures
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await client.generate({"text": f"Load test sentence number {i}.", "voiceId": "en-US-natalie"})
+                latencies.append(time.perf_counter() - start)
+            except MurfError:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+
+    print(f"requests: {total}  ok: {len(latencies)}  failed: {failures}  wall: {elapsed:.2f}s  "
+          f"throughput: {total / elapsed:.1f} req/s")
+    if latencies:
+        print(f"latency ms  mean: {statistics.mean(latencies) * 1000:.1f}  "
+              f"p50: {percentile(latencies, 50) * 1000:.1f}  p95: {percentile(latencies, 95) * 1000:.1f}  "
+              f"p99: {percentile(latencies, 99) * 1000:.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8100/v1/speech/generate")
+    parser.add_argument("-n", "--requests", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=50)
+    parser.add_argument("--max-per-host", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency, args.max_per_host))
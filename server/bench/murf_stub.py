@@ -0,0 +1,84 @@
+"""
+Local stand-in for Murf's `/v1/speech/generate` endpoint, for load-testing without burning quota.
+
+    python -m bench.murf_stub --port 8100 --latency-ms 400 --jitter-ms 150 --error-rate 0.05
+    python -m bench.murf_stub --distribution lognormal --latency-ms 600 --jitter-ms 400
+
+Then point the server at it with `MURF_API_URL=http://127.0.0.1:8100/v1/speech/generate`.
+"""
+import argparse
+import asyncio
+import base64
+import random
+import threading
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from bench.fakes import DISTRIBUTIONS, Latency
+
+# A single silent MPEG-1 Layer III frame; good enough for players and byte-level tests.
+SILENT_MP3_FRAME = bytes.fromhex("fffb9064") + bytes(413)
+
+class StubSettings:
+    latency: Latency = Latency("normal", 300.0, 100.0)
+    error_rate: float = 0.0
+
+settings = StubSettings()
+app = FastAPI(title="Murf stub")
+
+@app.post("/v1/speech/generate")
+async def generate(request: Request):
+    payload = await request.json()
+    await asyncio.sleep(settings.latency.sample_seconds())
+
+    if random.random() < settings.error_rate:
+        status = random.choice([429, 503])
+        return JSONResponse({"errorMessage": "stubbed failure"}, status_code=status, headers={"Retry-After": "0"})
+
+    text = payload.get("text", "")
+    audio_id = uuid.uuid4().hex
+    body = {
+        "audioFile": str(request.base_url) + f"audio/{audio_id}.mp3",
+        "audioLengthInSeconds": round(len(text) / 15, 2),
+        "consumedCharacterCount": len(text),
+        "remainingCharacterCount": 1_000_000,
+        "warning": None,
+    }
+    if payload.get("encodeAsBase64"):
+        body["encodedAudio"] = base64.b64encode(SILENT_MP3_FRAME).decode()
+    return body
+
+@app.get("/audio/{audio_id}.mp3")
+async def audio(audio_id: str):
+    return Response(SILENT_MP3_FRAME, media_type="audio/mpeg")
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 8100, latency: Latency = None, error_rate: float = 0.0):
+    """Runs the stub in a daemon thread (for in-process benchmarks) and returns once it accepts requests."""
+    import uvicorn
+
+    if latency is not None:
+        settings.latency = latency
+    settings.error_rate = error_rate
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default=settings.latency.distribution)
+    parser.add_argument("--latency-ms", type=float, default=settings.latency.mean_ms, help="mean latency")
+    parser.add_argument("--jitter-ms", type=float, default=settings.latency.spread_ms, help="standard deviation / spread")
+    parser.add_argument("--error-rate", type=float, default=settings.error_rate)
+    args = parser.parse_args()
+
+    settings.latency = Latency(args.distribution, args.latency_ms, args.jitter_ms)
+    settings.error_rate = args.error_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
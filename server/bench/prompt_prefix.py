@@ -0,0 +1,111 @@
+"""
+Checks that the agent and formatter system prompts start with a byte-identical static prefix on
+every call of a multi-turn, two-language conversation, so provider prefix caching and context
+caches can hit. Runs the real chat turn in-process with the scripted fake model (in two_call
+graph mode by default, so the formatter runs too) and records every system prompt sent.
+
+    python -m bench.prompt_prefix
+    python -m bench.prompt_prefix --graph-mode single_call
+
+Exits 1 if any prompt doesn't start with its prefix from prompts.py, or calls of the same node
+and language diverge before the end of it.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from collections import defaultdict
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import SystemMessage
+
+from bench.chat_load import TimedGraph, configure_environment, free_port
+from bench.fakes import FakeEmbeddings, ScriptedChatModel
+from bench.prompt_tokens import CONVERSATION as ENGLISH_TURNS
+# Nothing that imports `config` may be imported at module level: configure_environment() runs first.
+
+SPANISH_TURNS = [
+    "Hola, busco un móvil Samsung con buena cámara",
+    "¿Cuál de estos tiene la batería más grande?",
+    "¿Hay algún descuento si compro el primero?",
+]
+
+class SystemPromptRecorder(BaseCallbackHandler):
+    """Collects (graph node, system prompt) for every chat model call."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def on_chat_model_start(self, serialized, messages, *, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node", "?")
+        for batch in messages:
+            system = next((m.content for m in batch if isinstance(m, SystemMessage)), "")
+            self.prompts.append((node, system))
+
+def common_prefix_length(values) -> int:
+    first, length = values[0], min(len(value) for value in values)
+    for index in range(length):
+        if any(value[index] != first[index] for value in values):
+            return index
+    return length
+
+async def run_conversations(recorder: SystemPromptRecorder):
+    import agent
+    import main
+    from schemas import ChatRequest
+
+    main.chatbot_graph = TimedGraph(agent.chatbot_graph, recorder)
+    for turns in (ENGLISH_TURNS, SPANISH_TURNS):
+        session_id = None
+        for message in turns:
+            response = await main.run_chat_turn(ChatRequest(user_message=message, session_id=session_id, audio_mode="none"))
+            session_id = response.session_id
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graph-mode", choices=["two_call", "single_call"], default="two_call")
+    args = parser.parse_args()
+
+    configure_environment(free_port())
+    os.environ["AGENT_GRAPH_MODE"] = args.graph_mode
+    import config
+    config.set_llm(ScriptedChatModel())
+    config.set_embeddings_model(FakeEmbeddings())
+    import ingest
+    ingest.ingest_catalog(ingest.SAMPLE_CATALOG_PATH)
+    from agent import SINGLE_CALL
+    from prompts import agent_prefix, formatter_prefix
+    from tts import LANGUAGE_VOICE_MAP
+
+    expected = {}
+    for language in LANGUAGE_VOICE_MAP:
+        expected[("agent", language)] = agent_prefix(language, SINGLE_CALL).encode("utf-8")
+        expected[("final_answer_formatter", language)] = formatter_prefix(language).encode("utf-8")
+
+    recorder = SystemPromptRecorder()
+    asyncio.run(run_conversations(recorder))
+
+    groups, failures = defaultdict(list), 0
+    for node, prompt in recorder.prompts:
+        encoded = prompt.encode("utf-8")
+        group = next((key for key, prefix in expected.items() if key[0] == node and encoded.startswith(prefix)), None)
+        if group is None:
+            failures += 1
+            print(f"  {node}: prompt does not start with a static prefix: {prompt[:80]!r}")
+        else:
+            groups[group].append(encoded)
+
+    print(f"  {'node':<24}{'language':<10}{'calls':>6}{'prefix':>8}{'shared':>8}{'static':>8}   (bytes)")
+    for (node, language), prompts in sorted(groups.items()):
+        prefix = len(expected[(node, language)])
+        shared = common_prefix_length(prompts)
+        static = prefix / (sum(map(len, prompts)) / len(prompts))
+        flag = "" if shared >= prefix else "  DIVERGES INSIDE THE PREFIX"
+        failures += bool(flag)
+        print(f"  {node:<24}{language:<10}{len(prompts):>6}{prefix:>8}{shared:>8}{static:>8.0%}{flag}")
+
+    if failures or not groups:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Prompt size of a 10-turn shopping conversation with find_product results sent to the model as
+raw JSON (TOOL_RESULT_FORMAT=json, the old format) and as compact tables. Runs the real chat
+turn in-process with the scripted fake model, fake embeddings and the bundled sample catalog.
+Tokens are estimated at 4 characters per token, like the fake model's usage: the whole prompt
+of every model call, and the part of it that is tool results.
+
+    python -m bench.prompt_tokens
+    python -m bench.prompt_tokens --min-reduction 0.3   # exits 1 if tool results shrink less than 30%
+"""
+import argparse
+import asyncio
+import sys
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import ToolMessage
+
+from bench.chat_load import TimedGraph, configure_environment, free_port
+from bench.fakes import FakeEmbeddings, ScriptedChatModel
+# Nothing that imports `config` may be imported at module level: configure_environment() runs first.
+
+CONVERSATION = [
+    "Hi, I need a new phone with a great camera",
+    "Show me Samsung phones under 120000",
+    "Which of these has the biggest battery?",
+    "Any discount if I buy the first one?",
+    "What about an iPhone with 256GB storage?",
+    "Compare it with the Samsung camera phones",
+    "Is there a better deal on the iPhone?",
+    "Show me budget phones with 8GB RAM",
+    "Can I get an offer on two of them?",
+    "Thanks, that's all for today.",
+]
+
+class ToolResultCounter(BaseCallbackHandler):
+    """Characters of tool results in the prompts of the model calls it sees."""
+
+    def __init__(self):
+        self.chars = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.chars += sum(len(str(m.content)) for batch in messages for m in batch if isinstance(m, ToolMessage))
+
+async def run_conversation(compact: bool):
+    """Prompt and tool-result tokens per turn of one pass through CONVERSATION in a fresh session."""
+    import agent
+    import main
+    from schemas import ChatRequest
+
+    agent.COMPACT_TOOL_RESULTS = compact
+    counter = ToolResultCounter()
+    main.chatbot_graph = TimedGraph(agent.chatbot_graph, counter)
+    session_id, turns = None, []
+    for message in CONVERSATION:
+        counter.chars = 0
+        response = await main.run_chat_turn(ChatRequest(user_message=message, session_id=session_id, audio_mode="none"))
+        session_id = response.session_id
+        turns.append((response.usage["prompt_tokens"], counter.chars // 4))
+    return turns
+
+def saved(before: int, after: int) -> str:
+    return f"{1 - after / before:.0%}" if before else "-"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog", help="CSV/JSONL catalog to ingest instead of the bundled sample")
+    parser.add_argument("--min-reduction", type=float, default=0.0)
+    args = parser.parse_args()
+
+    configure_environment(free_port())
+    import config
+    config.set_llm(ScriptedChatModel())
+    config.set_embeddings_model(FakeEmbeddings())
+    import ingest
+    ingest.ingest_catalog(args.catalog or ingest.SAMPLE_CATALOG_PATH)
+
+    before = asyncio.run(run_conversation(compact=False))
+    after = asyncio.run(run_conversation(compact=True))
+
+    print(f"  {'turn':<6}{'prompt json':>13}{'compact':>9}{'saved':>7}{'tool results json':>19}{'compact':>9}{'saved':>7}")
+    for index, ((prompt_before, tools_before), (prompt_after, tools_after)) in enumerate(zip(before, after), 1):
+        print(f"  {index:<6}{prompt_before:>13}{prompt_after:>9}{saved(prompt_before, prompt_after):>7}"
+              f"{tools_before:>19}{tools_after:>9}{saved(tools_before, tools_after):>7}")
+    prompt_before, tools_before = map(sum, zip(*before))
+    prompt_after, tools_after = map(sum, zip(*after))
+    print(f"  {'all':<6}{prompt_before:>13}{prompt_after:>9}{saved(prompt_before, prompt_after):>7}"
+          f"{tools_before:>19}{tools_after:>9}{saved(tools_before, tools_after):>7}")
+    print("  (estimated tokens, 4 characters each)")
+
+    reduction = 1 - tools_after / tools_before if tools_before else 0.0
+    if reduction < args.min_reduction:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
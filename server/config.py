@@ -1,6 +1,7 @@
 import os
+import threading
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from embedding_cache import CachedEmbeddings
 
 load_dotenv()
 
@@ -14,23 +15,237 @@ def get_env_variable(var_name: str, default: str = None) -> str:
     return value
 
 # --- API Keys ---
-MURF_API_KEY = get_env_variable("MURF_API_KEY")
-MURF_VOICE_ID = get_env_variable("MURF_VOICE_ID")
-GOOGLE_API_KEY = get_env_variable("GOOGLE_API_KEY")
-PINECONE_API_KEY = get_env_variable("PINECONE_API_KEY")
+# Checked when the client that needs them is first used, so the app imports (and /health answers)
+# without them.
+MURF_API_KEY = get_env_variable("MURF_API_KEY", "")
+MURF_VOICE_ID = get_env_variable("MURF_VOICE_ID", "en-US-natalie")
+GOOGLE_API_KEY = get_env_variable("GOOGLE_API_KEY", "")
+PINECONE_API_KEY = get_env_variable("PINECONE_API_KEY", "")
 
 # --- Pinecone Settings ---
 PINECONE_INDEX_NAME = get_env_variable("PINECONE_INDEX_NAME", "mobile-phones")
+# Data-plane host of the index (shown by `python admin.py provision-index`); skips a describe_index lookup.
+PINECONE_INDEX_HOST = get_env_variable("PINECONE_INDEX_HOST", "")
 PINECONE_EMBEDDING_DIMENSION = 768
 
+# --- Vector Store Backend ---
+# "pinecone" queries the hosted index; "local" keeps the catalog in an in-process NumPy index.
+VECTOR_STORE_BACKEND = get_env_variable("VECTOR_STORE_BACKEND", "pinecone").lower()
+LOCAL_INDEX_DIR = get_env_variable("LOCAL_INDEX_DIR", ".vector_index")
+LOCAL_INDEX_MMAP = get_env_variable("LOCAL_INDEX_MMAP", "false").lower() == "true"
+
+# --- Agent Graph ---
+# "single_call": the agent may emit FinalAnswer itself and the formatter only runs as a fallback.
+# "two_call": every turn ends with a separate formatter call that writes the reply as plain text.
+# Gemini returns function call arguments in one piece, so only formatter replies stream token by token.
+AGENT_GRAPH_MODE = get_env_variable("AGENT_GRAPH_MODE", "single_call").lower()
+
+# --- Context Caching ---
+# Keep the static prefix of the agent and formatter prompts (per model and language) in a Gemini
+# context cache, so each call sends only the dynamic context and the conversation. Gemini rejects
+# caches below a minimum size, so smaller prefixes are never cached; a failed creation is retried
+# after CONTEXT_CACHE_RETRY_SECONDS. Calls fall back to the full prompt whenever there is no cache.
+# The shipped prefixes are well below the minimum (about 470-630 estimated tokens for the agent with
+# its tools, 160 for the formatter), so even when enabled the cache stays inert until the prompts grow;
+# /context-cache/stats counts them under below_minimum. Lowering MIN_TOKENS only makes Gemini reject them.
+CONTEXT_CACHE_ENABLED = get_env_variable("CONTEXT_CACHE_ENABLED", "false").lower() == "true"
+CONTEXT_CACHE_TTL_SECONDS = int(get_env_variable("CONTEXT_CACHE_TTL_SECONDS", "3600"))
+CONTEXT_CACHE_MIN_TOKENS = int(get_env_variable("CONTEXT_CACHE_MIN_TOKENS", "1024"))
+CONTEXT_CACHE_RETRY_SECONDS = float(get_env_variable("CONTEXT_CACHE_RETRY_SECONDS", "600"))
+
+# --- Tool Execution ---
+# Tool calls from one agent step run concurrently, at most TOOL_MAX_CONCURRENCY at a time.
+TOOL_MAX_CONCURRENCY = int(get_env_variable("TOOL_MAX_CONCURRENCY", "4"))
+TOOL_TIMEOUT_SECONDS = float(get_env_variable("TOOL_TIMEOUT_SECONDS", "20"))
+# find_product hits go back to the model as a compact table ("compact") or as the raw JSON ("json");
+# descriptions in the table are cut to TOOL_RESULT_DESCRIPTION_CHARS (0 drops them).
+TOOL_RESULT_FORMAT = get_env_variable("TOOL_RESULT_FORMAT", "compact").lower()
+TOOL_RESULT_DESCRIPTION_CHARS = int(get_env_variable("TOOL_RESULT_DESCRIPTION_CHARS", "120"))
+
+# --- Product Search ---
+FIND_PRODUCT_TOP_K = int(get_env_variable("FIND_PRODUCT_TOP_K", "5"))
+# Vector candidates ranked inside the attribute prefilter before keyword fusion.
+HYBRID_CANDIDATES = int(get_env_variable("HYBRID_CANDIDATES", "20"))
+# Share of the fused score that comes from BM25 over model names and processors (0 = pure vector).
+HYBRID_KEYWORD_WEIGHT = float(get_env_variable("HYBRID_KEYWORD_WEIGHT", "0.3"))
+# Hits scoring below this fraction of the best hit are dropped.
+HYBRID_MIN_RELATIVE_SCORE = float(get_env_variable("HYBRID_MIN_RELATIVE_SCORE", "0.5"))
+# Age after which the keyword index is rebuilt in the background; searches keep using the old one meanwhile.
+CATALOG_INDEX_TTL_SECONDS = float(get_env_variable("CATALOG_INDEX_TTL_SECONDS", "300"))
+
+# --- Deals ---
+# Upsell offers are made when the upgrade costs at most this fraction more than the product asked about.
+DEAL_MAX_UPGRADE_FRACTION = float(get_env_variable("DEAL_MAX_UPGRADE_FRACTION", "0.15"))
+# Let the LLM rephrase rule-based deal headings (costs one extra model call per deal).
+DEAL_COPYWRITING = get_env_variable("DEAL_COPYWRITING", "false").lower() == "true"
+
+# --- Embeddings ---
+EMBEDDING_MODEL_NAME = "models/embedding-001"
+# Normalized query embeddings kept in memory; set EMBEDDING_CACHE_PATH to also persist them in SQLite.
+EMBEDDING_CACHE_SIZE = int(get_env_variable("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_PATH = get_env_variable("EMBEDDING_CACHE_PATH", "")
+# Texts per embed_documents API call during catalog ingestion.
+EMBED_BATCH_SIZE = int(get_env_variable("EMBED_BATCH_SIZE", "100"))
+# Parallel embed+upsert batches during catalog ingestion.
+INGEST_WORKERS = int(get_env_variable("INGEST_WORKERS", "4"))
+
+# --- Murf Client ---
+MURF_API_URL = get_env_variable("MURF_API_URL", "https://api.murf.ai/v1/speech/generate")
+MURF_MAX_CONNECTIONS = int(get_env_variable("MURF_MAX_CONNECTIONS", "20"))
+MURF_MAX_CONCURRENCY_PER_HOST = int(get_env_variable("MURF_MAX_CONCURRENCY_PER_HOST", "8"))
+MURF_MAX_RETRIES = int(get_env_variable("MURF_MAX_RETRIES", "3"))
+MURF_TIMEOUT_SECONDS = float(get_env_variable("MURF_TIMEOUT_SECONDS", "60"))
+
+# --- TTS Audio Cache ---
+TTS_CACHE_ENABLED = get_env_variable("TTS_CACHE_ENABLED", "true").lower() == "true"
+TTS_CACHE_DIR = get_env_variable("TTS_CACHE_DIR", ".tts_cache")
+TTS_CACHE_MEMORY_MB = int(get_env_variable("TTS_CACHE_MEMORY_MB", "64"))
+TTS_CACHE_DISK_MB = int(get_env_variable("TTS_CACHE_DISK_MB", "1024"))
+TTS_CACHE_TTL_SECONDS = float(get_env_variable("TTS_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+# Format and sample rate of inline (base64) reply audio when the client doesn't pick one; small
+# enough to ship in the JSON response to mobile clients.
+TTS_INLINE_FORMAT = get_env_variable("TTS_INLINE_FORMAT", "OGG").upper()
+TTS_INLINE_SAMPLE_RATE = int(get_env_variable("TTS_INLINE_SAMPLE_RATE", "24000"))
+# Base URL clients use to reach this server; cached audio is served from {PUBLIC_BASE_URL}/audio/{hash}.
+PUBLIC_BASE_URL = get_env_variable("PUBLIC_BASE_URL", "http://127.0.0.1:8000")
+
+# --- TTS Pre-synthesis ---
+# Render greetings, error fallbacks, deal headings and product one-liners into the TTS cache
+# ahead of time (at startup and whenever the catalog changes). Needs the TTS cache.
+TTS_PREWARM_ENABLED = get_env_variable("TTS_PREWARM_ENABLED", "false").lower() == "true"
+# Languages whose canned phrases are rendered; empty means every language with a voice.
+TTS_PREWARM_LANGUAGES = [l.strip() for l in get_env_variable("TTS_PREWARM_LANGUAGES", "").split(",") if l.strip()]
+# Voices (by language) used for deal headings (and product one-liners); empty skips the catalog.
+# The texts are English, so only en-US is rendered.
+TTS_PREWARM_CATALOG_LANGUAGES = [l.strip() for l in get_env_variable("TTS_PREWARM_CATALOG_LANGUAGES", "en-US").split(",") if l.strip()]
+TTS_PREWARM_CONCURRENCY = int(get_env_variable("TTS_PREWARM_CONCURRENCY", "2"))
+TTS_PREWARM_INTERVAL_SECONDS = float(get_env_variable("TTS_PREWARM_INTERVAL_SECONDS", "300"))
+# On English turns, start TTS for the deal heading while the reply is still being written.
+TTS_SPECULATIVE_ENABLED = get_env_variable("TTS_SPECULATIVE_ENABLED", "true").lower() == "true"
+# Product one-liners spoken per turn. Off by default: the frontend doesn't play product audio yet.
+TTS_SPECULATIVE_PRODUCTS = int(get_env_variable("TTS_SPECULATIVE_PRODUCTS", "0"))
+
+# --- Streaming TTS ---
+# Maximum number of sentences synthesized concurrently for a single /chat/stream request.
+TTS_SENTENCE_CONCURRENCY = int(get_env_variable("TTS_SENTENCE_CONCURRENCY", "4"))
+
+# --- Batch TTS ---
+# /generate-speech/batch takes at most TTS_BATCH_MAX_ITEMS texts and synthesizes TTS_BATCH_CONCURRENCY at once.
+TTS_BATCH_MAX_ITEMS = int(get_env_variable("TTS_BATCH_MAX_ITEMS", "50"))
+TTS_BATCH_CONCURRENCY = int(get_env_variable("TTS_BATCH_CONCURRENCY", "4"))
+
+# --- Response Cache ---
+# Opt-in semantic cache of whole chat turns for opening messages (at most RESPONSE_CACHE_MAX_HISTORY prior messages).
+RESPONSE_CACHE_ENABLED = get_env_variable("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(get_env_variable("RESPONSE_CACHE_THRESHOLD", "0.95"))
+RESPONSE_CACHE_MAX_HISTORY = int(get_env_variable("RESPONSE_CACHE_MAX_HISTORY", "0"))
+# Per language and voice.
+RESPONSE_CACHE_MAX_ENTRIES = int(get_env_variable("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = float(get_env_variable("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+
+# --- Sessions ---
+# Idle sessions are dropped after this many seconds; set SESSION_STORE_PATH to persist them in SQLite.
+SESSION_TTL_SECONDS = float(get_env_variable("SESSION_TTL_SECONDS", "3600"))
+SESSION_STORE_PATH = get_env_variable("SESSION_STORE_PATH", "")
+# Once the transcript exceeds this estimated token count, older turns are folded into a summary...
+SESSION_TOKEN_BUDGET = int(get_env_variable("SESSION_TOKEN_BUDGET", "2000"))
+# ...except for the most recent messages, which are always sent verbatim.
+SESSION_KEEP_MESSAGES = int(get_env_variable("SESSION_KEEP_MESSAGES", "6"))
+SESSION_MAX_PRODUCTS = int(get_env_variable("SESSION_MAX_PRODUCTS", "50"))
+
+# --- Language Detection ---
+# Below this confidence a message keeps the session's language (or the requested one).
+LANGUAGE_MIN_CONFIDENCE = float(get_env_variable("LANGUAGE_MIN_CONFIDENCE", "0.6"))
+
+# --- Admission Control ---
+# Chat turns running at once, and turns allowed to wait for one; beyond that requests get a 503.
+CHAT_MAX_ACTIVE = int(get_env_variable("CHAT_MAX_ACTIVE", "32"))
+CHAT_MAX_QUEUED = int(get_env_variable("CHAT_MAX_QUEUED", "64"))
+CHAT_QUEUE_TIMEOUT_SECONDS = float(get_env_variable("CHAT_QUEUE_TIMEOUT_SECONDS", "10"))
+ADMISSION_RETRY_AFTER_SECONDS = float(get_env_variable("ADMISSION_RETRY_AFTER_SECONDS", "2"))
+# Budget for a whole request; upstream waits, model calls, tools and Murf retries stop at it (0 = none).
+REQUEST_DEADLINE_SECONDS = float(get_env_variable("REQUEST_DEADLINE_SECONDS", "60"))
+# Per-upstream concurrency caps and rate limits in calls per second (0 = unlimited). Murf's
+# concurrency cap is MURF_MAX_CONCURRENCY_PER_HOST.
+GEMINI_MAX_CONCURRENCY = int(get_env_variable("GEMINI_MAX_CONCURRENCY", "16"))
+GEMINI_RATE_PER_SECOND = float(get_env_variable("GEMINI_RATE_PER_SECOND", "0"))
+EMBEDDING_MAX_CONCURRENCY = int(get_env_variable("EMBEDDING_MAX_CONCURRENCY", "8"))
+EMBEDDING_RATE_PER_SECOND = float(get_env_variable("EMBEDDING_RATE_PER_SECOND", "0"))
+PINECONE_MAX_CONCURRENCY = int(get_env_variable("PINECONE_MAX_CONCURRENCY", "16"))
+PINECONE_RATE_PER_SECOND = float(get_env_variable("PINECONE_RATE_PER_SECOND", "0"))
+MURF_RATE_PER_SECOND = float(get_env_variable("MURF_RATE_PER_SECOND", "0"))
+# Reply audio is skipped while this many Murf calls are already waiting (or chat turns are queued).
+TTS_SHED_QUEUE_DEPTH = int(get_env_variable("TTS_SHED_QUEUE_DEPTH", "16"))
+
+# --- Logging ---
+# "json" writes one JSON object per line (with the request's trace_id); "text" is easier to read locally.
+LOG_FORMAT = get_env_variable("LOG_FORMAT", "json").lower()
+# Set to "debug" to also log every timing span.
+LOG_LEVEL = get_env_variable("LOG_LEVEL", "info")
+
+# --- Startup ---
+# Seed the vector store with the bundled sample catalog in the background when it's empty.
+SEED_SAMPLE_DATA = get_env_variable("SEED_SAMPLE_DATA", "true").lower() == "true"
+
 # --- LLM and Embeddings - Use a model with better multilingual support ---
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash-thinking-exp",  # More capable model for multilingual
-    temperature=0.7,  # Slightly higher temperature for more creative responses
-    google_api_key=GOOGLE_API_KEY
-)
-
-embeddings_model = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001",
-    google_api_key=GOOGLE_API_KEY
-)
\ No newline at end of file
+# Clients are built on first use and shared, so importing config costs no SDK imports or network.
+_llm = None
+_embeddings_model = None
+_clients_lock = threading.Lock()
+
+def require_api_key(name: str, value: str) -> str:
+    if not value:
+        raise ValueError(f"Environment variable '{name}' must be set.")
+    return value
+
+def get_llm():
+    """Returns the shared chat model."""
+    global _llm
+    with _clients_lock:
+        if _llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            _llm = ChatGoogleGenerativeAI(
+                model="gemini-2.0-flash-thinking-exp",  # More capable model for multilingual
+                temperature=0.7,  # Slightly higher temperature for more creative responses
+                google_api_key=require_api_key("GOOGLE_API_KEY", GOOGLE_API_KEY)
+            )
+        return _llm
+
+def get_embeddings_model() -> CachedEmbeddings:
+    """Returns the shared, cached embeddings model."""
+    global _embeddings_model
+    with _clients_lock:
+        if _embeddings_model is None:
+            from admission import UPSTREAMS
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            _embeddings_model = CachedEmbeddings(
+                GoogleGenerativeAIEmbeddings(
+                    model=EMBEDDING_MODEL_NAME,
+                    google_api_key=require_api_key("GOOGLE_API_KEY", GOOGLE_API_KEY)
+                ),
+                model_name=EMBEDDING_MODEL_NAME,
+                max_entries=EMBEDDING_CACHE_SIZE,
+                persist_path=EMBEDDING_CACHE_PATH or None,
+                batch_size=EMBED_BATCH_SIZE,
+                limiter=UPSTREAMS["embeddings"],
+            )
+        return _embeddings_model
+
+def set_llm(model):
+    """Replaces the shared chat model, e.g. with a fake for offline benchmarks (see bench/fakes.py)."""
+    global _llm
+    with _clients_lock:
+        _llm = model
+
+def set_embeddings_model(embeddings):
+    """Replaces the underlying embeddings model; the query cache in front of it starts empty."""
+    global _embeddings_model
+    from admission import UPSTREAMS
+    with _clients_lock:
+        _embeddings_model = CachedEmbeddings(
+            embeddings,
+            model_name=getattr(embeddings, "model", None) or type(embeddings).__name__,
+            max_entries=EMBEDDING_CACHE_SIZE,
+            batch_size=EMBED_BATCH_SIZE,
+            limiter=UPSTREAMS["embeddings"],
+        )
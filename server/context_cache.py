@@ -0,0 +1,193 @@
+import asyncio
+import datetime
+import hashlib
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from langchain_core.messages import HumanMessage
+
+from admission import DeadlineExceeded, within_deadline
+from config import (
+    CONTEXT_CACHE_ENABLED, CONTEXT_CACHE_TTL_SECONDS, CONTEXT_CACHE_MIN_TOKENS, CONTEXT_CACHE_RETRY_SECONDS,
+    GOOGLE_API_KEY, get_llm,
+)
+from tracing import get_logger, span
+
+log = get_logger("context_cache")
+
+CREATE_TIMEOUT_SECONDS = 10.0
+
+_GEMINI_TYPES = {"string", "number", "integer", "boolean", "array", "object"}
+
+def _gemini_schema(schema: dict) -> dict:
+    """
+    Converts a JSON schema, as `convert_to_openai_tool` emits it, to Gemini's Schema: upper-case
+    types, and `anyOf` with null as a nullable field. Titles and defaults have no counterpart.
+    """
+    options = schema.get("anyOf")
+    if options:
+        present = [option for option in options if option.get("type") != "null"]
+        if len(present) == 1:
+            converted = _gemini_schema({**present[0], **{k: v for k, v in schema.items() if k != "anyOf"}})
+            return {**converted, "nullable": converted.get("nullable", False) or len(present) < len(options)}
+        return {"any_of": [_gemini_schema(option) for option in present], "nullable": len(present) < len(options)}
+    kind = schema.get("type", "object")
+    if kind not in _GEMINI_TYPES:
+        raise ValueError(f"Unsupported JSON schema type for a context cache: {kind!r}")
+    converted = {"type_": kind.upper()}
+    if schema.get("description"):
+        converted["description"] = schema["description"]
+    if schema.get("enum"):
+        converted["enum"] = [str(value) for value in schema["enum"]]
+    if "items" in schema:
+        converted["items"] = _gemini_schema(schema["items"])
+    if schema.get("properties"):
+        converted["properties"] = {name: _gemini_schema(value) for name, value in schema["properties"].items()}
+        converted["required"] = list(schema.get("required", []))
+    return converted
+
+def _gemini_tool(tools: list):
+    """Function declarations of LangChain tools (or pydantic models) as one Gemini Tool."""
+    from google.ai import generativelanguage_v1beta as glm
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+
+    declarations = []
+    for tool in tools:
+        function = convert_to_openai_tool(tool)["function"]
+        parameters = function.get("parameters", {})
+        declarations.append(glm.FunctionDeclaration(
+            name=function["name"],
+            description=function.get("description", ""),
+            # Gemini rejects an object schema without properties; a tool without arguments has none.
+            parameters=glm.Schema(_gemini_schema(parameters)) if parameters.get("properties") else None,
+        ))
+    return glm.Tool(function_declarations=declarations)
+
+class ContextCache:
+    """
+    Gemini context caches holding a static prompt prefix together with the tools it is used with,
+    one per model, prompt kind and language. A cache is created on first use and replaced when
+    less than a tenth of its TTL is left. `get` returns None, and callers send the whole prompt,
+    for models other than Gemini, prefixes below `min_tokens`, or for `retry_seconds` after a
+    failed creation. `client` replaces the Gemini cache service, e.g. with a fake in offline checks.
+    """
+
+    def __init__(self, ttl_seconds: int, min_tokens: int, retry_seconds: float, client=None):
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.retry_seconds = retry_seconds
+        self._entries: Dict[tuple, Tuple[str, float]] = {}  # key -> (cache name, monotonic expiry)
+        self._retry_at: Dict[tuple, float] = {}
+        self._too_small: Set[tuple] = set()  # prefixes are static, so a small one never grows
+        self._locks: Dict[tuple, asyncio.Lock] = {}
+        self._client = client
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    def _service(self):
+        if self._client is None:
+            from google.ai import generativelanguage_v1beta as glm
+            # REST rather than gRPC: calls run in worker threads, independent of any event loop.
+            self._client = glm.CacheServiceClient(client_options={"api_key": GOOGLE_API_KEY}, transport="rest")
+        return self._client
+
+    def _create(self, model: str, kind: str, language: str, prefix: str, tools: list) -> Optional[str]:
+        """Creates the cache in the API (blocking); None if the prefix is too small to cache."""
+        from google.ai import generativelanguage_v1beta as glm
+
+        declarations = _gemini_tool(tools) if tools else None
+        schema = type(declarations).to_json(declarations, including_default_value_fields=False, indent=0) if declarations else ""
+        estimated_tokens = (len(prefix) + len(schema)) // 4  # rough token estimate
+        if estimated_tokens < self.min_tokens:
+            log.info("context_cache.below_minimum", kind=kind, language=language, model=model,
+                     estimated_tokens=estimated_tokens, min_tokens=self.min_tokens)
+            return None
+        cached = self._service().create_cached_content(cached_content=glm.CachedContent(
+            model=model if model.startswith("models/") else f"models/{model}",
+            display_name=f"{kind}-{language}",
+            system_instruction=glm.Content(parts=[glm.Part(text=prefix)]),
+            tools=[declarations] if declarations else None,
+            ttl=datetime.timedelta(seconds=self.ttl_seconds),
+        ), timeout=CREATE_TIMEOUT_SECONDS)
+        return cached.name
+
+    async def get(self, llm, kind: str, language: str, prefix: str, tools: list) -> Optional[str]:
+        """Name of a live cache of `prefix` and `tools` for `llm`, creating one if needed."""
+        model = getattr(llm, "model", None)
+        if not CONTEXT_CACHE_ENABLED or not model or not hasattr(llm, "cached_content"):
+            return None
+        digest = hashlib.sha256("\x1f".join([prefix, *map(str, tools)]).encode("utf-8")).hexdigest()
+        key = (model, kind, language, digest)
+        now = time.monotonic()
+        if key in self._too_small or now < self._retry_at.get(key, 0.0):
+            return None
+        entry = self._entries.get(key)
+        if entry is not None and now < entry[1] - self.ttl_seconds / 10:
+            self.hits += 1
+            return entry[0]
+
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() < entry[1] - self.ttl_seconds / 10:
+                self.hits += 1
+                return entry[0]
+            if key in self._too_small or time.monotonic() < self._retry_at.get(key, 0.0):
+                return None  # settled by the call that held the lock
+            self.misses += 1
+            try:
+                with span("llm", "context_cache_create", prompt=kind, language=language):
+                    name = await asyncio.to_thread(self._create, model, kind, language, prefix, tools)
+            except Exception as e:
+                log.warning("context_cache.create_failed", kind=kind, language=language, model=model, error=str(e))
+                self.failures += 1
+                self._retry_at[key] = time.monotonic() + self.retry_seconds
+                self._entries.pop(key, None)
+                return None
+            if name is None:
+                self._too_small.add(key)
+                self._entries.pop(key, None)
+                return None
+            log.info("context_cache.created", kind=kind, language=language, model=model, name=name)
+            self._entries[key] = (name, time.monotonic() + self.ttl_seconds)
+            return name
+
+    def invalidate(self, name: str):
+        """Forgets a cache the API no longer accepts; the next call creates a new one."""
+        for key, entry in list(self._entries.items()):
+            if entry[0] == name:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        """Live caches, hits and misses, failed creations and prefixes too small to cache."""
+        return {"enabled": CONTEXT_CACHE_ENABLED, "live": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "failures": self.failures, "below_minimum": len(self._too_small)}
+
+_context_cache: Optional[ContextCache] = None
+
+def get_context_cache() -> ContextCache:
+    global _context_cache
+    if _context_cache is None:
+        _context_cache = ContextCache(CONTEXT_CACHE_TTL_SECONDS, CONTEXT_CACHE_MIN_TOKENS, CONTEXT_CACHE_RETRY_SECONDS)
+    return _context_cache
+
+async def invoke_with_prefix(kind: str, language: str, prefix: str, context: str, messages: List,
+                             tools: list, uncached: Callable):
+    """
+    Calls the shared model with `prefix` and `tools` served from a context cache, sending only the
+    `context` block and `messages`. Without a cache, or if the cached call fails, awaits
+    `uncached(prefix + context)` instead. Returns (result, True if the cache was used).
+    """
+    llm = get_llm()
+    cache = get_context_cache()
+    name = await cache.get(llm, kind, language, prefix, tools)
+    if name is not None:
+        try:
+            return await within_deadline(llm.ainvoke([HumanMessage(content=context)] + messages,
+                                                     cached_content=name)), True
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            log.warning("context_cache.call_failed", kind=kind, language=language, error=str(e))
+            cache.invalidate(name)
+    return await within_deadline(uncached(prefix + context)), False
@@ -0,0 +1,127 @@
+import re
+from typing import Dict, List, Optional, Set
+
+from admission import upstream_sync
+from config import DEAL_COPYWRITING, DEAL_MAX_UPGRADE_FRACTION, get_llm
+from schemas import Product, SpecialDeal
+from search import CatalogIndex, get_catalog_index
+from tracing import get_logger, span
+
+log = get_logger("deals")
+
+def product_from_metadata(vector_id: str, metadata: dict) -> Optional[Product]:
+    """Builds a Product from catalog metadata, or None if required fields are missing."""
+    try:
+        return Product(ID=vector_id, **{k: v for k, v in metadata.items() if k != "content_hash"})
+    except ValueError:
+        return None
+
+def deal_price(metadata: dict) -> float:
+    """Lowest price the catalog allows for a product."""
+    return metadata["Max Price"] - metadata.get("Allowed Discount", 0)
+
+class DealEngine:
+    """
+    Rule-based deals computed from catalog metadata. Every price is Max Price minus the
+    product's Allowed Discount, so a deal never undercuts what the catalog permits. Upsell
+    tables are built once per catalog: the next storage tier of the same model, and the next
+    pricier model of the same brand.
+    """
+
+    def __init__(self, metadata_by_id: Dict[str, dict]):
+        self.metadata = {k: m for k, m in metadata_by_id.items() if m.get("Max Price") is not None}
+        self.storage_upsell: Dict[str, str] = {}
+        self.brand_upsell: Dict[str, str] = {}
+
+        by_model: Dict[tuple, List[str]] = {}
+        by_brand: Dict[str, List[str]] = {}
+        for vector_id, m in self.metadata.items():
+            by_model.setdefault((m.get("Company Name"), m.get("Model Name")), []).append(vector_id)
+            by_brand.setdefault(m.get("Company Name"), []).append(vector_id)
+        for ids in by_model.values():
+            ids.sort(key=lambda i: (self.metadata[i].get("Capacity") or 0, self.metadata[i]["Max Price"]))
+            for lower, higher in zip(ids, ids[1:]):
+                self.storage_upsell[lower] = higher
+        for ids in by_brand.values():
+            ids.sort(key=lambda i: self.metadata[i]["Max Price"])
+            for position, vector_id in enumerate(ids):
+                model = self.metadata[vector_id].get("Model Name")
+                pricier = next((i for i in ids[position + 1:] if self.metadata[i].get("Model Name") != model), None)
+                if pricier:
+                    self.brand_upsell[vector_id] = pricier
+
+    def _upgrade(self, vector_id: str) -> Optional[str]:
+        """Best upsell for a product whose extra cost stays within DEAL_MAX_UPGRADE_FRACTION."""
+        base = deal_price(self.metadata[vector_id])
+        for table in (self.storage_upsell, self.brand_upsell):
+            candidate = table.get(vector_id)
+            if candidate and deal_price(self.metadata[candidate]) - base <= base * DEAL_MAX_UPGRADE_FRACTION:
+                return candidate
+        return None
+
+    def best_deal(self, product_ids: List[str]) -> Optional[SpecialDeal]:
+        """Deal for the first known product in `product_ids`: an upgrade offer if one is close in price, else its discount."""
+        known = [i for i in product_ids if i in self.metadata]
+        if not known:
+            return None
+        primary = known[0]
+        metadata = self.metadata[primary]
+        upgrade = self._upgrade(primary)
+        if upgrade:
+            target = self.metadata[upgrade]
+            extra = deal_price(target) - deal_price(metadata)
+            if target.get("Model Name") == metadata.get("Model Name"):
+                heading = (f"Upgrade to the {target.get('Capacity')}GB {target.get('Model Name')} "
+                           f"for just ₹{extra:,.0f} more than the {metadata.get('Capacity')}GB!")
+            else:
+                heading = f"Step up to the {target.get('Model Name')} for just ₹{extra:,.0f} more!"
+            involved, price = [primary, upgrade], deal_price(target)
+        else:
+            discount = metadata.get("Allowed Discount", 0)
+            if not discount:
+                return None
+            heading = f"Save ₹{discount:,.0f} on the {metadata.get('Model Name')} today!"
+            involved, price = [primary], deal_price(metadata)
+        products = [p for p in (product_from_metadata(i, self.metadata[i]) for i in involved) if p]
+        return SpecialDeal(heading=heading, deal_price=price, products_involved=products)
+
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+def _numbers(text: str) -> Set[float]:
+    return {float(n.replace(",", "")) for n in _NUMBER.findall(text)}
+
+def keeps_deal_terms(heading: str, deal: SpecialDeal) -> bool:
+    """True if every number in a reworded `heading` is one the deal itself states (its heading or price)."""
+    return _numbers(heading) <= _numbers(deal.heading) | {float(deal.deal_price)}
+
+_deal_engine: Optional[DealEngine] = None
+_deal_engine_catalog: Optional[CatalogIndex] = None
+
+def get_deal_engine() -> DealEngine:
+    """Returns the deal engine for the current catalog, rebuilt whenever the catalog index is."""
+    global _deal_engine, _deal_engine_catalog
+    catalog = get_catalog_index()
+    if _deal_engine is None or _deal_engine_catalog is not catalog:
+        _deal_engine = DealEngine(catalog.metadata)
+        _deal_engine_catalog = catalog
+    return _deal_engine
+
+def write_deal_copy(deal: SpecialDeal, conversation_context: str) -> SpecialDeal:
+    """Optionally has the LLM rephrase the heading for the conversation; price and products never change."""
+    if not DEAL_COPYWRITING:
+        return deal
+    prompt = (
+        f"Rewrite this sales deal heading as one short, catchy sentence that fits the conversation "
+        f"'{conversation_context}', in the same language as the conversation. Keep every number exactly "
+        f"as written. Reply with the heading only.\n\nHeading: {deal.heading}"
+    )
+    try:
+        with upstream_sync("gemini"), span("llm", "deal_copywriting"):
+            heading = str(get_llm().invoke(prompt).content).strip()
+    except Exception as e:
+        log.warning("deal.copywriting_failed", error=str(e))
+        return deal
+    if not heading or not keeps_deal_terms(heading, deal):
+        log.warning("deal.copywriting_rejected", heading=heading)
+        return deal
+    return deal.model_copy(update={"heading": heading})
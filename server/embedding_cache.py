@@ -0,0 +1,97 @@
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+def normalize_query(text: str) -> str:
+    """Collapses trivially different phrasings ("Samsung phones?" / "samsung  phones") to one key."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(text.split()).strip(" ?!.。？！")
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model with a normalized-query LRU and an optional SQLite store keyed
+    by model name, so repeated `find_product` lookups skip the embedding API entirely.
+    `embed_documents` is split into batches of `batch_size` texts per API call. API calls hold a
+    slot of `limiter` (an admission.Limiter) when one is given.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, max_entries: int = 2048,
+                 persist_path: Optional[str] = None, batch_size: int = 100, limiter=None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.batch_size = max(1, batch_size)
+        self.limiter = limiter
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(model TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL, PRIMARY KEY (model, query))"
+            )
+            self._db.commit()
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                return vector
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT vector FROM query_embeddings WHERE model = ? AND query = ?", (self.model_name, key)
+            ).fetchone()
+        if row is None:
+            return None
+        vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+        self._remember(key, vector)
+        return vector
+
+    def _remember(self, key: str, vector: List[float], persist: bool = False):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+            if persist and self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (model, query, vector) VALUES (?, ?, ?)",
+                    (self.model_name, key, np.asarray(vector, dtype=np.float32).tobytes()),
+                )
+                self._db.commit()
+
+    def _slot(self):
+        return self.limiter.sync_slot() if self.limiter is not None else nullcontext()
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        vector = self._lookup(key)
+        if vector is not None:
+            self.hits += 1
+            return vector
+        self.misses += 1
+        with self._slot():
+            vector = self.embeddings.embed_query(key)
+        self._remember(key, vector, persist=True)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            with self._slot():
+                vectors.extend(self.embeddings.embed_documents(texts[start:start + self.batch_size]))
+        return vectors
+
+    def stats(self) -> dict:
+        return {"model": self.model_name, "hits": self.hits, "misses": self.misses, "entries": len(self._lru)}
@@ -0,0 +1,138 @@
+"""
+Streaming catalog ingestion with incremental, hash-based upserts.
+
+    python ingest.py catalog.jsonl --batch-size 200 --workers 4
+
+Reads CSV or JSONL catalogs lazily, computes a content hash per product and only re-embeds and
+upserts items that are new or changed. Products missing from the catalog are deleted from the
+vector store unless --keep-missing is given.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List
+
+from config import EMBED_BATCH_SIZE, INGEST_WORKERS, get_embeddings_model
+from vector_store import get_vector_store
+from search import refresh_catalog_index
+from tracing import get_logger, span
+
+log = get_logger("ingest")
+
+SAMPLE_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sample_catalog.jsonl")
+
+# CSV cells are strings; these catalog columns are stored as numbers.
+NUMERIC_FIELDS = {"Allowed Discount", "Capacity", "Max Price", "battery", "ram", "weight"}
+
+def _coerce(item: Dict[str, Any]) -> Dict[str, Any]:
+    product = {}
+    for key, value in item.items():
+        if value is None:
+            continue  # Pinecone rejects null metadata values
+        if isinstance(value, str):
+            value = value.strip()
+            if value == "":
+                continue
+            if key in NUMERIC_FIELDS:
+                number = float(value.replace(",", ""))
+                value = int(number) if number.is_integer() else number
+        product[key] = value
+    return product
+
+def read_catalog(path: str) -> Iterator[Dict[str, Any]]:
+    """Yields catalog products one at a time from a .csv or .jsonl file."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield _coerce(row)
+        else:
+            for line in f:
+                if line.strip():
+                    yield _coerce(json.loads(line))
+
+def content_hash(product: Dict[str, Any]) -> str:
+    """Stable fingerprint of everything stored for a product."""
+    canonical = json.dumps(product, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def _embed_and_upsert(store, products: List[Dict[str, Any]]) -> int:
+    with span("embedding", "documents"):
+        embeddings = get_embeddings_model().embed_documents([product['Text'] for product in products])
+    vectors_to_upsert = []
+    for product, embedding in zip(products, embeddings):
+        metadata = {k: v for k, v in product.items() if k != 'ID'}
+        metadata['content_hash'] = content_hash(product)
+        vectors_to_upsert.append((product['ID'], embedding, metadata))
+    with span("vector_store", "upsert"):
+        store.upsert(vectors_to_upsert)
+    return len(vectors_to_upsert)
+
+def ingest_catalog(path: str, batch_size: int = EMBED_BATCH_SIZE, workers: int = INGEST_WORKERS,
+                   delete_missing: bool = True) -> Dict[str, Any]:
+    """Syncs the vector store with the catalog at `path` and returns throughput stats."""
+    store = get_vector_store()
+    started = time.perf_counter()
+    existing_ids = set(store.list_ids())
+    seen_ids = set()
+    stats = {"read": 0, "unchanged": 0, "upserted": 0, "deleted": 0}
+
+    # At most 2 batches per worker are in flight, so memory stays bounded on huge catalogs.
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for batch in _batched(read_catalog(path), batch_size):
+            stats["read"] += len(batch)
+            seen_ids.update(product['ID'] for product in batch)
+            known = store.fetch_metadata([product['ID'] for product in batch if product['ID'] in existing_ids])
+            changed = [
+                product for product in batch
+                if known.get(product['ID'], {}).get('content_hash') != content_hash(product)
+            ]
+            stats["unchanged"] += len(batch) - len(changed)
+            if not changed:
+                continue
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                stats["upserted"] += sum(future.result() for future in done)
+            in_flight.add(executor.submit(_embed_and_upsert, store, changed))
+        stats["upserted"] += sum(future.result() for future in wait(in_flight).done)
+
+    if delete_missing:
+        removed = sorted(existing_ids - seen_ids)
+        if removed:
+            store.delete(removed)
+        stats["deleted"] = len(removed)
+    store.flush()
+    refresh_catalog_index()
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 2)
+    stats["items_per_second"] = round(stats["read"] / elapsed, 1) if elapsed else 0.0
+    log.info("ingest.done", path=path, **stats)
+    return stats
+
+def populate_sample_data():
+    """Populates the vector store with the bundled sample catalog if it's empty."""
+    if get_vector_store().count() > 0:
+        log.info("ingest.sample_data_skipped", reason="vector store already populated")
+        return
+    log.info("ingest.sample_data_start")
+    ingest_catalog(SAMPLE_CATALOG_PATH)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=SAMPLE_CATALOG_PATH, help="CSV or JSONL catalog file")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--keep-missing", action="store_true", help="don't delete products absent from the file")
+    args = parser.parse_args()
+    ingest_catalog(args.path, batch_size=args.batch_size, workers=args.workers, delete_missing=not args.keep_missing)
@@ -0,0 +1,218 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from config import LANGUAGE_MIN_CONFIDENCE
+
+DEFAULT_LANGUAGE = 'en-US'
+
+class LanguageGuess(BaseModel):
+    language: str
+    confidence: float  # 0..1; below LANGUAGE_MIN_CONFIDENCE the guess is not trusted
+
+# --- Script Pass ---
+# One translate table maps every character of a known script to a marker for that script, so a
+# single str.translate plus a count per marker gives the per-script counts.
+_SCRIPTS = {
+    'hi': [(0x0900, 0x097F)],  # Devanagari
+    'bn': [(0x0980, 0x09FF)],  # Bengali
+    'ta': [(0x0B80, 0x0BFF)],  # Tamil
+    'ar': [(0x0600, 0x06FF)],  # Arabic
+    'ko': [(0xAC00, 0xD7AF), (0x1100, 0x11FF), (0x3130, 0x318F)],  # Hangul
+    'kana': [(0x3040, 0x309F), (0x30A0, 0x30FF)],  # Hiragana, Katakana
+    'han': [(0x4E00, 0x9FFF)],  # CJK ideographs (Chinese, or Japanese if kana is present)
+    'latin': [(0x41, 0x5A), (0x61, 0x7A), (0x00C0, 0x024F)],
+}
+_LATIN_END = '\u0250'  # everything below is ASCII or Latin-1/Latin Extended
+_SCRIPT_LANGUAGES = {'hi': 'hi-IN', 'bn': 'bn-IN', 'ta': 'ta-IN', 'ar': 'ar-SA', 'ko': 'ko-KR'}
+
+_SCRIPT_MARKERS = {chr(0xE000 + i): name for i, name in enumerate(_SCRIPTS)}  # private-use code points
+_SCRIPT_TABLE = {
+    codepoint: marker
+    for marker, name in _SCRIPT_MARKERS.items()
+    for low, high in _SCRIPTS[name]
+    for codepoint in range(low, high + 1)
+}
+
+def script_counts(text: str) -> Dict[str, int]:
+    marked = text.translate(_SCRIPT_TABLE)  # characters outside every script are left as they are
+    return {name: marked.count(marker) for marker, name in _SCRIPT_MARKERS.items()}
+
+# --- Latin-Script N-gram Scorer ---
+# Small seed texts per language; their character trigrams are the language profiles.
+_SEED_TEXTS = {
+    'en-US': """
+        I am looking for a new phone with a good camera and a long battery life. What is the price of
+        this model? Do you have it in black? Can you give me a discount if I buy two of them? Which one
+        would you recommend for my mother? The screen should be big enough to watch videos. That is too
+        expensive for me, show me something cheaper. Thank you, that was very helpful. How much storage
+        does it have and is the charger included? I would like to compare these two phones. Where can I
+        find the best deal today? What about the other one? Yes, please. No, thanks.
+    """,
+    'es-ES': """
+        Estoy buscando un teléfono nuevo con una buena cámara y una batería que dure mucho. ¿Cuál es el
+        precio de este modelo? ¿Lo tienes en negro? ¿Me puedes hacer un descuento si compro dos? ¿Cuál me
+        recomiendas para mi madre? La pantalla debería ser grande para ver vídeos. Es demasiado caro para
+        mí, enséñame algo más barato. Gracias, me has ayudado mucho. ¿Cuánto almacenamiento tiene y viene
+        con el cargador? Quiero comparar estos dos móviles. ¿Dónde puedo encontrar la mejor oferta hoy?
+        ¿Y el otro? Sí, por favor. No, gracias. Hola, ¿qué tal? Necesito un móvil barato.
+    """,
+    'fr-FR': """
+        Je cherche un nouveau téléphone avec un bon appareil photo et une batterie qui dure longtemps.
+        Quel est le prix de ce modèle ? Est-ce que vous l'avez en noir ? Pouvez-vous me faire une remise
+        si j'en achète deux ? Lequel me conseillez-vous pour ma mère ? L'écran doit être assez grand pour
+        regarder des vidéos. C'est trop cher pour moi, montrez-moi quelque chose de moins cher. Merci,
+        c'était très utile. Combien de stockage a-t-il et le chargeur est-il inclus ? Je voudrais comparer
+        ces deux téléphones. Où puis-je trouver la meilleure offre aujourd'hui ? Et l'autre ? Oui, s'il
+        vous plaît. Non, merci. Bonjour, je veux un portable pas cher.
+    """,
+    'de-DE': """
+        Ich suche ein neues Handy mit einer guten Kamera und einem Akku, der lange hält. Was kostet
+        dieses Modell? Haben Sie es auch in Schwarz? Können Sie mir einen Rabatt geben, wenn ich zwei
+        kaufe? Welches würden Sie für meine Mutter empfehlen? Der Bildschirm sollte groß genug sein, um
+        Videos zu schauen. Das ist mir zu teuer, zeigen Sie mir etwas Günstigeres. Danke, das war sehr
+        hilfreich. Wie viel Speicher hat es und ist das Ladegerät dabei? Ich möchte diese beiden Handys
+        vergleichen. Wo finde ich heute das beste Angebot? Und das andere? Ja, bitte. Nein, danke.
+        Hallo, ich brauche ein günstiges Smartphone mit viel Speicherplatz.
+    """,
+    'it-IT': """
+        Sto cercando un telefono nuovo con una buona fotocamera e una batteria che duri a lungo. Qual è
+        il prezzo di questo modello? Ce l'avete in nero? Mi può fare uno sconto se ne compro due? Quale mi
+        consiglia per mia madre? Lo schermo dovrebbe essere abbastanza grande per guardare i video. È
+        troppo caro per me, mi faccia vedere qualcosa di più economico. Grazie, è stato molto utile.
+        Quanta memoria ha e il caricabatterie è incluso? Vorrei confrontare questi due telefoni. Dove
+        posso trovare l'offerta migliore oggi? E l'altro? Sì, per favore. No, grazie. Ciao, vorrei un
+        cellulare che costa poco.
+    """,
+    'pt-BR': """
+        Estou procurando um celular novo com uma boa câmera e uma bateria que dure bastante. Qual é o
+        preço deste modelo? Vocês têm na cor preta? Você pode me dar um desconto se eu comprar dois? Qual
+        você recomenda para a minha mãe? A tela precisa ser grande para assistir vídeos. Isso está caro
+        demais para mim, me mostre algo mais barato. Obrigado, ajudou muito. Quanto armazenamento ele tem
+        e o carregador vem junto? Eu queria comparar esses dois celulares. Onde eu encontro a melhor
+        oferta hoje? E o outro? Sim, por favor. Não, obrigado. Olá, tudo bem? Quero um aparelho com
+        ótima câmera e preço baixo.
+    """,
+    'pl-PL': """
+        Szukam nowego telefonu z dobrym aparatem i baterią, która długo wytrzymuje. Ile kosztuje ten
+        model? Czy macie go w kolorze czarnym? Czy mogę dostać zniżkę, jeśli kupię dwa? Który poleciłbyś
+        dla mojej mamy? Ekran powinien być duży, żeby oglądać filmy. To dla mnie za drogie, pokaż mi coś
+        tańszego. Dziękuję, bardzo mi pomogłeś. Ile ma pamięci i czy ładowarka jest w zestawie? Chciałbym
+        porównać te dwa telefony. Gdzie znajdę dziś najlepszą ofertę? A ten drugi? Tak, proszę. Nie,
+        dziękuję. Cześć, potrzebuję taniego smartfona z dużą pamięcią.
+    """,
+}
+
+_WORD = re.compile(r"[a-z\u00C0-\u024F']+")
+# For ASCII text, one translate + split does what _WORD.findall does on the lowercased text.
+_ASCII_NON_WORD = {cp: " " for cp in range(0x80) if not (chr(cp).islower() or chr(cp) == "'")}
+
+def _words(text: str) -> List[str]:
+    if text.isascii():
+        return text.lower().translate(_ASCII_NON_WORD).split()
+    return _WORD.findall(unicodedata.normalize("NFC", text).lower())
+
+def _trigrams(word: str) -> List[str]:
+    padded = f" {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+class _NgramModel:
+    """
+    Naive Bayes over character trigrams with add-one smoothing. Each trigram maps to its tuple of
+    per-language log-probabilities, and each word seen in a message to the sum over its trigrams,
+    kept in a bounded table, so a message is scored with one lookup per word.
+    """
+
+    def __init__(self, seed_texts: Dict[str, str], max_words: int = 50_000):
+        counts = {language: Counter(gram for word in _words(text) for gram in _trigrams(word))
+                  for language, text in seed_texts.items()}
+        vocabulary = set().union(*counts.values())
+        totals = {language: sum(grams.values()) + len(vocabulary) for language, grams in counts.items()}
+        self.languages = list(counts)
+        self.log_probs = {
+            gram: tuple(math.log((counts[language][gram] + 1) / totals[language]) for language in self.languages)
+            for gram in vocabulary
+        }
+        self.unseen = tuple(math.log(1 / totals[language]) for language in self.languages)
+        self.max_words = max_words
+        self._word_scores: Dict[str, Tuple[float, ...]] = {}
+
+    def _word(self, word: str) -> Tuple[float, ...]:
+        scores = self._word_scores.get(word)
+        if scores is None:
+            rows = [self.log_probs.get(gram, self.unseen) for gram in _trigrams(word)]
+            scores = tuple(map(math.fsum, zip(*rows)))
+            if len(self._word_scores) >= self.max_words:
+                self.clear_word_scores()
+            self._word_scores[word] = scores
+        return scores
+
+    def clear_word_scores(self):
+        self._word_scores.clear()
+
+    def scores(self, text: str) -> Tuple[List[float], int]:
+        """Log-likelihood per language (in `languages` order), and the number of trigrams scored."""
+        words = _words(text)
+        if not words:
+            return [0.0] * len(self.languages), 0
+        word_scores = self._word_scores
+        rows = [word_scores.get(word) or self._word(word) for word in words]
+        return list(map(sum, zip(*rows))), sum(map(len, words))  # a word has one trigram per letter
+
+_ngram_model = _NgramModel(_SEED_TEXTS)
+
+def _latin_guess(text: str) -> LanguageGuess:
+    scores, n = _ngram_model.scores(text)
+    if not n:
+        return LanguageGuess(language=DEFAULT_LANGUAGE, confidence=0.0)
+    # Naive Bayes posteriors are overconfident on long inputs and meaningless on one-word ones;
+    # tempering by the trigram count keeps "ok" uncertain and a full sentence confident.
+    temperature = max(1.0, n / 8)
+    top = max(scores)
+    confidence = 1 / sum([math.exp((score - top) / temperature) for score in scores])
+    best = _ngram_model.languages[scores.index(top)]
+    return LanguageGuess(language=best, confidence=round(confidence * min(1.0, n / 12), 3))
+
+# --- Detection ---
+
+@lru_cache(maxsize=4096)
+def detect_language(text: str) -> LanguageGuess:
+    """Best-guess language of `text` with a confidence. Non-Latin scripts are decided by the script pass alone."""
+    if text.isascii() or max(text) < _LATIN_END:
+        return _latin_guess(text)  # Latin letters only: no other script to look for
+    counts = script_counts(text)
+    letters = sum(counts.values())
+    if not letters:
+        return LanguageGuess(language=DEFAULT_LANGUAGE, confidence=0.0)
+
+    if counts['kana']:
+        script, share = 'ja-JP', (counts['kana'] + counts['han']) / letters
+    elif counts['han']:
+        script, share = 'zh-CN', counts['han'] / letters
+    else:
+        name = max((n for n in _SCRIPT_LANGUAGES if counts[n]), key=counts.__getitem__, default=None)
+        script, share = (_SCRIPT_LANGUAGES[name], counts[name] / letters) if name else (None, 0.0)
+
+    # Mixed text ("iPhone 15 का price क्या है") goes by its non-Latin script if it is a real part of it.
+    if script and share >= 0.3:
+        return LanguageGuess(language=script, confidence=round(min(1.0, 0.5 + share), 3))
+    return _latin_guess(text)
+
+def choose_language(text: str, requested: Optional[str], session_language: Optional[str] = None) -> LanguageGuess:
+    """
+    The language to answer `text` in. A language the client asked for explicitly (anything but
+    the default) is always used. Otherwise the detected one if confident, else the language the
+    session was already speaking, else the default. Short replies ("ok", "128GB") thus keep the
+    conversation's language instead of flipping to English.
+    """
+    if requested and requested != DEFAULT_LANGUAGE:
+        return LanguageGuess(language=requested, confidence=1.0)
+    guess = detect_language(text)
+    if guess.confidence >= LANGUAGE_MIN_CONFIDENCE:
+        return guess
+    return LanguageGuess(language=session_language or requested or DEFAULT_LANGUAGE, confidence=guess.confidence)
@@ -1,12 +1,39 @@
-import requests
-import re
-from fastapi import FastAPI, HTTPException
+import asyncio
+import base64
+import time
+from contextlib import aclosing, suppress
+from typing import Optional, Tuple
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from langchain_core.messages import HumanMessage, AIMessage
-from schemas import ChatRequest, ChatResponse, TTSRequest, SpecialDeal
-from agent import chatbot_graph
-from vector_store import populate_pinecone_data
-from config import MURF_API_KEY, MURF_VOICE_ID
+from schemas import ChatRequest, ChatResponse, VoiceMessage, TTSBatchRequest, TTSBatchResponse, TTSMeta, TTSRequest, TTSResponse
+from agent import chatbot_graph, final_answer_call
+from ingest import populate_sample_data
+from streaming import AnswerTextStream, SentenceSpeech, ndjson_line
+from prewarm import SpeculativeSpeech, canned_text, prewarm_loop
+from language_id import choose_language
+from murf_client import MurfError, close_murf_client
+from tts import (
+    LANGUAGE_VOICE_MAP, clip_key, concatenate_clips, local_audio_url, resolve_voice, synthesize, synthesize_audio,
+    synthesize_batch, synthesize_speech,
+)
+from audio_concat import CONCATENABLE_FORMATS
+from tts_cache import AUDIO_MIME_TYPES, get_audio_store, get_tts_cache
+from sessions import Session, session_store
+from deals import get_deal_engine, keeps_deal_terms
+from response_cache import get_response_cache
+from context_cache import get_context_cache
+from search import get_catalog_index
+from vector_store import get_vector_store
+from admission import Overloaded, admission_stats, admitted, set_deadline
+from tracing import REQUEST_SECONDS, get_logger, new_trace_id, render_metrics
+from config import (
+    MURF_API_KEY, MURF_VOICE_ID, GOOGLE_API_KEY, TTS_SENTENCE_CONCURRENCY, SEED_SAMPLE_DATA,
+    RESPONSE_CACHE_MAX_HISTORY, TTS_PREWARM_ENABLED, TTS_INLINE_FORMAT, TTS_INLINE_SAMPLE_RATE, REQUEST_DEADLINE_SECONDS, get_embeddings_model,
+    TTS_BATCH_MAX_ITEMS, TTS_BATCH_CONCURRENCY,
+)
 
 # --- FastAPI Application ---
 app = FastAPI(title="Mobile Salesperson Chatbot API", version="1.0.0")
@@ -17,126 +44,147 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
-# Complete language to voice mapping
-LANGUAGE_VOICE_MAP = {
-    'en-US': 'en-US-natalie',      # English US
-    'en-UK': 'en-UK-theo',         # English UK
-    'es-ES': 'es-ES-elvira',       # Spanish
-    'de-DE': 'de-DE-matthias',     # German
-    'pt-BR': 'pt-BR-heitor',       # Portuguese
-    'ja-JP': 'ja-JP-kenji',        # Japanese
-    'ko-KR': 'ko-KR-gyeong',       # Korean
-    'zh-CN': 'zh-CN-tao',          # Chinese
-    'hi-IN': 'hi-IN-kabir',        # Hindi
-    'ta-IN': 'ta-IN-iniya',        # Tamil
-    'bn-IN': 'bn-IN-anwesha',      # Bengali
-    'pl-PL': 'pl-PL-jacek',        # Polish
-    # Add fallbacks for languages you might not have voices for yet
-    'fr-FR': 'en-US-natalie',      # French fallback to English
-    'it-IT': 'en-US-natalie',      # Italian fallback to English
-    'ar-SA': 'en-US-natalie',      # Arabic fallback to English
-}
-
-def detect_language_from_text(text: str) -> str:
-    """Detect language from text using character patterns."""
-    language_patterns = {
-        'hi-IN': r'[\u0900-\u097F]',  # Hindi
-        'ko-KR': r'[\uAC00-\uD7AF]',  # Korean
-        'ja-JP': r'[\u3040-\u309F\u30A0-\u30FF]',  # Japanese
-        'zh-CN': r'[\u4E00-\u9FFF]',  # Chinese
-        'es-ES': r'[áéíóúñ¿¡]',  # Spanish
-        'fr-FR': r'[àâçéèêëîïôûùüÿœæ]',  # French
-        'de-DE': r'[äöüß]',  # German
-        'it-IT': r'[àèéìíîòóùú]',  # Italian
-        'pt-BR': r'[ãõâêîôûáéíóúç]',  # Portuguese
-        'ar-SA': r'[\u0600-\u06FF]',  # Arabic
-        'ta-IN': r'[\u0B80-\u0BFF]',  # Tamil
-        'bn-IN': r'[\u0980-\u09FF]',  # Bengali
-        'pl-PL': r'[ąćęłńóśźż]',  # Polish
-    }
-    
-    for lang_code, pattern in language_patterns.items():
-        if re.search(pattern, text, re.IGNORECASE):
-            return lang_code
-    
-    return 'en-US'  # Default to English
+log = get_logger("api")
 
-def generate_speech_sync(text: str, language: str = 'en-US', voice_id_override: str = None):
-    """Generate speech with language-specific voice, allowing voice ID override."""
-    if not MURF_API_KEY or not text.strip():
-        return None
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Gives each request a trace ID (the caller's X-Trace-Id if sent) and a deadline, and records
+    its latency per route. Streaming responses are timed until their last chunk has been sent.
+    """
+    trace_id = new_trace_id(request.headers.get("X-Trace-Id"))
+    set_deadline(REQUEST_DEADLINE_SECONDS)
+    started = time.perf_counter()
+    response = await call_next(request)
+    response.headers["X-Trace-Id"] = trace_id
+    route = getattr(request.scope.get("route"), "path", "unmatched")
 
-    # Priority: 1. Explicit voice_id_override, 2. Language mapping, 3. Default
-    voice_id = voice_id_override or LANGUAGE_VOICE_MAP.get(language, MURF_VOICE_ID or 'en-US-natalie')
-    
-    print(f"Generating speech for language: {language} with voice: {voice_id}")
-    
-    url = "https://api.murf.ai/v1/speech/generate"
-    headers = {
-        "api-key": MURF_API_KEY,
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "text": text,
-        "voiceId": voice_id,
-        "format": "MP3",
-        "sampleRate": 44100,
-    }
-    
+    def finished():
+        elapsed = time.perf_counter() - started
+        REQUEST_SECONDS.observe(elapsed, request.method, route, str(response.status_code))
+        log.info("request", method=request.method, route=route, status=response.status_code,
+                 duration_ms=round(elapsed * 1000, 1))
+
+    body = response.body_iterator
+
+    async def timed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            finished()
+
+    response.body_iterator = timed_body()
+    return response
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse({"detail": exc.detail}, status_code=503, headers={"Retry-After": exc.retry_after_header})
+
+async def run_until_disconnect(request: Request, coro, poll_interval: float = 0.25):
+    """
+    Runs `coro` but cancels it as soon as the HTTP client goes away, so abandoned requests
+    stop holding Murf and Gemini capacity. Returns None if the client disconnected.
+    """
+    task = asyncio.create_task(coro)
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=60)
-        response.raise_for_status()
-        data = response.json()
-        return data.get("audioFile")
-    except requests.RequestException as e:
-        print(f"Error calling Murf AI: {e}")
-        return None
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                log.info("client.disconnected")
+                task.cancel()
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+
+# Startup work that /ready waits for; the worker itself starts serving immediately.
+startup_status = {"seeded": not SEED_SAMPLE_DATA, "error": None}
+background_tasks = set()
+
+def _background_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        log.error("background.failed", task=task.get_name(), error=repr(task.exception()))
+
+def spawn(coro, name: str) -> asyncio.Task:
+    """Runs `coro` in the background, holding a reference until it finishes and logging failures."""
+    task = asyncio.create_task(coro, name=name)
+    background_tasks.add(task)
+    task.add_done_callback(_background_done)
+    return task
+
+def seed_sample_data():
+    try:
+        populate_sample_data()
+        startup_status["seeded"] = True
+    except Exception as e:
+        startup_status["error"] = f"Seeding sample data failed: {e}"
+        log.error("startup.seed_failed", error=str(e))
 
 @app.on_event("startup")
-def on_startup():
-    """Populates Pinecone data on startup."""
-    populate_pinecone_data()
+async def on_startup():
+    """
+    Seeds the vector store and pre-renders predictable TTS in the background so a slow or
+    unreachable backend doesn't block boot.
+    """
+    if SEED_SAMPLE_DATA:
+        spawn(asyncio.to_thread(seed_sample_data), "seed_sample_data")
+    if TTS_PREWARM_ENABLED:
+        spawn(prewarm_loop(), "prewarm_loop")
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
-    """Handles chat requests and generates speech in one go."""
-    # Detect language from user message (override the request language if non-English detected)
-    detected_language = detect_language_from_text(request.user_message)
-    
-    # Use detected language if it's not English, otherwise use the requested language
-    final_language = detected_language if detected_language != 'en-US' else request.language
-    
-    print(f"Detected language: {detected_language}, Using language: {final_language}")
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Stops background work and closes pooled upstream connections."""
+    for task in list(background_tasks):
+        task.cancel()
+    await close_murf_client()
+
+def build_initial_state(request: ChatRequest, session: Session):
+    """Detects the reply language and builds the initial graph state for a chat turn."""
+    # An explicit client language wins; otherwise confident detections, then the session's language.
+    guess = choose_language(request.user_message, request.language, session.language)
+    final_language = guess.language
+    log.info("language", requested=request.language, using=final_language, confidence=guess.confidence)
     
     # Add language context to the system prompt
     language_context = f"User is speaking in {final_language}. Respond in the same language."
     
+    # Only the recent, uncompacted part of the conversation is replayed to the model.
     history_messages = [
         HumanMessage(content=msg['content']) if msg['role'] == 'user'
         else AIMessage(content=msg['content'])
-        for msg in request.history
+        for msg in session.messages
     ]
 
     initial_state = {
         "messages": [("system", language_context)] + history_messages + [HumanMessage(content=request.user_message)],
-        "retrieved_products": {},
-        "product_context_ids": [],
-        "detected_language": final_language  # Pass the final language to state
+        "retrieved_products": dict(session.retrieved_products),
+        "product_context_ids": list(session.product_context_ids),
+        "detected_language": final_language,  # Pass the final language to state
+        "conversation_summary": session.summary,
+        "special_deal": None,
+        "described_product_ids": [],
+        "llm_calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
     }
-    
-    final_state = await chatbot_graph.ainvoke(initial_state)
-    final_answer_args = final_state["messages"][-1].tool_calls[0]['args']
-    
-    agent_text_response = final_answer_args['text']
+    return initial_state, final_language
 
-    # Generate Audio with language-specific voice
-    audio_url = generate_speech_sync(
-        agent_text_response, 
-        final_language,  # Use the final determined language
-        request.voice_id
-    )
+def finish_turn(session: Session, request: ChatRequest, answer_text: str, final_state):
+    """Stores the turn in the session and compacts older turns in the background if over budget."""
+    session_store.record_turn(session, request.user_message, answer_text, final_state)
+    if session_store.needs_compaction(session):
+        spawn(session_store.compact(session.session_id), "session_compact")
+
+def build_answer(final_state):
+    """Extracts the FinalAnswer args, referenced products and deal from a finished graph run."""
+    final_answer_args = final_answer_call(final_state["messages"][-1])['args']
 
     all_retrieved_products = {}
     for products_dict in final_state.get('__intermediate_steps__', []):
@@ -150,84 +198,545 @@ async def chat_endpoint(request: ChatRequest):
         if pid in all_retrieved_products
     ]
 
-    response_deal = None
-    if final_answer_args.get('deal_heading') and final_answer_args.get('deal_product_ids'):
-        deal_products = [
-            all_retrieved_products[pid]
-            for pid in final_answer_args['deal_product_ids']
-            if pid in all_retrieved_products
-        ]
-        if deal_products:
-            response_deal = SpecialDeal(
-                heading=final_answer_args['deal_heading'],
-                deal_price=final_answer_args['deal_price'],
-                products_involved=deal_products
-            )
+    # Deal prices always come from the deal engine, never from the model. A deal the model
+    # announced without calling get_deal is recomputed for the products it named.
+    response_deal = final_state.get("special_deal")
+    if response_deal is None and final_answer_args.get('deal_heading') and final_answer_args.get('deal_product_ids'):
+        response_deal = get_deal_engine().best_deal(final_answer_args['deal_product_ids'])
+    model_heading = final_answer_args.get('deal_heading')
+    if response_deal is not None and model_heading and model_heading != response_deal.heading:
+        # The model's wording (e.g. translated) is kept only if it quotes no amount the engine didn't.
+        if keeps_deal_terms(model_heading, response_deal):
+            response_deal = response_deal.model_copy(update={"heading": model_heading})
+        else:
+            log.warning("deal.heading_rejected", heading=model_heading, deal_price=response_deal.deal_price)
+
+    return final_answer_args['text'], response_products, response_deal
+
+def turn_usage(final_state) -> dict:
+    usage = {key: final_state.get(key, 0) for key in ("llm_calls", "prompt_tokens", "completion_tokens")}
+    log.info("turn.usage", **usage)
+    return usage
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest, http_request: Request):
+    """Handles chat requests and generates speech in one go."""
+    async with admitted():
+        response = await run_until_disconnect(http_request, run_chat_turn(request))
+    if response is None:
+        return Response(status_code=499)
+    return response
+
+async def response_cache_key(request: ChatRequest, session: Session, final_language: str):
+    """Response-cache lookup arguments for this turn, or None if the turn isn't cacheable."""
+    cache = get_response_cache()
+    if cache is None or session.summary or len(session.messages) > RESPONSE_CACHE_MAX_HISTORY:
+        return None
+    vector = await asyncio.to_thread(get_embeddings_model().embed_query, request.user_message)
+    catalog = await asyncio.to_thread(get_catalog_index)
+    return {"vector": vector, "language": final_language,
+            "voice_id": resolve_voice(final_language, request.voice_id), "catalog_version": catalog.version}
 
+def cached_turn(request: ChatRequest, session: Session, final_language: str, cached: ChatResponse) -> ChatResponse:
+    """Records a turn answered from the response cache in the session."""
+    log.info("response_cache.hit", message=request.user_message)
+    response = cached.model_copy(update={"session_id": session.session_id, "usage": turn_usage({})})
+    final_state = {
+        "detected_language": final_language,
+        "retrieved_products": {product.id: product for product in response.products},
+        "product_context_ids": [product.id for product in response.products],
+    }
+    finish_turn(session, request, response.text, final_state)
+    return response
+
+def completed_turn(request: ChatRequest, session: Session, final_state) -> ChatResponse:
+    """Records a finished graph run in the session and builds its (audio-less) response."""
+    agent_text_response, response_products, response_deal = build_answer(final_state)
+    finish_turn(session, request, agent_text_response, final_state)
     return ChatResponse(
         text=agent_text_response,
-        audio_url=audio_url,
+        session_id=session.session_id,
         products=response_products,
-        special_deal=response_deal
+        special_deal=response_deal,
+        usage=turn_usage(final_state),
     )
 
-@app.post("/generate-speech")
-def generate_speech(req: TTSRequest):
+async def answer_turn(request: ChatRequest, session: Session):
+    """
+    Produces the reply for one turn and records it in the session. Returns (language, response,
+    cache_key, cached); the response has no reply audio yet unless it came from the cache.
+    """
+    async with aclosing(stream_answer_turn(request, session)) as events:
+        async for event in events:
+            if event["type"] == "answer":
+                return event["result"]
+
+# Nodes whose FinalAnswer calls carry the reply text; the formatter writes it as plain text.
+ANSWER_NODES = {"agent", "final_answer_formatter"}
+PLAIN_TEXT_NODES = {"final_answer_formatter"}
+
+async def stream_answer_turn(request: ChatRequest, session: Session):
+    """
+    Runs one turn, from the response cache when possible. While the graph runs it yields `meta`,
+    then `delta` (and `reset`) events with the answer text as the model writes it, and `products`
+    as soon as a search has returned. The last item is {"type": "answer", "result": <answer_turn's
+    tuple>}. If the graph fails, the answer is the canned apology and the turn isn't recorded.
+    """
+    async with session_store.lock(session.session_id):
+        initial_state, final_language = build_initial_state(request, session)
+        yield {"type": "meta", "session_id": session.session_id, "language": final_language}
+        try:
+            cache_key = await response_cache_key(request, session, final_language)
+            cached = cache_key and get_response_cache().lookup(**cache_key)
+        except Exception as e:
+            # The cache is an optimization: an embedding or catalog failure makes this turn a miss.
+            log.warning("response_cache.lookup_failed", error=str(e))
+            cache_key = cached = None
+        if cached:
+            response = cached_turn(request, session, final_language, cached)
+            yield {"type": "delta", "text": response.text}
+            yield {"type": "answer", "result": (final_language, response, cache_key, True)}
+            return
+
+        text_stream = AnswerTextStream()
+        speculation = SpeculativeSpeech(final_language, request.voice_id, audio=request.audio_mode != "none")
+        final_state = None
+        try:
+            async with aclosing(chatbot_graph.astream_events(initial_state, version="v2")) as events:
+                async for event in events:
+                    kind, node = event["event"], event.get("metadata", {}).get("langgraph_node")
+                    if kind == "on_chat_model_stream" and node in ANSWER_NODES:
+                        for text_event in text_stream.feed(event["run_id"], event["data"]["chunk"],
+                                                           plain_text=node in PLAIN_TEXT_NODES):
+                            yield text_event
+                    elif kind == "on_chain_end" and node == "tools" and event["name"] == "tools":
+                        output = event["data"]["output"]
+                        found = output.get("retrieved_products", {})
+                        products = [found[pid] for pid in output.get("product_context_ids", []) if pid in found]
+                        # Speak the deal heading (and product one-liners) while the reply is written.
+                        speculation.start(products, output.get("special_deal"))
+                        if products:
+                            yield {"type": "products", "products": jsonable_encoder(products)}
+                    elif kind == "on_chain_end" and not event["parent_ids"]:
+                        final_state = event["data"]["output"]
+            response = completed_turn(request, session, final_state)
+        except Exception as e:
+            # Not recorded in the session, so the user can simply ask again.
+            log.error("turn.failed", error=str(e), exc_info=True)
+            speculation.cancel()
+            response = ChatResponse(text=canned_text("error", final_language), session_id=session.session_id)
+            cache_key = None
+
+        for text_event in text_stream.finish(response.text):
+            yield text_event
+    response = speculation.attach(response)
+    yield {"type": "answer", "result": (final_language, response, cache_key, False)}
+
+def audio_options(request: ChatRequest) -> Tuple[str, Optional[int]]:
+    """Format and sample rate of reply audio: the client's choice, else compact for inline, else MP3."""
+    if request.audio_format:
+        return request.audio_format, request.audio_sample_rate
+    if request.audio_mode == "inline":
+        return TTS_INLINE_FORMAT, request.audio_sample_rate or TTS_INLINE_SAMPLE_RATE
+    return "MP3", request.audio_sample_rate or 44100
+
+def standard_audio(request: ChatRequest) -> bool:
+    """True if the client takes the audio URL in the default format, the only one the response cache keeps."""
+    return request.audio_mode == "url" and audio_options(request) == ("MP3", 44100)
+
+async def reply_audio(text: str, language: str, request: ChatRequest) -> dict:
+    """Audio fields of a response (or `audio` event) for `text`, as the request's audio_mode asks."""
+    if request.audio_mode == "none":
+        return {"audio_url": None}
+    format, sample_rate = audio_options(request)
+    inline = request.audio_mode == "inline"
+    result = await synthesize_audio(text, language, request.voice_id, format=format, sample_rate=sample_rate,
+                                    include_base64=inline)
+    fields = {"audio_url": result.audio_url if result else None}
+    if inline:
+        fields["audio_base64"] = result.audio_base64 if result else None
+        fields["audio_mime_type"] = AUDIO_MIME_TYPES.get(format) if result else None
+    return fields
+
+def store_cached_response(cache_key, request: ChatRequest, response: ChatResponse):
+    if cache_key:
+        audio_url = response.audio_url if standard_audio(request) else None
+        response = response.model_copy(update={"audio_url": audio_url, "audio_base64": None, "audio_mime_type": None})
+        get_response_cache().store(message=request.user_message, response=response, **cache_key)
+
+async def run_chat_turn(request: ChatRequest) -> ChatResponse:
+    session = session_store.get_or_create(request.session_id, request.history)
+    final_language, response, cache_key, cached = await answer_turn(request, session)
+    if cached and response.audio_url and standard_audio(request):
+        return response
+
+    response = response.model_copy(update=await reply_audio(response.text, final_language, request))
+    if not cached:
+        store_cached_response(cache_key, request, response)
+    return response
+
+async def started(stream):
+    """
+    Runs `stream` up to its first item before the response starts, so errors raised on the way
+    (Overloaded while waiting for admission) are proper HTTP errors instead of a broken stream.
+    A started generator is always finalized, so its cleanup runs even if the body is never sent.
+    """
+    first = await stream.__anext__()
+
+    async def resumed():
+        async with aclosing(stream):
+            yield first
+            async for item in stream:
+                yield item
+
+    return resumed()
+
+async def chat_turn_events(request: ChatRequest, session: Session):
+    """
+    The events of one streamed turn, as dicts, for /chat/stream and /ws/voice. Holds a chat slot
+    for as long as it runs; raises Overloaded before the first event if none is free.
+    """
+    final_language = request.language
+
+    async def synthesize(sentence: str):
+        return await reply_audio(sentence, final_language, request)
+
+    # Speech for each sentence starts as soon as the sentence is complete.
+    speech = SentenceSpeech(synthesize, TTS_SENTENCE_CONCURRENCY)
+    # The turn holds a chat slot until the stream ends, however it ends.
+    async with admitted():
+        try:
+            # aclosing() releases the session lock as soon as the client goes away.
+            async with aclosing(stream_answer_turn(request, session)) as turn_events:
+                async for event in turn_events:
+                    if event["type"] == "answer":
+                        final_language, response, cache_key, cached = event["result"]
+                        break
+                    if event["type"] == "meta":
+                        final_language = event["language"]
+                    elif event["type"] == "delta":
+                        speech.feed(event["text"])
+                    elif event["type"] == "reset":
+                        speech.reset()
+                    yield event
+                    for audio_event in speech.ready():
+                        yield audio_event
+            if not cached:
+                store_cached_response(cache_key, request, response)
+
+            speech.flush()
+            yield {"type": "products", "products": jsonable_encoder(response.products)}
+            if response.special_deal:
+                yield {"type": "deal", "deal": jsonable_encoder(response.special_deal)}
+            async for audio_event in speech.remaining():
+                yield audio_event
+            yield {
+                "type": "done",
+                "text": response.text,
+                "product_ids": [product.id for product in response.products],
+                "usage": response.usage,
+            }
+        finally:
+            speech.cancel()
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Streaming variant of /chat. Emits newline-delimited JSON events as the turn runs: `meta`,
+    `delta` with answer text as the model writes it, `products` as soon as a search returns,
+    and one `audio` event per sentence, in order, as its speech becomes ready. `reset` means the
+    text and audio sent so far were superseded and should be dropped. The turn ends with the
+    final `products` and `deal`, then `done` with the full text and product IDs.
+    """
+    session = session_store.get_or_create(request.session_id, request.history)
+
+    async def event_stream():
+        async with aclosing(chat_turn_events(request, session)) as events:
+            async for event in events:
+                yield ndjson_line(event)
+
+    return StreamingResponse(await started(event_stream()), media_type="application/x-ndjson")
+
+# ChatRequest fields a voice socket keeps for all of its turns.
+VOICE_SETTINGS = {"language", "voice_id", "audio_mode", "audio_format", "audio_sample_rate"}
+
+@app.websocket("/ws/voice")
+async def voice_socket(websocket: WebSocket):
+    """
+    A voice conversation over one socket, with one session for the life of the connection. The
+    client sends JSON messages: `start` (optional session_id, language, voice_id and audio
+    settings, kept for later turns), `utterance` with the transcribed `text`, and `barge_in`
+    when the user talks over the reply. Each utterance runs as a turn that sends the /chat/stream
+    events tagged with its `turn` number; audio comes inline unless `audio_mode` says otherwise.
+    A new utterance or `barge_in` cancels the running turn's model call and speech, answered
+    with `cancelled`. Errors are sent as `error` events and keep the socket open.
+    """
+    await websocket.accept()
+    settings = {"audio_mode": "inline"}
+    session_id = None
+    turn, turn_number = None, 0
+    send_lock = asyncio.Lock()
+
+    async def send(event: dict):
+        async with send_lock:
+            await websocket.send_json(event)
+
+    async def run_turn(number: int, request: ChatRequest):
+        # The HTTP middleware doesn't see websockets: each turn gets its own trace ID and deadline.
+        new_trace_id()
+        set_deadline(REQUEST_DEADLINE_SECONDS)
+        session = session_store.get_or_create(request.session_id)
+        try:
+            async with aclosing(chat_turn_events(request, session)) as events:
+                async for event in events:
+                    await send({**event, "turn": number})
+        except Overloaded as e:
+            await send({"type": "error", "turn": number, "status": 503, "detail": e.detail,
+                        "retry_after": e.retry_after})
+        except Exception as e:
+            log.error("voice.turn_failed", turn=number, error=str(e))
+            with suppress(Exception):
+                await send({"type": "error", "turn": number, "status": 500, "detail": "The turn failed"})
+
+    async def cancel_turn():
+        nonlocal turn
+        if turn is not None and not turn.done():
+            turn.cancel()
+            # Wait for the slot, session lock and speech tasks to be released before going on.
+            await asyncio.wait({turn})
+            log.info("voice.barge_in", turn=turn_number)
+            await send({"type": "cancelled", "turn": turn_number})
+        turn = None
+
+    try:
+        while True:
+            try:
+                message = VoiceMessage.model_validate(await websocket.receive_json())
+                if message.type == "barge_in":
+                    await cancel_turn()
+                    continue
+                updated = {**settings, **message.model_dump(include=VOICE_SETTINGS, exclude_none=True)}
+                request = ChatRequest(user_message=message.text or "", session_id=message.session_id or session_id,
+                                      **updated)
+            except ValueError as e:
+                await send({"type": "error", "status": 400, "detail": str(e)})
+                continue
+            settings = updated
+            if message.type == "utterance" and not request.user_message.strip():
+                await send({"type": "error", "status": 400, "detail": "text is required"})
+                continue
+            if session_id is None or request.session_id != session_id:
+                session_id = session_store.get_or_create(request.session_id).session_id
+                request.session_id = session_id
+                await send({"type": "session", "session_id": session_id})
+            if message.type == "utterance":
+                await cancel_turn()
+                turn_number += 1
+                turn = asyncio.create_task(run_turn(turn_number, request))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if turn is not None:
+            turn.cancel()
+
+def speech_voice(req: TTSRequest) -> Optional[str]:
+    """The provided voice_id, else the language's voice, else MURF_VOICE_ID."""
+    return req.voice_id or LANGUAGE_VOICE_MAP.get(req.language, MURF_VOICE_ID)
+
+@app.post("/generate-speech", response_model=TTSResponse)
+async def generate_speech(req: TTSRequest, http_request: Request):
     if not MURF_API_KEY:
         raise HTTPException(500, "Missing MURF_API_KEY env variable")
     if not req.text or not req.text.strip():
         raise HTTPException(400, "Text is required")
     
-    # Use provided voice_id or determine from language
-    voice_id = req.voice_id or LANGUAGE_VOICE_MAP.get(req.language, MURF_VOICE_ID)
+    voice_id = speech_voice(req)
     if not voice_id:
         raise HTTPException(400, "voice_id is required (or set MURF_VOICE_ID env var)")
     
-    print("text:", req.text)
-    print("voice_id:", voice_id)
-    print("language:", req.language)
-
-    url = "https://api.murf.ai/v1/speech/generate"
-    headers = {
-        "api-key": MURF_API_KEY,
-        "Content-Type": "application/json",
-    }
-    
-    payload = {
-        "text": req.text,
-        "voiceId": voice_id,
-        "format": (req.format or "MP3").upper(),
-        "sampleRate": req.sample_rate,
-        "style": req.style,
-        "encodeAsBase64": bool(req.encode_as_base64),
-    }
-    
-    payload = {k: v for k, v in payload.items() if v is not None}
+    log.info("generate_speech", voice_id=voice_id, language=req.language, chars=len(req.text))
 
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=60)
-        r.raise_for_status()
-        data = r.json()
-        audio_url = data.get("audioFile")
-        audio_b64 = data.get("encodedAudio")
-
-        print(audio_url)
-
-        if not audio_url and not audio_b64:
-            raise HTTPException(502, "Murf did not return audio")
-
-        return {"audio_url": audio_url, "audio_base64": audio_b64, "meta": {
-            "length_seconds": data.get("audioLengthInSeconds"),
-            "consumed_chars": data.get("consumedCharacterCount"),
-            "remaining_chars": data.get("remainingCharacterCount"),
-            "warning": data.get("warning"),
-        }}
-    except requests.HTTPError as e:
-        detail = e.response.text if e.response is not None else str(e)
-        raise HTTPException(status_code=e.response.status_code if e.response else 502,
-                            detail=f"Murf API error: {detail}")
-    except requests.RequestException as e:
-        raise HTTPException(502, f"Network error calling Murf: {e}")
+        result = await run_until_disconnect(http_request, synthesize(
+            req.text, voice_id, format=req.format, sample_rate=req.sample_rate,
+            style=req.style, include_base64=bool(req.encode_as_base64),
+        ))
+    except MurfError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if result is None:
+        return Response(status_code=499)
+
+    if not result.audio_url and not result.audio_base64:
+        raise HTTPException(502, "Murf did not return audio")
+
+    return result
+
+def batch_meta(items) -> TTSMeta:
+    """Totals over a batch: characters consumed, audio length (if known for every item), all cached."""
+    done = [item for item in items if item.error is None]
+    lengths = [item.meta.length_seconds for item in done]
+    return TTSMeta(
+        consumed_chars=sum(item.meta.consumed_chars or 0 for item in done),
+        length_seconds=None if None in lengths else round(sum(lengths), 3),
+        cached=bool(done) and all(item.meta.cached or item.duplicate_of is not None for item in done),
+    )
+
+@app.post("/generate-speech/batch", response_model=TTSBatchResponse)
+async def generate_speech_batch(req: TTSBatchRequest, http_request: Request):
+    """
+    Several texts in one call, synthesized concurrently with identical clips synthesized once.
+    Returns one result per item (failures marked on the item), or with `concatenate` a single clip
+    of all items in order as well. Every item carries its consumed_chars and synthesis time.
+    """
+    if not MURF_API_KEY:
+        raise HTTPException(500, "Missing MURF_API_KEY env variable")
+    if not req.items:
+        raise HTTPException(400, "At least one item is required")
+    if len(req.items) > TTS_BATCH_MAX_ITEMS:
+        raise HTTPException(413, f"At most {TTS_BATCH_MAX_ITEMS} items per batch")
+
+    items = req.items
+    if req.concatenate:
+        # Clips can only be joined if they share a format and sample rate.
+        format = (req.format or items[0].format or "MP3").upper()
+        if format not in CONCATENABLE_FORMATS:
+            raise HTTPException(400, f"{format} can't be concatenated; use one of {', '.join(CONCATENABLE_FORMATS)}")
+        sample_rate = req.sample_rate or items[0].sample_rate
+        items = [item.model_copy(update={"format": format, "sample_rate": sample_rate, "encode_as_base64": False})
+                 for item in items]
+    voice_ids = []
+    for index, item in enumerate(items):
+        if not item.text or not item.text.strip():
+            raise HTTPException(400, f"items[{index}]: Text is required")
+        voice_id = speech_voice(item)
+        if not voice_id:
+            raise HTTPException(400, f"items[{index}]: voice_id is required (or set MURF_VOICE_ID env var)")
+        voice_ids.append(voice_id)
+
+    log.info("generate_speech.batch", items=len(items), chars=sum(len(item.text) for item in items),
+             concatenate=req.concatenate)
+    started = time.perf_counter()
+    results = await run_until_disconnect(http_request, synthesize_batch(items, voice_ids, TTS_BATCH_CONCURRENCY))
+    if results is None:
+        return Response(status_code=499)
+    response = TTSBatchResponse(items=results, meta=batch_meta(results))
+
+    if req.concatenate:
+        failed = next((item for item in results if item.error is not None), None)
+        if failed is not None:
+            raise HTTPException(failed.status_code or 502, f"items[{failed.index}]: {failed.error}")
+        keys = [clip_key(item, voice_id) for item, voice_id in zip(items, voice_ids)]
+        try:
+            key, entry = await asyncio.to_thread(concatenate_clips, keys, format)
+        except ValueError as e:
+            raise HTTPException(502, f"Could not join the clips: {e}")
+        response.audio_url = local_audio_url(key)
+        if req.encode_as_base64:
+            response.audio_base64 = base64.b64encode(entry.audio).decode()
+
+    response.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    return response
+
+@app.get("/greeting")
+async def greeting(language: str = "en-US", voice_id: Optional[str] = None):
+    """The assistant's opening line and its audio, pre-rendered when TTS_PREWARM_ENABLED is on."""
+    text = canned_text("greeting", language)
+    return {"text": text, "audio_url": await synthesize_speech(text, language, voice_id)}
+
+def byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) of a single `Range: bytes=...` request, or None to send the whole body
+    (no header, several ranges, or a malformed one). Raises ValueError if it can't be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, sep, last = header[len("bytes="):].strip().partition("-")
+    if not sep or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:  # suffix range: the last N bytes
+        if int(last) == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range starts past the end")
+    return start, min(int(last), size - 1) if last else size - 1
+
+@app.get("/audio/{audio_id}")
+def get_audio(audio_id: str, request: Request):
+    """Serves synthesized audio by content hash, with Range support for seeking and resumed downloads."""
+    entry = get_audio_store().get(audio_id)
+    if entry is None:
+        raise HTTPException(404, "Audio not found")
+    # Content-addressed, so the bytes behind an ID never change.
+    etag = f'"{audio_id}"'
+    headers = {"Cache-Control": "public, max-age=31536000, immutable", "Accept-Ranges": "bytes", "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    size = len(entry.audio)
+    try:
+        requested = byte_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if requested is None:
+        return Response(entry.audio, media_type=entry.mime_type, headers=headers)
+    start, end = requested
+    return Response(entry.audio[start:end + 1], status_code=206, media_type=entry.mime_type,
+                    headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"})
+
+@app.get("/response-cache/stats")
+def response_cache_stats():
+    """Hit/miss counters of the semantic response cache."""
+    cache = get_response_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+@app.get("/context-cache/stats")
+def context_cache_stats():
+    """Live Gemini context caches, hit/miss counters and prompt prefixes too small to cache."""
+    return get_context_cache().stats()
+
+@app.get("/admission/stats")
+def admission_stats_endpoint():
+    """In-flight and waiting counts of the chat gate and each upstream limiter."""
+    return admission_stats()
+
+@app.get("/metrics")
+def metrics():
+    """Request and span latency histograms in the Prometheus text format."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health")
+def health():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: sample data is seeded, the vector store answers and the API keys are configured."""
+    checks = {"seeded": startup_status["seeded"], "google_api_key": bool(GOOGLE_API_KEY), "murf_api_key": bool(MURF_API_KEY)}
+    try:
+        vectors = await asyncio.wait_for(asyncio.to_thread(lambda: get_vector_store().count()), timeout=5)
+        checks["vector_store"] = vectors > 0
+    except Exception as e:
+        log.warning("ready.vector_store_unavailable", error=str(e))
+        checks["vector_store"] = False
+    is_ready = all(checks.values())
+    body = {"status": "ready" if is_ready else "not ready", "checks": checks}
+    if startup_status["error"]:
+        body["error"] = startup_status["error"]
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
+@app.get("/tts-cache/stats")
+def tts_cache_stats():
+    """Hit/miss counters and Murf characters saved by the TTS cache."""
+    cache = get_tts_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
 
 if __name__ == "__main__":
     import uvicorn
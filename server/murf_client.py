@@ -0,0 +1,126 @@
+import asyncio
+import random
+from typing import Optional
+
+import httpx
+
+from config import (
+    MURF_API_KEY, MURF_API_URL, MURF_MAX_CONNECTIONS, MURF_MAX_CONCURRENCY_PER_HOST,
+    MURF_MAX_RETRIES, MURF_TIMEOUT_SECONDS,
+)
+from admission import UPSTREAMS, DeadlineExceeded, Limiter, time_left
+from tracing import get_logger, span
+
+log = get_logger("murf")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class MurfError(Exception):
+    """Raised when Murf returns an error or cannot be reached after all retries."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+class MurfClient:
+    """
+    Shared async Murf client. One pooled keep-alive `httpx.AsyncClient` serves every request,
+    a limiter caps in-flight calls (and their rate), and 429/5xx responses are retried with
+    full-jitter exponential backoff. Attempts, backoff and HTTP timeouts all stop at the request
+    deadline. Cancelling the awaiting task aborts the HTTP call.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        url: str = MURF_API_URL,
+        max_connections: int = MURF_MAX_CONNECTIONS,
+        max_concurrency_per_host: int = MURF_MAX_CONCURRENCY_PER_HOST,
+        max_retries: int = MURF_MAX_RETRIES,
+        timeout: float = MURF_TIMEOUT_SECONDS,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0,
+        limiter: Optional[Limiter] = None,
+    ):
+        self.api_key = api_key
+        self.url = url
+        self.limiter = limiter or Limiter("murf", max_concurrency_per_host)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._http = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=30.0,
+            ),
+        )
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_cap)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    async def generate(self, payload: dict) -> dict:
+        """POSTs a speech generation payload and returns Murf's JSON response."""
+        headers = {
+            "api-key": self.api_key,
+            "Content-Type": "application/json",
+        }
+        last_error = MurfError(502, "Murf request was not attempted")
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            budget = time_left(self.timeout)
+            if budget == 0:
+                raise MurfError(504, "Request deadline exceeded before Murf answered")
+            try:
+                async with self.limiter.slot():
+                    with span("tts", "murf_request", attempt=attempt):
+                        response = await self._http.post(self.url, headers=headers, json=payload,
+                                                         timeout=httpx.Timeout(budget, connect=min(10.0, budget)))
+            except DeadlineExceeded:
+                raise MurfError(504, "Request deadline exceeded while waiting for Murf capacity")
+            except httpx.TransportError as e:
+                last_error = MurfError(502, f"Network error calling Murf: {e}")
+            else:
+                if response.status_code < 400:
+                    try:
+                        return response.json()
+                    except ValueError:  # truncated or non-JSON body; retrying would bill the characters again
+                        raise MurfError(502, f"Murf returned an unreadable response: {response.text[:200]}")
+                last_error = MurfError(response.status_code, f"Murf API error: {response.text}")
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    raise last_error
+                retry_after = response.headers.get("retry-after")
+
+            if attempt < self.max_retries:
+                delay = self._backoff_delay(attempt, retry_after)
+                if time_left(delay) < delay:
+                    break  # the retry would start after the deadline
+                log.warning("murf.retry", status=last_error.status_code, attempt=attempt, delay_s=round(delay, 2))
+                await asyncio.sleep(delay)
+        raise last_error
+
+    async def aclose(self):
+        await self._http.aclose()
+
+_murf_client: Optional[MurfClient] = None
+
+def get_murf_client() -> MurfClient:
+    """Returns the process-wide Murf client, creating it on first use."""
+    global _murf_client
+    if _murf_client is None:
+        _murf_client = MurfClient(api_key=MURF_API_KEY, limiter=UPSTREAMS["murf"])
+    return _murf_client
+
+async def close_murf_client():
+    global _murf_client
+    if _murf_client is not None:
+        await _murf_client.aclose()
+        _murf_client = None
@@ -0,0 +1,200 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    MURF_API_KEY, TTS_PREWARM_LANGUAGES, TTS_PREWARM_CATALOG_LANGUAGES, TTS_PREWARM_CONCURRENCY,
+    TTS_PREWARM_INTERVAL_SECONDS, TTS_SPECULATIVE_ENABLED, TTS_SPECULATIVE_PRODUCTS,
+)
+from deals import get_deal_engine, product_from_metadata
+from murf_client import MurfError
+from schemas import ChatResponse, Product, SpecialDeal
+from search import get_catalog_index
+from tracing import get_logger, span
+from tts import LANGUAGE_VOICE_MAP, resolve_voice, synthesize, synthesize_speech
+from tts_cache import get_tts_cache, tts_cache_key
+
+log = get_logger("prewarm")
+
+# Fixed phrases per language. Languages without an entry (those whose voice falls back to
+# English) use the en-US text.
+CANNED_UTTERANCES: Dict[str, Dict[str, str]] = {
+    'en-US': {
+        "greeting": "Hello! What are you looking for today? I can help you find products and negotiate prices.",
+        "error": "Sorry, something went wrong on my side. Please try again.",
+    },
+    'es-ES': {
+        "greeting": "¡Hola! ¿Qué estás buscando hoy? Puedo ayudarte a encontrar productos y negociar precios.",
+        "error": "Lo siento, algo ha fallado por mi parte. Por favor, inténtalo de nuevo.",
+    },
+    'de-DE': {
+        "greeting": "Hallo! Wonach suchen Sie heute? Ich helfe Ihnen, Produkte zu finden und Preise auszuhandeln.",
+        "error": "Entschuldigung, bei mir ist etwas schiefgelaufen. Bitte versuchen Sie es noch einmal.",
+    },
+    'pt-BR': {
+        "greeting": "Olá! O que você está procurando hoje? Posso ajudar você a encontrar produtos e negociar preços.",
+        "error": "Desculpe, algo deu errado do meu lado. Por favor, tente novamente.",
+    },
+    'ja-JP': {
+        "greeting": "こんにちは！今日は何をお探しですか？商品探しや価格交渉をお手伝いします。",
+        "error": "申し訳ありません、問題が発生しました。もう一度お試しください。",
+    },
+    'ko-KR': {
+        "greeting": "안녕하세요! 오늘은 무엇을 찾고 계신가요? 제품 찾기와 가격 협상을 도와드릴게요.",
+        "error": "죄송합니다. 문제가 발생했습니다. 다시 시도해 주세요.",
+    },
+    'zh-CN': {
+        "greeting": "您好！今天想找点什么？我可以帮您挑选产品、商量价格。",
+        "error": "抱歉，我这边出了点问题，请再试一次。",
+    },
+    'hi-IN': {
+        "greeting": "नमस्ते! आज आप क्या ढूंढ रहे हैं? मैं आपको प्रोडक्ट ढूंढने और दाम तय करने में मदद कर सकता हूँ।",
+        "error": "माफ़ कीजिए, मेरी तरफ़ से कुछ गड़बड़ हो गई। कृपया फिर से कोशिश करें।",
+    },
+    'ta-IN': {
+        "greeting": "வணக்கம்! இன்று நீங்கள் என்ன தேடுகிறீர்கள்? பொருட்களைக் கண்டுபிடிக்கவும் விலை பேசவும் நான் உதவுகிறேன்.",
+        "error": "மன்னிக்கவும், ஏதோ தவறு நடந்துவிட்டது. மீண்டும் முயற்சிக்கவும்.",
+    },
+    'bn-IN': {
+        "greeting": "নমস্কার! আজ আপনি কী খুঁজছেন? আমি আপনাকে পণ্য খুঁজতে আর দাম নিয়ে কথা বলতে সাহায্য করতে পারি।",
+        "error": "দুঃখিত, আমার দিকে কিছু সমস্যা হয়েছে। অনুগ্রহ করে আবার চেষ্টা করুন।",
+    },
+    'pl-PL': {
+        "greeting": "Cześć! Czego dziś szukasz? Pomogę Ci znaleźć produkty i wynegocjować cenę.",
+        "error": "Przepraszam, coś poszło nie tak po mojej stronie. Spróbuj ponownie.",
+    },
+}
+
+# The deal engine's headings and the product one-liners are written in English.
+SPECULATIVE_LANGUAGES = {"en-US"}
+
+def canned_text(name: str, language: str) -> str:
+    return CANNED_UTTERANCES.get(language, CANNED_UTTERANCES['en-US'])[name]
+
+def product_one_liner(product: Product) -> str:
+    """Short spoken summary of a product card."""
+    return (f"The {product.company_name} {product.model_name} with {product.capacity}GB storage "
+            f"and {product.ram}GB RAM, for ₹{product.max_price:,}.")
+
+def canned_utterances(languages: List[str]) -> List[Tuple[str, str]]:
+    """(text, voice_id) pairs for every canned phrase in `languages`."""
+    return [(text, resolve_voice(language)) for language in languages for text in
+            (canned_text(name, language) for name in CANNED_UTTERANCES['en-US'])]
+
+def catalog_utterances(languages: List[str]) -> List[Tuple[str, str]]:
+    """(text, voice_id) pairs for each product's deal heading and, if products are spoken, its one-liner."""
+    languages = [language for language in languages if language in SPECULATIVE_LANGUAGES]
+    if not languages:
+        return []
+    engine = get_deal_engine()
+    texts = []
+    for vector_id, metadata in engine.metadata.items():
+        deal = engine.best_deal([vector_id])
+        if deal is not None:
+            texts.append(deal.heading)
+        product = product_from_metadata(vector_id, metadata) if TTS_SPECULATIVE_PRODUCTS else None
+        if product is not None:
+            texts.append(product_one_liner(product))
+    return [(text, resolve_voice(language)) for language in languages for text in texts]
+
+async def prewarm(utterances: List[Tuple[str, str]]) -> Dict[str, int]:
+    """Synthesizes every (text, voice) pair that isn't in the TTS cache yet. Returns counts."""
+    cache = get_tts_cache()
+    stats = {"cached": 0, "rendered": 0, "failed": 0}
+    if cache is None or not MURF_API_KEY:
+        return stats
+    missing = []
+    for text, voice_id in dict.fromkeys(utterances):
+        if cache.contains(tts_cache_key(text, voice_id, "MP3", 44100, None)):
+            stats["cached"] += 1
+        else:
+            missing.append((text, voice_id))
+
+    semaphore = asyncio.Semaphore(max(1, TTS_PREWARM_CONCURRENCY))
+
+    async def render(text: str, voice_id: str):
+        async with semaphore:
+            try:
+                await synthesize(text, voice_id)
+                stats["rendered"] += 1
+            except MurfError as e:
+                stats["failed"] += 1
+                log.warning("prewarm.failed", voice_id=voice_id, status=e.status_code, error=e.detail)
+
+    with span("tts", "prewarm", utterances=len(missing)):
+        await asyncio.gather(*(render(text, voice_id) for text, voice_id in missing))
+    return stats
+
+async def prewarm_loop():
+    """
+    Renders the canned phrases once, then the catalog's deal headings and one-liners, and
+    re-renders the catalog part whenever its version changes. Runs for the life of the process.
+    """
+    languages = TTS_PREWARM_LANGUAGES or list(LANGUAGE_VOICE_MAP)
+    log.info("prewarm.canned", languages=languages, **await prewarm(canned_utterances(languages)))
+    catalog_version = None
+    while True:
+        try:
+            catalog = await asyncio.to_thread(get_catalog_index)
+            if TTS_PREWARM_CATALOG_LANGUAGES and catalog.metadata and catalog.version != catalog_version:
+                utterances = await asyncio.to_thread(catalog_utterances, TTS_PREWARM_CATALOG_LANGUAGES)
+                log.info("prewarm.catalog", catalog_version=catalog.version, **await prewarm(utterances))
+                catalog_version = catalog.version
+        except Exception as e:
+            log.error("prewarm.catalog_failed", error=str(e))
+        await asyncio.sleep(TTS_PREWARM_INTERVAL_SECONDS)
+
+class SpeculativeSpeech:
+    """
+    Starts TTS for a turn's deal heading (and, with TTS_SPECULATIVE_PRODUCTS, its top products)
+    as soon as the tools return, so the clips render while the model is still writing the reply.
+    Clips are keyed by deal and product IDs, not text, so a reworded heading still gets its audio.
+    Only English turns that want audio speculate, since the spoken texts are English.
+    """
+
+    def __init__(self, language: str, voice_id: Optional[str], audio: bool = True):
+        self.language = language
+        self.voice_id = voice_id
+        self.enabled = TTS_SPECULATIVE_ENABLED and audio and language in SPECULATIVE_LANGUAGES
+        self._tasks: Dict[tuple, asyncio.Task] = {}  # ("deal", ids, price) / ("product", id) -> synthesis task
+
+    def _start(self, key: tuple, text: str):
+        if self.enabled and text and key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(synthesize_speech(text, self.language, self.voice_id))
+
+    def start(self, products: List[Product], deal: Optional[SpecialDeal]):
+        if deal is not None:
+            self._start(deal_key(deal), deal.heading)
+        for product in products[:TTS_SPECULATIVE_PRODUCTS]:
+            self._start(("product", product.id), product_one_liner(product))
+
+    def _ready(self, key: tuple) -> Optional[str]:
+        task = self._tasks.get(key)
+        if task is None or not task.done() or task.cancelled() or task.exception() is not None:
+            return None
+        return task.result()
+
+    def attach(self, response: ChatResponse) -> ChatResponse:
+        """
+        Copies `response` with the speculated audio that is already done on its deal and products.
+        Never waits: unfinished clips are dropped (with the TTS cache on, they still land in it).
+        """
+        update = {}
+        deal = response.special_deal
+        if deal is not None and (audio_url := self._ready(deal_key(deal))):
+            update["special_deal"] = deal.model_copy(update={"audio_url": audio_url})
+        products = [product.model_copy(update={"audio_url": audio_url})
+                    if (audio_url := self._ready(("product", product.id))) else product
+                    for product in response.products]
+        if any(product.audio_url for product in products):
+            update["products"] = products
+        self.cancel()
+        return response.model_copy(update=update) if update else response
+
+    def cancel(self):
+        # With the TTS cache on, synthesis is shielded: cancelling stops waiting, the clip is still cached.
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+def deal_key(deal: SpecialDeal) -> tuple:
+    return "deal", tuple(product.id for product in deal.products_involved), deal.deal_price
@@ -0,0 +1,82 @@
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Every system prompt is a static prefix followed by a small dynamic context block. The prefix
+# depends only on the language (and graph mode), is built once and is byte-identical on every
+# call, so provider-side prefix caching and context caches (context_cache.py) can reuse it.
+# Anything that changes from turn to turn goes in the context block, never in the prefix.
+
+_AGENT_PREFIX = """CRITICAL LANGUAGE INSTRUCTION: YOU MUST RESPOND IN {LANGUAGE}!
+
+You are an expert multilingual mobile sales assistant. The user is speaking in {language}.
+
+ABSOLUTE RULES:
+1. RESPOND ONLY IN {LANGUAGE} - NEVER IN ENGLISH OR ANY OTHER LANGUAGE
+2. If user says "사랑해" (Korean), respond in Korean with appropriate mobile sales response
+3. If user says Hindi text, respond in Hindi
+4. If user says any non-English text, respond in that same language
+5. NEVER say "I only speak English" or similar - you are fully multilingual
+
+BUSINESS RULES:
+- You sell mobile phones and accessories
+- Use `find_product` for new product searches
+- Use `get_deal` for discounts on current products
+{final_answer_rule}- The CURRENT CONTEXT at the end lists the products being discussed and summarizes the earlier conversation
+
+EXAMPLE RESPONSES:
+- Korean input: "사랑해" → Korean response about mobile offers
+- Hindi input: "आप हिंदी में बात कर सकते हैं" → Hindi response confirming multilingual capability
+- English input: "Hello" → English response
+"""
+
+_FINAL_ANSWER_RULE = (
+    "- When you are ready to reply, call `FinalAnswer` with the reply text and the product_ids/deal fields you mention\n"
+)
+
+# The formatter writes its reply as plain text, which the model streams token by token (function
+# call arguments arrive in one piece), and lists the products it mentions on a last line.
+PRODUCT_IDS_MARKER = "PRODUCT_IDS:"
+
+_FORMATTER_PREFIX = """WRITE THE FINAL RESPONSE TO THE USER AS PLAIN TEXT.
+
+CRITICAL: YOU MUST RESPOND IN {LANGUAGE}!
+
+RULES:
+1. Text must be in {language}
+2. Maintain conversational tone appropriate for {language}
+3. Never translate to English - keep everything in {language}
+4. After the reply, on its own last line, write {marker} followed by the comma-separated IDs of the products from the find_product tool output that you mention (nothing after the colon if none). Write {marker} exactly as shown, never translated.
+
+Examples:
+- Korean: Use Korean characters and grammar
+- Hindi: Use Devanagari script
+- Japanese: Use appropriate Japanese characters
+"""
+
+@lru_cache(maxsize=128)
+def agent_prefix(language: str, final_answer_tool: bool) -> str:
+    """Static part of the agent's system prompt for `language`."""
+    return _AGENT_PREFIX.format(LANGUAGE=language.upper(), language=language,
+                                final_answer_rule=_FINAL_ANSWER_RULE if final_answer_tool else "")
+
+@lru_cache(maxsize=128)
+def formatter_prefix(language: str) -> str:
+    """Static part of the final answer formatter's system prompt for `language`."""
+    return _FORMATTER_PREFIX.format(LANGUAGE=language.upper(), language=language, marker=PRODUCT_IDS_MARKER)
+
+def agent_context(product_context_ids: List[str], summary: str) -> str:
+    """The agent's per-call context block."""
+    return (f"\nCURRENT CONTEXT:\n- Current Product Context: {product_context_ids or 'None'}\n"
+            f"- Summary of the earlier conversation: {summary or 'None'}\n")
+
+def formatter_context(summary: str) -> str:
+    """The formatter's per-call context block."""
+    return f"\nCURRENT CONTEXT:\n- Summary of the earlier conversation: {summary or 'None'}\n"
+
+def split_formatted_answer(output: str) -> Tuple[str, Optional[List[str]]]:
+    """The formatter's reply text and product IDs; the IDs are None if the marker line is missing."""
+    text, marker, ids = output.rpartition(PRODUCT_IDS_MARKER)
+    if not marker:
+        return output.strip(), None
+    ids = (pid.strip(" `'\"[]") for pid in ids.replace("\n", ",").split(","))
+    return text.strip(), [pid for pid in ids if pid]
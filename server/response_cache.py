@@ -0,0 +1,111 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from config import (
+    RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS,
+)
+from schemas import ChatResponse
+
+class CachedTurn(BaseModel):
+    message: str
+    response: ChatResponse
+    created_at: float
+
+class _Bucket:
+    """Entries sharing a language, voice and catalog version, with their normalized embeddings."""
+
+    def __init__(self):
+        self.entries: List[CachedTurn] = []
+        self.vectors: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.stack(self.vectors)
+        return self._matrix
+
+    def add(self, entry: CachedTurn, vector: np.ndarray):
+        self.entries.append(entry)
+        self.vectors.append(vector)
+        self._matrix = None
+
+    def drop_oldest(self):
+        self.entries.pop(0)
+        self.vectors.pop(0)
+        self._matrix = None
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class ResponseCache:
+    """
+    Semantic cache of whole chat turns. A new opening message whose embedding is within
+    `threshold` cosine similarity of a cached one (same language, voice and catalog version)
+    gets the stored response back without running the agent graph. Entries stamped with an
+    older catalog version are dropped as soon as a newer version is seen.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, ttl_seconds: float):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._buckets: Dict[Tuple[str, str, str], _Bucket] = {}
+        self._catalog_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _bucket(self, language: str, voice_id: str, catalog_version: str, create: bool) -> Optional[_Bucket]:
+        if catalog_version != self._catalog_version:
+            self._buckets.clear()
+            self._catalog_version = catalog_version
+        key = (language, voice_id, catalog_version)
+        if create:
+            return self._buckets.setdefault(key, _Bucket())
+        return self._buckets.get(key)
+
+    def lookup(self, vector, language: str, voice_id: str, catalog_version: str) -> Optional[ChatResponse]:
+        query = _unit(vector)
+        with self._lock:
+            bucket = self._bucket(language, voice_id, catalog_version, create=False)
+            if bucket is None or not bucket.entries:
+                self.misses += 1
+                return None
+            scores = bucket.matrix @ query
+            best = int(np.argmax(scores))
+            entry = bucket.entries[best]
+            if scores[best] < self.threshold or time.time() - entry.created_at > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry.response
+
+    def store(self, vector, language: str, voice_id: str, catalog_version: str, message: str, response: ChatResponse):
+        with self._lock:
+            bucket = self._bucket(language, voice_id, catalog_version, create=True)
+            bucket.add(CachedTurn(message=message, response=response, created_at=time.time()), _unit(vector))
+            while len(bucket.entries) > self.max_entries:
+                bucket.drop_oldest()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = sum(len(b.entries) for b in self._buckets.values())
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "catalog_version": self._catalog_version}
+
+_response_cache: Optional[ResponseCache] = None
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Returns the shared response cache, or None when RESPONSE_CACHE_ENABLED is off."""
+    global _response_cache
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache(RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
+    return _response_cache
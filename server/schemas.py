@@ -1,5 +1,5 @@
-from typing import List, Optional, Dict
-from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Dict
+from pydantic import BaseModel, Field, field_validator
 
 class Product(BaseModel):
     id: str = Field(..., alias="ID")
@@ -15,25 +15,46 @@ class Product(BaseModel):
     battery: int = Field(..., alias="battery")
     description: str = Field(..., alias="Text")
     image_url: Optional[str] = None
+    audio_url: Optional[str] = None  # spoken one-liner, set on products in a chat response
 
 class SpecialDeal(BaseModel):
     heading: str
     deal_price: float
     products_involved: List[Product]
+    audio_url: Optional[str] = None  # spoken heading
+
+AUDIO_FORMATS = ("MP3", "WAV", "FLAC", "ALAW", "ULAW", "PCM", "OGG")
 
 class ChatRequest(BaseModel):
     user_message: str
-    history: List[Dict[str, str]] = Field(default_factory=list)
+    session_id: Optional[str] = None  # server-side conversation; omit to start a new one
+    history: List[Dict[str, str]] = Field(default_factory=list)  # only used to seed a new session
     language: str = Field(default="en-US")  # Language code
     voice_id: Optional[str] = None  # Optional voice ID override
+    # "url": audio_url on this server; "inline": also audio_base64 (compact format by default); "none": no audio
+    audio_mode: Literal["url", "inline", "none"] = "url"
+    audio_format: Optional[str] = None  # MP3, WAV, FLAC, ALAW, ULAW, PCM, OGG; default depends on audio_mode
+    audio_sample_rate: Optional[int] = None
+
+    @field_validator("audio_format")
+    @classmethod
+    def known_audio_format(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and value.upper() not in AUDIO_FORMATS:
+            raise ValueError(f"audio_format must be one of {', '.join(AUDIO_FORMATS)}")
+        return value.upper() if value else value
 
 class ChatResponse(BaseModel):
     text: str
+    session_id: Optional[str] = None
     audio_url: Optional[str] = None
+    audio_base64: Optional[str] = None  # with audio_mode "inline"
+    audio_mime_type: Optional[str] = None
     products: List[Product] = Field(default_factory=list)
     special_deal: Optional[SpecialDeal] = None
+    usage: Dict[str, int] = Field(default_factory=dict)  # llm_calls / prompt_tokens / completion_tokens for the turn
 
 class FinalAnswer(BaseModel):
+    """The reply shown and spoken to the user, with the products and deal it refers to."""
     text: str = Field(description="The conversational text to display to the user.")
     product_ids: List[str] = Field(default_factory=list)
     deal_heading: Optional[str] = None
@@ -47,4 +68,51 @@ class TTSRequest(BaseModel):
     format: Optional[str] = "MP3"    # MP3, WAV, FLAC, ALAW, ULAW, PCM, OGG
     sample_rate: Optional[int] = 44100
     style: Optional[str] = None      # e.g., "Conversational"
-    encode_as_base64: Optional[bool] = False  # set True if you want audio in response
\ No newline at end of file
+    encode_as_base64: Optional[bool] = False  # set True if you want audio in response
+
+class TTSMeta(BaseModel):
+    length_seconds: Optional[float] = None
+    consumed_chars: Optional[int] = None
+    remaining_chars: Optional[int] = None
+    warning: Optional[str] = None
+    cached: bool = False  # True when served from the local TTS cache (no Murf characters consumed)
+
+class TTSResponse(BaseModel):
+    audio_url: Optional[str] = None
+    audio_base64: Optional[str] = None
+    meta: TTSMeta = Field(default_factory=TTSMeta)
+
+class TTSBatchRequest(BaseModel):
+    items: List[TTSRequest]
+    # True: one clip of every item in order, at the batch's format and sample rate (which override
+    # the items'); False: one result per item.
+    concatenate: bool = False
+    format: Optional[str] = None        # defaults to the first item's
+    sample_rate: Optional[int] = None   # defaults to the first item's
+    encode_as_base64: Optional[bool] = False  # the concatenated clip inline as well
+
+class TTSBatchItem(TTSResponse):
+    index: int
+    elapsed_ms: float = 0.0
+    duplicate_of: Optional[int] = None  # same clip as that item; synthesized once, no characters consumed
+    error: Optional[str] = None
+    status_code: Optional[int] = None   # upstream status when `error` is set
+
+class TTSBatchResponse(BaseModel):
+    items: List[TTSBatchItem]
+    audio_url: Optional[str] = None     # the concatenated clip
+    audio_base64: Optional[str] = None
+    meta: TTSMeta = Field(default_factory=TTSMeta)  # totals over all items
+    elapsed_ms: float = 0.0
+
+class VoiceMessage(BaseModel):
+    """A client message on /ws/voice."""
+    type: Literal["start", "utterance", "barge_in"]
+    text: Optional[str] = None          # the transcribed utterance
+    session_id: Optional[str] = None
+    # Turn settings, as on ChatRequest; once sent they apply to every later turn.
+    language: Optional[str] = None
+    voice_id: Optional[str] = None
+    audio_mode: Optional[Literal["url", "inline", "none"]] = None
+    audio_format: Optional[str] = None
+    audio_sample_rate: Optional[int] = None
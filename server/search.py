@@ -0,0 +1,249 @@
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from config import (
+    FIND_PRODUCT_TOP_K, HYBRID_CANDIDATES, HYBRID_KEYWORD_WEIGHT, HYBRID_MIN_RELATIVE_SCORE,
+    CATALOG_INDEX_TTL_SECONDS, get_embeddings_model,
+)
+from vector_store import get_vector_store
+from tracing import get_logger, span
+
+log = get_logger("search")
+
+# Product-line words that imply a brand even when the brand itself isn't mentioned.
+BRAND_ALIASES = {"iphone": "Apple", "ipad": "Apple", "pixel": "Google", "galaxy": "Samsung"}
+
+# Fields the BM25 keyword index is built over.
+KEYWORD_FIELDS = ("Company Name", "Model Name", "Processor")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_AMOUNT = r"(?:rs\.?|inr|₹|\$)?\s*(\d[\d,]*(?:\.\d+)?)\s*(k|thousand|lakh|lac|l)?\b"
+_PRICE_MAX = re.compile(r"\b(?:under|below|less than|cheaper than|within|up ?to|upto|max(?:imum)?|budget(?: of)?)\s*" + _AMOUNT)
+_PRICE_MIN = re.compile(r"\b(?:above|over|more than|at least|min(?:imum)?|starting(?: from)?)\s*" + _AMOUNT)
+_PRICE_RANGE = re.compile(r"\bbetween\s*" + _AMOUNT + r"\s*(?:and|to|-)\s*" + _AMOUNT)
+_RAM = re.compile(r"\b(\d{1,2})\s*gb\s*(?:of\s*)?ram\b")
+_STORAGE = re.compile(r"\b(\d{2,4}|\d)\s*(gb|tb)\b(?!\s*(?:of\s*)?ram)")
+_BATTERY = re.compile(r"\b(\d{4,5})\s*mah\b")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens with a naive plural strip ("iphones" -> "iphone")."""
+    return [t[:-1] if len(t) > 3 and t.endswith("s") and not t.endswith("ss") else t
+            for t in _TOKEN.findall(text.lower())]
+
+class SearchConstraints(BaseModel):
+    """Structured constraints pulled out of a free-text product query."""
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_ram: Optional[int] = None
+    min_capacity: Optional[int] = None
+    min_battery: Optional[int] = None
+    brands: List[str] = Field(default_factory=list)
+
+    def to_filter(self) -> Optional[dict]:
+        """Pinecone-style metadata filter understood by every vector store backend."""
+        clauses = []
+        price = {}
+        if self.min_price is not None:
+            price["$gte"] = self.min_price
+        if self.max_price is not None:
+            price["$lte"] = self.max_price
+        if price:
+            clauses.append({"Max Price": price})
+        if self.min_ram is not None:
+            clauses.append({"ram": {"$gte": self.min_ram}})
+        if self.min_capacity is not None:
+            clauses.append({"Capacity": {"$gte": self.min_capacity}})
+        if self.min_battery is not None:
+            clauses.append({"battery": {"$gte": self.min_battery}})
+        if self.brands:
+            clauses.append({"Company Name": {"$in": self.brands}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def _amount(number: str, unit: Optional[str]) -> float:
+    value = float(number.replace(",", ""))
+    if unit in ("k", "thousand"):
+        value *= 1_000
+    elif unit in ("lakh", "lac", "l"):
+        value *= 100_000
+    return value
+
+def parse_constraints(query: str, brands: List[str]) -> SearchConstraints:
+    """Extracts price, RAM, storage, battery and brand constraints from `query`."""
+    text = query.lower()
+    constraints = SearchConstraints()
+
+    if match := _PRICE_RANGE.search(text):
+        low, high = _amount(match.group(1), match.group(2)), _amount(match.group(3), match.group(4))
+        constraints.min_price, constraints.max_price = min(low, high), max(low, high)
+    else:
+        # "under 12GB" is a storage constraint, not a price; the amount pattern stops before "gb".
+        if (match := _PRICE_MAX.search(text)) and not re.match(r"\s*(gb|tb|mah)", text[match.end():]):
+            constraints.max_price = _amount(match.group(1), match.group(2))
+        if (match := _PRICE_MIN.search(text)) and not re.match(r"\s*(gb|tb|mah)", text[match.end():]):
+            constraints.min_price = _amount(match.group(1), match.group(2))
+
+    if match := _RAM.search(text):
+        constraints.min_ram = int(match.group(1))
+    # Only "at least"-style storage limits are indexed; "under 64GB" is left to vector ranking.
+    if (match := _STORAGE.search(text)) and not re.search(r"(under|below|less than|up ?to)\s*$", text[:match.start()]):
+        constraints.min_capacity = int(match.group(1)) * (1024 if match.group(2) == "tb" else 1)
+    if match := _BATTERY.search(text):
+        constraints.min_battery = int(match.group(1))
+
+    tokens = set(tokenize(text))
+    found = [brand for brand in brands if set(tokenize(brand)) <= tokens]
+    found += [brand for alias, brand in BRAND_ALIASES.items()
+              if brand in brands and brand not in found and any(t.startswith(alias) for t in tokens)]
+    constraints.brands = found
+    return constraints
+
+class CatalogIndex:
+    """Inverted BM25 index over model names, brands and processors, plus the catalog metadata it was built from."""
+
+    def __init__(self, metadata_by_id: Dict[str, dict], k1: float = 1.2, b: float = 0.75):
+        self.metadata = metadata_by_id
+        # Changes whenever any product is added, removed or edited (ingestion stores a content hash per product).
+        self.version = hashlib.sha256(json.dumps(
+            sorted((k, m.get("content_hash", "")) for k, m in metadata_by_id.items())
+        ).encode("utf-8")).hexdigest()[:16]
+        self.brands = sorted({m["Company Name"] for m in metadata_by_id.values() if m.get("Company Name")})
+        self.postings: Dict[str, List[Tuple[str, float]]] = {}
+        lengths = {}
+        term_freqs = {}
+        for vector_id, metadata in metadata_by_id.items():
+            tf = Counter(tokenize(" ".join(str(metadata.get(f, "")) for f in KEYWORD_FIELDS)))
+            term_freqs[vector_id] = tf
+            lengths[vector_id] = sum(tf.values())
+        n = len(metadata_by_id)
+        avg_length = (sum(lengths.values()) / n) if n else 1.0
+        # Precompute the full BM25 weight of every (term, product) pair so a query is a few dict lookups.
+        for vector_id, tf in term_freqs.items():
+            norm = k1 * (1 - b + b * lengths[vector_id] / (avg_length or 1))
+            for term, freq in tf.items():
+                self.postings.setdefault(term, []).append((vector_id, freq * (k1 + 1) / (freq + norm)))
+        self.idf = {term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for term, p in self.postings.items()}
+
+    def bm25(self, query: str) -> Dict[str, float]:
+        """BM25 score for every product that shares at least one term with `query`."""
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for vector_id, weight in self.postings[term]:
+                scores[vector_id] = scores.get(vector_id, 0.0) + idf * weight
+        return scores
+
+_catalog_index: Optional[CatalogIndex] = None
+_catalog_index_built_at = 0.0
+_catalog_lock = threading.Lock()
+_refreshing = threading.Event()
+
+def _build_catalog_index() -> CatalogIndex:
+    store = get_vector_store()
+    with span("vector_store", "catalog_index_build"):
+        return CatalogIndex(store.fetch_metadata(list(store.list_ids())))
+
+def refresh_catalog_index() -> CatalogIndex:
+    """Rebuilds the keyword index from the vector store and swaps it in (call after catalog changes)."""
+    global _catalog_index, _catalog_index_built_at
+    index = _build_catalog_index()
+    with _catalog_lock:
+        _catalog_index, _catalog_index_built_at = index, time.monotonic()
+    return index
+
+def _refresh_in_background():
+    try:
+        index = refresh_catalog_index()
+        log.info("search.catalog_index_refreshed", products=len(index.metadata), catalog_version=index.version)
+    except Exception as e:
+        log.error("search.catalog_index_refresh_failed", error=str(e))
+    finally:
+        _refreshing.clear()
+
+def get_catalog_index() -> CatalogIndex:
+    """
+    Returns the keyword index. Only the first call builds it inline; once it is older than
+    CATALOG_INDEX_TTL_SECONDS a background thread rebuilds it while searches keep using the old one.
+    """
+    global _catalog_index, _catalog_index_built_at
+    with _catalog_lock:
+        if _catalog_index is None:
+            # Hold the lock so concurrent first searches wait for one build instead of each listing the catalog.
+            _catalog_index, _catalog_index_built_at = _build_catalog_index(), time.monotonic()
+        elif time.monotonic() - _catalog_index_built_at > CATALOG_INDEX_TTL_SECONDS and not _refreshing.is_set():
+            _refreshing.set()
+            threading.Thread(target=_refresh_in_background, name="catalog-index-refresh", daemon=True).start()
+        return _catalog_index
+
+def _normalized(scores: Dict[str, float]) -> Dict[str, float]:
+    if not scores:
+        return {}
+    high = max(scores.values())
+    if high <= 0:
+        return {k: 0.0 for k in scores}
+    return {k: max(v, 0.0) / high for k, v in scores.items()}
+
+def search_products(query: str, top_k: int = FIND_PRODUCT_TOP_K) -> Tuple[List[dict], SearchConstraints]:
+    """
+    Hybrid product search. Structured constraints in the query become a metadata prefilter,
+    vector candidates are ranked inside that subset, and a BM25 score over model names and
+    processors is fused in. Hits far below the best fused score are dropped.
+    """
+    catalog = get_catalog_index()
+    constraints = parse_constraints(query, catalog.brands)
+    metadata_filter = constraints.to_filter()
+
+    store = get_vector_store()
+    with span("embedding", "query"):
+        vector = get_embeddings_model().embed_query(query)
+    with span("vector_store", "query"):
+        matches = store.query(vector, top_k=HYBRID_CANDIDATES, filter=metadata_filter)
+    by_id = {match["id"]: match for match in matches}
+    vector_scores = _normalized({match["id"]: match["score"] for match in matches})
+
+    keyword_scores = catalog.bm25(query)
+    keyword_only = sorted((k for k in keyword_scores if k not in by_id), key=keyword_scores.get, reverse=True)
+    keyword_only = keyword_only[:HYBRID_CANDIDATES]
+    if keyword_only:
+        # Strong keyword hits the vector ranking missed still have to satisfy the prefilter.
+        with span("vector_store", "fetch_metadata"):
+            allowed = store.fetch_metadata(keyword_only)
+        for vector_id, metadata in allowed.items():
+            if _matches_constraints(metadata, constraints):
+                by_id[vector_id] = {"id": vector_id, "score": 0.0, "metadata": metadata}
+    keyword_scores = _normalized({k: v for k, v in keyword_scores.items() if k in by_id})
+
+    fused = {
+        vector_id: (1 - HYBRID_KEYWORD_WEIGHT) * vector_scores.get(vector_id, 0.0)
+        + HYBRID_KEYWORD_WEIGHT * keyword_scores.get(vector_id, 0.0)
+        for vector_id in by_id
+    }
+    ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    if ranked:
+        cutoff = fused[ranked[0]] * HYBRID_MIN_RELATIVE_SCORE
+        ranked = [vector_id for vector_id in ranked if fused[vector_id] >= cutoff]
+    return [{**by_id[vector_id], "score": fused[vector_id]} for vector_id in ranked], constraints
+
+def _matches_constraints(metadata: dict, constraints: SearchConstraints) -> bool:
+    checks = [
+        ("Max Price", constraints.min_price, lambda v, c: v >= c),
+        ("Max Price", constraints.max_price, lambda v, c: v <= c),
+        ("ram", constraints.min_ram, lambda v, c: v >= c),
+        ("Capacity", constraints.min_capacity, lambda v, c: v >= c),
+        ("battery", constraints.min_battery, lambda v, c: v >= c),
+    ]
+    for field, bound, check in checks:
+        if bound is not None and (metadata.get(field) is None or not check(metadata[field], bound)):
+            return False
+    return not constraints.brands or metadata.get("Company Name") in constraints.brands
@@ -0,0 +1,173 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from admission import set_deadline, upstream
+from config import (
+    SESSION_TTL_SECONDS, SESSION_STORE_PATH, SESSION_TOKEN_BUDGET, SESSION_KEEP_MESSAGES,
+    SESSION_MAX_PRODUCTS, get_llm,
+)
+from schemas import Product
+from tracing import get_logger, span
+
+log = get_logger("sessions")
+
+class Session(BaseModel):
+    """Server-side state of one conversation."""
+    session_id: str
+    messages: List[Dict[str, str]] = Field(default_factory=list)  # recent turns, {"role", "content"}
+    summary: str = ""  # running summary of turns compacted out of `messages`
+    retrieved_products: Dict[str, Product] = Field(default_factory=dict)
+    product_context_ids: List[str] = Field(default_factory=list)
+    language: Optional[str] = None
+    updated_at: float = Field(default_factory=time.time)
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Cheap prompt-size estimate (~4 characters per token) used for the compaction budget."""
+    return sum(len(m["content"]) for m in messages) // 4
+
+class SQLiteSessionBackend:
+    """Persistent session backend storing each session as a JSON document."""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def load(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return Session.model_validate_json(row[0]) if row else None
+
+    def save(self, session: Session):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session.session_id, session.model_dump_json(by_alias=True), session.updated_at),
+            )
+            self._db.commit()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+class SessionStore:
+    """
+    In-memory session store with idle TTL expiry. When a persistent `backend` is given, writes go
+    through to it and sessions evicted from memory (or lost to a restart) are reloaded on demand.
+    """
+
+    def __init__(self, ttl_seconds: float, backend=None):
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._compacting = set()
+
+    def _expired(self, session: Session) -> bool:
+        return time.time() - session.updated_at > self.ttl_seconds
+
+    def _purge(self):
+        # Sessions are kept in least-recently-updated order, so expired ones sit at the front.
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if not self._expired(session):
+                break
+            del self._sessions[session_id]
+            self._locks.pop(session_id, None)
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """Serializes turns and compaction for one session."""
+        return self._locks.setdefault(session_id, asyncio.Lock())
+
+    def get_or_create(self, session_id: Optional[str], seed_history: Optional[List[Dict[str, str]]] = None) -> Session:
+        self._purge()
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None and session_id and self.backend is not None:
+            session = self.backend.load(session_id)
+            if session is not None and self._expired(session):
+                self.backend.delete(session_id)
+                session = None
+        if session is None:
+            # Clients without a session keep working: their transcript seeds a new one.
+            session = Session(session_id=session_id or uuid.uuid4().hex, messages=list(seed_history or []))
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        return session
+
+    def save(self, session: Session):
+        session.updated_at = time.time()
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        if self.backend is not None:
+            self.backend.save(session)
+
+    def record_turn(self, session: Session, user_message: str, answer_text: str, final_state: dict):
+        """Appends a finished turn and carries product context over to the next one."""
+        session.messages.append({"role": "user", "content": user_message})
+        session.messages.append({"role": "assistant", "content": answer_text})
+        session.language = final_state.get("detected_language", session.language)
+        session.product_context_ids = final_state.get("product_context_ids", session.product_context_ids)
+        products = {**session.retrieved_products, **final_state.get("retrieved_products", {})}
+        # Keep the most recently retrieved products only.
+        session.retrieved_products = dict(list(products.items())[-SESSION_MAX_PRODUCTS:])
+        self.save(session)
+
+    def needs_compaction(self, session: Session) -> bool:
+        return (len(session.messages) > SESSION_KEEP_MESSAGES
+                and estimate_tokens(session.messages) > SESSION_TOKEN_BUDGET)
+
+    async def compact(self, session_id: str):
+        """
+        Folds all but the last SESSION_KEEP_MESSAGES messages into the running summary. The
+        summarization call runs without holding the session lock, so the next turn isn't blocked;
+        the result is applied only if the summarized prefix is still at the head of the session.
+        """
+        session = self._sessions.get(session_id)
+        if session is None or session_id in self._compacting or not self.needs_compaction(session):
+            return
+        self._compacting.add(session_id)
+        # Runs as a background task after the turn; the turn's deadline doesn't apply to it.
+        set_deadline(None)
+        try:
+            older = session.messages[:-SESSION_KEEP_MESSAGES]
+            previous_summary = session.summary
+            transcript = "\n".join(f"{m['role']}: {m['content']}" for m in older)
+            prompt = (
+                "You maintain a running summary of a mobile phone sales conversation. Merge the previous "
+                "summary and the new transcript into at most 120 words. Keep the customer's needs, budget, "
+                "products discussed (with IDs), deals offered and the language they speak.\n\n"
+                f"Previous summary:\n{previous_summary or '(none)'}\n\nNew transcript:\n{transcript}"
+            )
+            try:
+                async with upstream("gemini"):
+                    with span("llm", "session_summary"):
+                        response = await get_llm().ainvoke(prompt)
+            except Exception as e:
+                log.warning("session.compaction_failed", session_id=session_id, error=str(e))
+                return
+            async with self.lock(session_id):
+                if session.summary != previous_summary or session.messages[:len(older)] != older:
+                    return
+                session.summary = str(response.content).strip()
+                session.messages = session.messages[len(older):]
+                self.save(session)
+            log.info("session.compacted", session_id=session_id, messages=len(older))
+        finally:
+            self._compacting.discard(session_id)
+
+session_store = SessionStore(
+    ttl_seconds=SESSION_TTL_SECONDS,
+    backend=SQLiteSessionBackend(SESSION_STORE_PATH) if SESSION_STORE_PATH else None,
+)
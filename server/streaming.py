@@ -0,0 +1,204 @@
+import asyncio
+import json
+import re
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessageChunk
+
+from prompts import PRODUCT_IDS_MARKER
+
+# A sentence ends at terminal punctuation followed by whitespace (Latin scripts, Hindi danda),
+# right after full-width CJK punctuation, or at a line break.
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?।])\s+|(?<=[。！？])\s*|\n+')
+
+class SentenceBuffer:
+    """Accumulates streamed text and hands out complete sentences as soon as they end."""
+
+    def __init__(self, min_chars: int = 20):
+        # Very short fragments ("Sure!") are merged into the next sentence to save TTS calls.
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        self._buffer += delta
+        sentences = []
+        start = 0
+        # Latin boundaries need trailing whitespace, so "6." stays buffered until "8 inches" arrives.
+        for match in _SENTENCE_BOUNDARY.finditer(self._buffer):
+            candidate = self._buffer[start:match.start()].strip()
+            if len(candidate) < self.min_chars:
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return [remainder] if remainder else []
+
+def split_sentences(text: str, min_chars: int = 20) -> List[str]:
+    """Splits a complete answer into TTS-sized sentences."""
+    buffer = SentenceBuffer(min_chars=min_chars)
+    return buffer.feed(text) + buffer.flush()
+
+def ndjson_line(event: dict) -> str:
+    """Serializes one stream event as a newline-delimited JSON record."""
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+def partial_json_string(buffer: str, key: str) -> Optional[str]:
+    """
+    Decoded prefix of the string value of `key` in a JSON object that is still being streamed,
+    e.g. '{"text": "Hello, wor' -> 'Hello, wor'. Returns None until the value has started.
+    """
+    match = re.search(r'"%s"\s*:\s*"' % re.escape(key), buffer)
+    if match is None:
+        return None
+    start = end = match.end()
+    while end < len(buffer):
+        char = buffer[end]
+        if char == '"':
+            break
+        if char != "\\":
+            end += 1
+            continue
+        # Stop before an escape sequence that hasn't fully arrived (including half a surrogate pair).
+        if buffer[end + 1:end + 2] == "u":
+            if end + 6 > len(buffer):
+                break
+            width = 12 if buffer[end + 2:end + 4].lower() in ("d8", "d9", "da", "db") else 6
+            if end + width > len(buffer):
+                break
+            end += width
+        elif end + 2 > len(buffer):
+            break
+        else:
+            end += 2
+    return json.loads('"' + buffer[start:end] + '"')
+
+def visible_answer_text(output: str) -> str:
+    """
+    The part of a formatter reply streamed so far that is answer text: everything before the
+    PRODUCT_IDS line, minus a tail that could still turn out to be the start of that line.
+    """
+    end = output.find(PRODUCT_IDS_MARKER)
+    if end >= 0:
+        return output[:end].rstrip()
+    for length in range(min(len(PRODUCT_IDS_MARKER) - 1, len(output)), 0, -1):
+        if PRODUCT_IDS_MARKER.startswith(output[-length:]):
+            return output[:-length].rstrip()
+    return output.rstrip()
+
+class AnswerTextStream:
+    """
+    Turns streaming model runs into `delta` events carrying the new answer text: the text
+    argument of FinalAnswer tool-call chunks, and for plain-text runs (the formatter) the content
+    before its PRODUCT_IDS line. Gemini returns function call arguments in a single chunk, so a
+    FinalAnswer arrives as one delta; plain text streams token by token. If a later run starts
+    writing a different answer (e.g. the formatter after a rejected FinalAnswer), a `reset` event
+    tells the client to drop what it has so far.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._run_id = None
+        self._messages: Dict[str, AIMessageChunk] = {}
+
+    def _events_for(self, text: str) -> List[dict]:
+        events = []
+        if not text.startswith(self.text):
+            events.append({"type": "reset"})
+            self.text = ""
+        if len(text) > len(self.text):
+            events.append({"type": "delta", "text": text[len(self.text):]})
+            self.text = text
+        return events
+
+    def _answer_text(self, message: AIMessageChunk, plain_text: bool) -> Optional[str]:
+        for tool_call in message.tool_call_chunks:
+            if tool_call.get("name") == "FinalAnswer":
+                return partial_json_string(tool_call.get("args") or "", "text")
+        if plain_text and not message.tool_call_chunks:
+            content = message.content
+            if not isinstance(content, str):
+                content = "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+            return visible_answer_text(content)
+        return None
+
+    def feed(self, run_id: str, chunk: AIMessageChunk, plain_text: bool = False) -> List[dict]:
+        """Events for one streamed chunk; `plain_text` marks runs whose content is the answer."""
+        message = self._messages[run_id] = self._messages[run_id] + chunk if run_id in self._messages else chunk
+        text = self._answer_text(message, plain_text)
+        if not text:
+            return []
+        events = []
+        if run_id != self._run_id:
+            self._run_id = run_id
+            if self.text:
+                events.append({"type": "reset"})
+                self.text = ""
+        return events + self._events_for(text)
+
+    def finish(self, text: str) -> List[dict]:
+        """Events that bring the client's text in line with the final answer."""
+        return self._events_for(text)
+
+class SentenceSpeech:
+    """
+    Starts TTS for each sentence of streamed answer text as soon as the sentence is complete, at
+    most `max_concurrency` in flight, and hands back `audio` events in sentence order.
+    `synthesize` returns the audio fields of a sentence's event (at least `audio_url`).
+    """
+
+    def __init__(self, synthesize: Callable[[str], Awaitable[dict]], max_concurrency: int, min_chars: int = 20):
+        self._synthesize = synthesize
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._min_chars = min_chars
+        self._buffer = SentenceBuffer(min_chars=min_chars)
+        self._sentences: List[str] = []
+        self._tasks: List[asyncio.Task] = []
+        self._emitted = 0
+
+    async def _run(self, sentence: str) -> dict:
+        async with self._semaphore:
+            return await self._synthesize(sentence)
+
+    def _start(self, sentences: List[str]):
+        for sentence in sentences:
+            self._sentences.append(sentence)
+            self._tasks.append(asyncio.create_task(self._run(sentence)))
+
+    def _event(self, index: int) -> dict:
+        return {"type": "audio", "index": index, "text": self._sentences[index], **self._tasks[index].result()}
+
+    def feed(self, delta: str):
+        self._start(self._buffer.feed(delta))
+
+    def flush(self):
+        self._start(self._buffer.flush())
+
+    def ready(self) -> List[dict]:
+        """Audio events for the leading sentences whose speech is done, without waiting."""
+        events = []
+        while self._emitted < len(self._tasks) and self._tasks[self._emitted].done():
+            events.append(self._event(self._emitted))
+            self._emitted += 1
+        return events
+
+    async def remaining(self) -> AsyncIterator[dict]:
+        """Waits for the rest of the audio in sentence order."""
+        while self._emitted < len(self._tasks):
+            await asyncio.wait({self._tasks[self._emitted]})
+            yield self._event(self._emitted)
+            self._emitted += 1
+
+    def reset(self):
+        """Drops everything queued so far; sentence indexes start again at 0."""
+        self.cancel()
+        self._buffer = SentenceBuffer(min_chars=self._min_chars)
+        self._sentences, self._tasks, self._emitted = [], [], 0
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
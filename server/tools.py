@@ -1,16 +1,25 @@
-from typing import List
+from typing import Collection, List, Union
 from langchain_core.tools import tool
-from config import embeddings_model, llm
-from vector_store import index
+from config import TOOL_RESULT_DESCRIPTION_CHARS
+from schemas import Product, SpecialDeal
+from search import search_products
+from deals import get_deal_engine, write_deal_copy
+from tracing import get_logger
+
+log = get_logger("tools")
 
 @tool
 def find_product(query: str) -> List[dict]:
-    """Gets product from Pinecone."""
-    print(f"--- TOOL: find_product(query='{query}') ---")
-    query_embedding = embeddings_model.embed_query(query)
-    results = index.query(vector=query_embedding, top_k=7, include_metadata=True, namespace="mobiles")
+    """
+    Searches the phone catalog. Put every requirement in one query, e.g.
+    "Samsung under 60000 with 12GB RAM" or "256GB phone with 5000mAh battery";
+    brand, price, RAM, storage and battery limits are applied as exact filters.
+    """
+    matches, constraints = search_products(query)
+    log.info("tool.find_product", query=query, constraints=constraints.model_dump(exclude_defaults=True),
+             results=len(matches))
     products = []
-    for match in results['matches']:
+    for match in matches:
         metadata = match.get('metadata', {})
         product_data = {
             "ID": match.get('id'),
@@ -32,18 +41,52 @@ def find_product(query: str) -> List[dict]:
     return products
 
 @tool
-def get_deal(conversation_context: str, product_ids: List[str]) -> str:
+def get_deal(conversation_context: str, product_ids: List[str]) -> Union[SpecialDeal, str]:
     """
-    Analyzes the conversation and a list of relevant products to generate a special deal,
-    cross-sell, or upsell offer. Use this when the user shows buying intent, asks for discounts,
-    or compares products.
+    Computes the special deal (discount or upgrade offer) for the given product IDs, most relevant
+    first. Use this when the user shows buying intent, asks for discounts, or compares products.
+    The returned heading and deal_price are final; quote them as-is.
+    """
+    deal = get_deal_engine().best_deal(product_ids)
+    log.info("tool.get_deal", product_ids=product_ids, deal_price=deal.deal_price if deal else None)
+    if deal is None:
+        return "No deal is available for these products."
+    return write_deal_copy(deal, conversation_context)
+
+# --- Compact Product Tables ---
+# What the model reads about products: one header row of short keys, then one row per product.
+# Image URLs stay out and descriptions are cut short; the full Product objects stay server-side.
+PRODUCT_COLUMNS = ["id", "brand", "model", "price", "storage_gb", "ram_gb", "battery_mah",
+                   "back_cam", "front_cam", "cpu", "screen"]
+
+def _cell(value) -> str:
+    return " ".join(str(value).split()).replace("|", "/")
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "…"
+
+def product_row(product: Product) -> str:
+    cells = [product.id, product.company_name, product.model_name, product.max_price, product.capacity,
+             product.ram, product.battery, product.back_camera, product.front_camera, product.processor,
+             product.screen_size]
+    if TOOL_RESULT_DESCRIPTION_CHARS > 0:
+        cells.append(_shorten(product.description, TOOL_RESULT_DESCRIPTION_CHARS))
+    return "|".join(map(_cell, cells))
+
+def product_table(products: List[Product], known_ids: Collection[str] = ()) -> str:
     """
-    print(f"--- TOOL: get_deal(context='{conversation_context}', product_ids={product_ids}) ---")
-    deal_prompt = f"""
-    Based on the conversation context: '{conversation_context}', create a compelling, short, one-sentence deal heading
-    and a deal price for one of the products from this list: {product_ids}.
-    Format the output as a simple JSON string with keys 'heading' and 'deal_price'.
-    Example: {{"heading": "Limited Time: 15% off the Pixel 8 Pro!", "deal_price": 59415}}
+    `products` as a compact table. Products in `known_ids` are already described in the prompt
+    and are only named by ID.
     """
-    response = llm.invoke(deal_prompt)
-    return response.content
\ No newline at end of file
+    rows = [product_row(p) for p in products if p.id not in known_ids]
+    known = [p.id for p in products if p.id in known_ids]
+    lines = []
+    if rows:
+        columns = PRODUCT_COLUMNS + (["about"] if TOOL_RESULT_DESCRIPTION_CHARS > 0 else [])
+        lines = ["|".join(columns)] + rows
+    if known:
+        lines.append(f"Also matching (details above): {', '.join(known)}")
+    return "\n".join(lines) or "No matching products."
@@ -0,0 +1,176 @@
+import bisect
+import functools
+import inspect
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from config import LOG_LEVEL, LOG_FORMAT
+
+# Request-scoped trace ID. Context variables follow the request into asyncio tasks and into
+# threads started via asyncio.to_thread / LangChain's executor, so every span and log line of
+# one chat turn carries the same ID.
+trace_id_var: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+def new_trace_id(incoming: Optional[str] = None) -> str:
+    trace_id = incoming or uuid.uuid4().hex
+    trace_id_var.set(trace_id)
+    return trace_id
+
+# --- Structured Logging ---
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, event message, trace ID and any extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        trace_id = trace_id_var.get()
+        if trace_id:
+            entry["trace_id"] = trace_id
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{k}={v}" for k, v in getattr(record, "fields", {}).items())
+        trace_id = trace_id_var.get()
+        prefix = f"[{trace_id[:8]}] " if trace_id else ""
+        return f"{prefix}{record.levelname.lower()} {record.getMessage()} {fields}".rstrip()
+
+def _configure_logging() -> logging.Logger:
+    root = logging.getLogger("salesbot")
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JSONFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL.upper())
+    root.propagate = False
+    return root
+
+_root_logger = _configure_logging()
+
+class EventLogger:
+    """Thin wrapper so call sites read `log.info("tool.find_product", query=query)`."""
+
+    def __init__(self, name: str):
+        self._logger = _root_logger.getChild(name)
+
+    def _log(self, level: int, event: str, fields: dict, exc_info=False):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, exc_info=False, **fields):
+        self._log(logging.ERROR, event, fields, exc_info=exc_info)
+
+def get_logger(name: str) -> EventLogger:
+    return EventLogger(name)
+
+log = get_logger("tracing")
+
+# --- Metrics ---
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Minimal Prometheus histogram with labels, rendered in the text exposition format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labelvalues, series in sorted(snapshot.items()):
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines)
+
+REQUEST_SECONDS = Histogram(
+    "salesbot_http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status"))
+SPAN_SECONDS = Histogram(
+    "salesbot_span_duration_seconds", "Latency of graph nodes, tools, LLM, embedding, vector store and TTS calls.",
+    ("kind", "name", "outcome"))
+
+def render_metrics() -> str:
+    return "\n".join(h.render() for h in (REQUEST_SECONDS, SPAN_SECONDS)) + "\n"
+
+# --- Spans ---
+
+@contextmanager
+def span(kind: str, name: str, **fields):
+    """
+    Times a block, records it in SPAN_SECONDS and logs it at debug level with the trace ID.
+    Costs two perf_counter calls and one histogram update when debug logging is off.
+    """
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        SPAN_SECONDS.observe(elapsed, kind, name, outcome)
+        log.debug("span", kind=kind, name=name, outcome=outcome, duration_ms=round(elapsed * 1000, 2), **fields)
+
+def traced(kind: str, name: Optional[str] = None):
+    """Decorator form of `span` for sync and async functions."""
+    def decorate(func):
+        span_name = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(kind, span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(kind, span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,205 @@
+import asyncio
+import base64
+import hashlib
+import time
+from typing import Dict, List, Optional, Tuple
+
+from admission import audio_overloaded
+from audio_concat import concatenate_audio
+from config import MURF_API_KEY, MURF_VOICE_ID, PUBLIC_BASE_URL, TTS_BATCH_CONCURRENCY
+from murf_client import MurfError, get_murf_client
+from schemas import TTSBatchItem, TTSMeta, TTSRequest, TTSResponse
+from tts_cache import CachedAudio, TTSCache, get_audio_store, get_tts_cache, tts_cache_key
+from tracing import get_logger, span
+
+log = get_logger("tts")
+
+# Complete language to voice mapping
+LANGUAGE_VOICE_MAP = {
+    'en-US': 'en-US-natalie',      # English US
+    'en-UK': 'en-UK-theo',         # English UK
+    'es-ES': 'es-ES-elvira',       # Spanish
+    'de-DE': 'de-DE-matthias',     # German
+    'pt-BR': 'pt-BR-heitor',       # Portuguese
+    'ja-JP': 'ja-JP-kenji',        # Japanese
+    'ko-KR': 'ko-KR-gyeong',       # Korean
+    'zh-CN': 'zh-CN-tao',          # Chinese
+    'hi-IN': 'hi-IN-kabir',        # Hindi
+    'ta-IN': 'ta-IN-iniya',        # Tamil
+    'bn-IN': 'bn-IN-anwesha',      # Bengali
+    'pl-PL': 'pl-PL-jacek',        # Polish
+    # Add fallbacks for languages you might not have voices for yet
+    'fr-FR': 'en-US-natalie',      # French fallback to English
+    'it-IT': 'en-US-natalie',      # Italian fallback to English
+    'ar-SA': 'en-US-natalie',      # Arabic fallback to English
+}
+
+# Concurrent misses for the same clip share one Murf call.
+_inflight: Dict[str, asyncio.Future] = {}
+
+def resolve_voice(language: Optional[str], voice_id_override: Optional[str] = None) -> str:
+    """Priority: 1. Explicit voice_id_override, 2. Language mapping, 3. Default"""
+    return voice_id_override or LANGUAGE_VOICE_MAP.get(language, MURF_VOICE_ID or 'en-US-natalie')
+
+def local_audio_url(key: str) -> str:
+    return f"{PUBLIC_BASE_URL}/audio/{key}"
+
+def _cached_response(key: str, entry: CachedAudio, include_base64: bool, cached: bool,
+                     data: Optional[dict] = None) -> TTSResponse:
+    data = data or {}
+    return TTSResponse(
+        audio_url=local_audio_url(key),
+        audio_base64=base64.b64encode(entry.audio).decode() if include_base64 else None,
+        meta=TTSMeta(
+            length_seconds=entry.length_seconds,
+            consumed_chars=0 if cached else entry.consumed_chars,
+            remaining_chars=data.get("remainingCharacterCount"),
+            warning=data.get("warning"),
+            cached=cached,
+        ),
+    )
+
+async def _generate_and_store(store: TTSCache, key: str, payload: dict) -> tuple:
+    data = await get_murf_client().generate({**payload, "encodeAsBase64": True})
+    encoded = data.get("encodedAudio")
+    if not encoded:
+        raise MurfError(502, "Murf did not return audio")
+    entry = await asyncio.to_thread(
+        store.put, key, base64.b64decode(encoded), payload["format"],
+        data.get("consumedCharacterCount") or 0, data.get("audioLengthInSeconds"),
+    )
+    return entry, data
+
+async def synthesize(text: str, voice_id: str, format: str = "MP3", sample_rate: Optional[int] = 44100,
+                     style: Optional[str] = None, include_base64: bool = False) -> TTSResponse:
+    """
+    Synthesizes `text`, serving repeats from the TTS cache. The audio comes back from Murf inline
+    and is kept locally, so the returned `audio_url` points at this server's /audio/{hash} route
+    rather than Murf's expiring links. Raises MurfError on upstream failure.
+    """
+    payload = {
+        "text": text,
+        "voiceId": voice_id,
+        "format": (format or "MP3").upper(),
+        "sampleRate": sample_rate,
+        "style": style,
+    }
+    payload = {k: v for k, v in payload.items() if v is not None}
+
+    key = tts_cache_key(text, voice_id, payload["format"], sample_rate, style)
+    cache = get_tts_cache()
+    if cache is None:
+        # Nothing is reused, but the clip is still served from /audio/{hash} for stable replay.
+        entry, data = await _generate_and_store(get_audio_store(), key, payload)
+        return _cached_response(key, entry, include_base64, cached=False, data=data)
+
+    entry = await cache.alookup(key)
+    if entry is not None:
+        return _cached_response(key, entry, include_base64, cached=True)
+
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        entry, _ = await asyncio.shield(inflight)
+        return _cached_response(key, entry, include_base64, cached=True)
+
+    def finished(future: asyncio.Future):
+        _inflight.pop(key, None)
+        if not future.cancelled():
+            future.exception()  # Mark as retrieved even if every waiter went away.
+
+    # Shielded so a disconnecting waiter doesn't abort a clip that will land in the cache anyway.
+    inflight = asyncio.ensure_future(_generate_and_store(cache, key, payload))
+    _inflight[key] = inflight
+    inflight.add_done_callback(finished)
+    entry, data = await asyncio.shield(inflight)
+    return _cached_response(key, entry, include_base64, cached=False, data=data)
+
+async def synthesize_audio(text: str, language: str = 'en-US', voice_id_override: str = None,
+                           format: str = "MP3", sample_rate: Optional[int] = 44100,
+                           include_base64: bool = False) -> Optional[TTSResponse]:
+    """
+    Speech for a reply in the language's voice (or the override). Returns None (no audio) on
+    failure, and under overload so the text still goes out.
+    """
+    if not MURF_API_KEY or not text.strip():
+        return None
+    if audio_overloaded():
+        log.info("tts.shed", language=language, chars=len(text))
+        return None
+
+    voice_id = resolve_voice(language, voice_id_override)
+
+    try:
+        with span("tts", "synthesize", language=language, voice_id=voice_id, chars=len(text)):
+            return await synthesize(text, voice_id, format=format, sample_rate=sample_rate,
+                                    include_base64=include_base64)
+    except MurfError as e:
+        log.error("tts.failed", language=language, voice_id=voice_id, status=e.status_code, error=e.detail)
+        return None
+
+async def synthesize_speech(text: str, language: str = 'en-US', voice_id_override: str = None) -> Optional[str]:
+    """Generate speech with language-specific voice, allowing voice ID override. Returns the audio URL or None."""
+    result = await synthesize_audio(text, language, voice_id_override)
+    return result.audio_url if result else None
+
+# --- Batches ---
+
+def clip_key(item: TTSRequest, voice_id: str) -> str:
+    return tts_cache_key(item.text, voice_id, item.format or "MP3", item.sample_rate, item.style)
+
+async def synthesize_batch(items: List[TTSRequest], voice_ids: List[str],
+                           concurrency: int = TTS_BATCH_CONCURRENCY) -> List[TTSBatchItem]:
+    """
+    Synthesizes every item in its voice, at most `concurrency` at a time. Repeats of a clip are
+    synthesized once and point at the first item (`duplicate_of`). Failures are reported on their
+    items instead of failing the batch.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index: int, item: TTSRequest, voice_id: str) -> TTSBatchItem:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await synthesize(item.text, voice_id, format=item.format, sample_rate=item.sample_rate,
+                                          style=item.style, include_base64=bool(item.encode_as_base64))
+                return TTSBatchItem(index=index, elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+                                    **dict(result))
+            except MurfError as e:
+                log.warning("tts.batch_item_failed", index=index, voice_id=voice_id, status=e.status_code, error=e.detail)
+                return TTSBatchItem(index=index, elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+                                    error=e.detail, status_code=e.status_code)
+
+    keys = [(clip_key(item, voice_id), bool(item.encode_as_base64)) for item, voice_id in zip(items, voice_ids)]
+    first: Dict[tuple, int] = {}
+    for index, key in enumerate(keys):
+        first.setdefault(key, index)
+    with span("tts", "batch", items=len(items), unique=len(first)):
+        done = await asyncio.gather(*(run(index, items[index], voice_ids[index]) for index in first.values()))
+    results = dict(zip(first.values(), done))
+
+    batch = []
+    for index, key in enumerate(keys):
+        origin = first[key]
+        if origin == index:
+            batch.append(results[index])
+        else:
+            result = results[origin]
+            batch.append(result.model_copy(update={
+                "index": index, "duplicate_of": origin, "elapsed_ms": 0.0,
+                "meta": result.meta.model_copy(update={"consumed_chars": 0}),
+            }))
+    return batch
+
+def concatenate_clips(keys: List[str], format: str) -> Tuple[str, CachedAudio]:
+    """
+    Joins stored clips, in order, into one clip in the audio store, keyed by the clips it is made
+    of. Raises ValueError if a clip is gone or the clips can't be joined.
+    """
+    store = get_audio_store()
+    entries = [store.get(key) for key in keys]
+    if any(entry is None for entry in entries):
+        raise ValueError("A clip was evicted before it could be joined")
+    lengths = [entry.length_seconds for entry in entries]
+    audio = concatenate_audio([entry.audio for entry in entries], format)
+    key = hashlib.sha256("\x1f".join(["concat", *keys]).encode("utf-8")).hexdigest()
+    return key, store.put(key, audio, format, 0, None if None in lengths else round(sum(lengths), 3))
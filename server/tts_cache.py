@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from pydantic import BaseModel
+
+from config import TTS_CACHE_ENABLED, TTS_CACHE_DIR, TTS_CACHE_MEMORY_MB, TTS_CACHE_DISK_MB, TTS_CACHE_TTL_SECONDS
+
+AUDIO_MIME_TYPES = {
+    "MP3": "audio/mpeg",
+    "WAV": "audio/wav",
+    "FLAC": "audio/flac",
+    "OGG": "audio/ogg",
+    "PCM": "audio/pcm",
+    "ALAW": "audio/x-alaw-basic",
+    "ULAW": "audio/basic",
+}
+
+class CachedAudio(BaseModel):
+    audio: bytes
+    format: str
+    consumed_chars: int = 0
+    length_seconds: Optional[float] = None
+    created_at: float
+
+    @property
+    def mime_type(self) -> str:
+        return AUDIO_MIME_TYPES.get(self.format, "application/octet-stream")
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC, trimmed, single-spaced."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def tts_cache_key(text: str, voice_id: str, format: str, sample_rate: Optional[int], style: Optional[str]) -> str:
+    """Content address of a synthesized clip."""
+    parts = [normalize_text(text), voice_id, (format or "MP3").upper(), str(sample_rate or ""), style or ""]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+class TTSCache:
+    """
+    Two-tier audio cache. Hot clips live in an in-memory LRU bounded by bytes; every clip is
+    also written to `directory` as `<key>.audio` plus a `<key>.json` sidecar, which is
+    bounded by total size and expires entries older than `ttl_seconds`. Without a directory
+    only the memory tier is used.
+    """
+
+    def __init__(self, directory: Optional[str], memory_max_bytes: int, disk_max_bytes: int, ttl_seconds: float):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, CachedAudio]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_sizes: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes, oldest first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.chars_saved = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_disk_index()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return base + ".audio", base + ".json"
+
+    def _load_disk_index(self):
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".audio"):
+                continue
+            key = name[:-len(".audio")]
+            stat = os.stat(os.path.join(self.directory, name))
+            if now - stat.st_mtime > self.ttl_seconds:
+                self._drop_from_disk(key)
+                continue
+            entries.append((stat.st_mtime, key, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk_sizes[key] = size
+            self._disk_bytes += size
+
+    def _remember(self, key: str, entry: CachedAudio):
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key).audio)
+        if len(entry.audio) > self.memory_max_bytes:
+            return
+        self._memory[key] = entry
+        self._memory_bytes += len(entry.audio)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.audio)
+
+    def _drop_from_disk(self, key: str):
+        self._disk_bytes -= self._disk_sizes.pop(key, 0)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _read_from_disk(self, key: str) -> Optional[CachedAudio]:
+        audio_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(audio_path, "rb") as f:
+                audio = f.read()
+        except (FileNotFoundError, ValueError):
+            self._drop_from_disk(key)
+            return None
+        return CachedAudio(audio=audio, **meta)
+
+    def _expired(self, entry: CachedAudio) -> bool:
+        return time.time() - entry.created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[CachedAudio]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            elif key in self._disk_sizes:
+                entry = self._read_from_disk(key)
+                if entry is not None:
+                    self._remember(key, entry)
+
+            if entry is not None and self._expired(entry):
+                dropped = self._memory.pop(key, None)
+                if dropped is not None:
+                    self._memory_bytes -= len(dropped.audio)
+                self._drop_from_disk(key)
+                entry = None
+            return entry
+
+    def contains(self, key: str) -> bool:
+        """True if the clip is stored in either tier, without loading it or counting a lookup."""
+        with self._lock:
+            return key in self._memory or key in self._disk_sizes
+
+    def lookup(self, key: str) -> Optional[CachedAudio]:
+        """Like `get`, but counts the hit or miss and the Murf characters a hit saved."""
+        return self._count(self.get(key))
+
+    async def alookup(self, key: str) -> Optional[CachedAudio]:
+        """`lookup` for the event loop: fresh memory hits are answered inline, anything else runs in a thread."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry):
+                self._memory.move_to_end(key)
+            elif entry is not None or key in self._disk_sizes:
+                entry = None  # a disk read, or removing an expired clip from disk
+            else:
+                self.misses += 1
+                return None
+        if entry is None:
+            return await asyncio.to_thread(self.lookup, key)
+        return self._count(entry)
+
+    def _count(self, entry: Optional[CachedAudio]) -> Optional[CachedAudio]:
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.chars_saved += entry.consumed_chars
+        return entry
+
+    def put(self, key: str, audio: bytes, format: str, consumed_chars: int = 0,
+            length_seconds: Optional[float] = None) -> CachedAudio:
+        entry = CachedAudio(audio=audio, format=format.upper(), consumed_chars=consumed_chars or 0,
+                            length_seconds=length_seconds, created_at=time.time())
+        with self._lock:
+            self._remember(key, entry)
+            if not self.directory:
+                return entry
+            audio_path, meta_path = self._paths(key)
+            tmp_path = audio_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, audio_path)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(entry.model_dump(exclude={"audio"}), f)
+
+            self._disk_bytes -= self._disk_sizes.pop(key, 0)
+            self._disk_sizes[key] = len(audio)
+            self._disk_bytes += len(audio)
+            while self._disk_bytes > self.disk_max_bytes and len(self._disk_sizes) > 1:
+                oldest = next(iter(self._disk_sizes))
+                self._drop_from_disk(oldest)
+        return entry
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "consumed_chars_saved": self.chars_saved,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk_sizes),
+                "disk_bytes": self._disk_bytes,
+            }
+
+_tts_cache: Optional[TTSCache] = None
+_audio_store: Optional[TTSCache] = None
+
+def get_tts_cache() -> Optional[TTSCache]:
+    """Returns the process-wide TTS cache, or None when caching is disabled."""
+    global _tts_cache
+    if not TTS_CACHE_ENABLED:
+        return None
+    if _tts_cache is None:
+        _tts_cache = TTSCache(
+            directory=TTS_CACHE_DIR,
+            memory_max_bytes=TTS_CACHE_MEMORY_MB * 1024 * 1024,
+            disk_max_bytes=TTS_CACHE_DISK_MB * 1024 * 1024,
+            ttl_seconds=TTS_CACHE_TTL_SECONDS,
+        )
+    return _tts_cache
+
+def get_audio_store() -> TTSCache:
+    """
+    Where synthesized audio is kept for the /audio/{id} route: the TTS cache, or with caching
+    disabled a memory-only store that is written to but never looked up for reuse.
+    """
+    global _audio_store
+    cache = get_tts_cache()
+    if cache is not None:
+        return cache
+    if _audio_store is None:
+        _audio_store = TTSCache(
+            directory=None,
+            memory_max_bytes=TTS_CACHE_MEMORY_MB * 1024 * 1024,
+            disk_max_bytes=0,
+            ttl_seconds=TTS_CACHE_TTL_SECONDS,
+        )
+    return _audio_store
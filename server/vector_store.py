@@ -1,88 +1,295 @@
-from pinecone import Pinecone, ServerlessSpec
-from config import PINECONE_API_KEY, PINECONE_INDEX_NAME, PINECONE_EMBEDDING_DIMENSION, embeddings_model
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
+import numpy as np
+from admission import upstream_sync
+from config import (
+    PINECONE_API_KEY, PINECONE_INDEX_NAME, PINECONE_INDEX_HOST, PINECONE_EMBEDDING_DIMENSION,
+    VECTOR_STORE_BACKEND, LOCAL_INDEX_DIR, LOCAL_INDEX_MMAP, require_api_key,
+)
 
-def get_pinecone_index():
-    """Gets the Pinecone index, creating it if it doesn't exist."""
-    existing_indexes = [index_info["name"] for index_info in pc.list_indexes()]
-
-    if PINECONE_INDEX_NAME in existing_indexes:
-        index_description = pc.describe_index(PINECONE_INDEX_NAME)
-        if index_description.dimension != PINECONE_EMBEDDING_DIMENSION:
-            print(f"Index '{PINECONE_INDEX_NAME}' exists but has wrong dimension. Deleting and recreating...")
-            pc.delete_index(PINECONE_INDEX_NAME)
-            existing_indexes.remove(PINECONE_INDEX_NAME)
-        else:
-            print(f"Index '{PINECONE_INDEX_NAME}' already exists with correct dimension.")
-
-    if PINECONE_INDEX_NAME not in existing_indexes:
-        print(f"Creating index '{PINECONE_INDEX_NAME}'...")
-        pc.create_index(
-            name=PINECONE_INDEX_NAME,
-            dimension=PINECONE_EMBEDDING_DIMENSION,
-            metric="cosine",
-            spec=ServerlessSpec(cloud="aws", region="us-east-1")
-        )
-        print("Index created successfully.")
+NAMESPACE = "mobiles"
+PINECONE_FETCH_BATCH_SIZE = 100
+
+# (id, embedding, metadata) — the same tuple shape Pinecone's upsert accepts.
+VectorRecord = Tuple[str, Sequence[float], Dict[str, Any]]
 
+def get_pinecone_index():
+    """
+    Connects to the existing Pinecone index. Creating or resizing it is an explicit admin step
+    (`python admin.py provision-index`), never a side effect of starting the server.
+    """
+    from pinecone import Pinecone
+    pc = Pinecone(api_key=require_api_key("PINECONE_API_KEY", PINECONE_API_KEY))
+    if PINECONE_INDEX_HOST:
+        return pc.Index(host=PINECONE_INDEX_HOST)
     return pc.Index(PINECONE_INDEX_NAME)
 
-index = get_pinecone_index()
-
-def populate_pinecone_data():
-    """Populates the Pinecone index with sample data if it's empty."""
-    if index.describe_index_stats()['total_vector_count'] > 0:
-        print("Pinecone index already populated.")
-        return
-
-    sample_data = [
-        {
-            "ID": "mobile_13", "Allowed Discount": 11490, "Back Camera": "200MP + 12MP", "Capacity": 256,
-            "Company Name": "Samsung", "Front Camera": "12MP", "Max Price": 114900, "Model Name": "Galaxy S24 Ultra",
-            "Processor": "Exynos 2400", "Screen Size": "6.8 inches", "Text": "Best for: Power users, professionals, creatives, and tech enthusiasts. Ideal use cases: Advanced photography, AI-powered productivity, intense gaming, and seamless multitasking. The ultimate flagship experience.",
-            "battery": 5000, "ram": 12, "weight": 234, "image_url": "https://encrypted-tbn3.gstatic.com/shopping?q=tbn:ANd9GcQjRC4B-YE6Tob3Wo6MyfNuGN_UD_hbiVjEtiuXOP8QD8wjMuwaacNFj-j8kczPFu5r5muYtCPj8uv8eofKdtRZVSduwkPJRCu4blgSnHlb3Au3M9ceKtu1"
-        },
-        {
-            "ID": "mobile_12", "Allowed Discount": 10490, "Back Camera": "200MP + 12MP", "Capacity": 128,
-            "Company Name": "Samsung", "Front Camera": "12MP", "Max Price": 104900, "Model Name": "Galaxy S24 Ultra",
-            "Processor": "Exynos 2400", "Screen Size": "6.8 inches", "Text": "A great choice for users who want flagship features without needing maximum storage. Excellent for photography, productivity, and gaming.",
-            "battery": 5000, "ram": 12, "weight": 234, "image_url": "https://encrypted-tbn2.gstatic.com/shopping?q=tbn:ANd9GcTXsIZMb8mqsC9gLv7NE1jxARGzcl5u-JVhSPLj-_NOneEKBc5pUYJS9bPNrQyo28FAQ4HDBcnn4ieAYqCQBmy_fp0txQfaHMNTpaRTUzw"
-        },
-        {
-            "ID": "mobile_11", "Allowed Discount": 8990, "Back Camera": "50MP + 10MP + 12MP", "Capacity": 256,
-            "Company Name": "Apple", "Front Camera": "12MP", "Max Price": 89900, "Model Name": "iPhone 15 Pro",
-            "Processor": "A17 Bionic", "Screen Size": "6.1 inches", "Text": "Experience the cutting-edge technology of the iPhone 15 Pro. Perfect for photography, gaming, and everyday use with its powerful A17 Bionic chip.",
-            "battery": 3274, "ram": 8, "weight": 187, "image_url": "https://encrypted-tbn1.gstatic.com/shopping?q=tbn:ANd9GcTmgrTk_YGyhmv076-ncdBE6mSC_Pps0NOZ5vogCvwmXD9SJ8Vtlfb1Yymsv5XsfNDCzfK3VD-mbbBykNGlLMgi-GsNDe6ArRVpBuaeEN7nyQwyqu1n_dSsBWU"
-        },
-        {
-            "ID": "mobile_10", "Allowed Discount": 7990, "Back Camera": "50MP + 10MP + 12MP", "Capacity": 128,
-            "Company Name": "Apple", "Front Camera": "12MP", "Max Price": 79900, "Model Name": "iPhone 15 Pro",
-            "Processor": "A17 Bionic", "Screen Size": "6.1 inches", "Text": "The iPhone 15 Pro offers exceptional performance and a stunning camera system. Ideal for users who value premium design and seamless iOS experience.",
-            "battery": 3274, "ram": 8, "weight": 187, "image_url": "https://encrypted-tbn1.gstatic.com/shopping?q=tbn:ANd9GcSTf7pCJv_EprbPSkDZg83ozZRum63GCOxr7leiNbGZZkuqXY5B-ca2qRaXlcIyh35FcNKF3UibrZihj5kgqdXWEvTqstr_6w"
-        },
-        {
-            "ID": "mobile_09", "Allowed Discount": 5990, "Back Camera": "50MP + 12MP", "Capacity": 128,
-            "Company Name": "Google", "Front Camera": "10.8MP", "Max Price": 59900, "Model Name": "Pixel 8",
-            "Processor": "Google Tensor G3", "Screen Size": "6.2 inches", "Text": "Discover the intelligence of Google Pixel 8. Featuring advanced AI capabilities, incredible camera, and a pure Android experience.",
-            "battery": 4575, "ram": 8, "weight": 187, "image_url": "https://lh3.googleusercontent.com/0udrEfNYmIpHmSaNU6fWHp3S0YJ4faYdDghUveqZxK4CfJB54EqAuQhJ9KLzY8q0xtRIBFLAQNKPnongqMjW5ry9p4KMpE6Ay7c=s6000-w6000-e365-rw-v0-nu"
-        },
-        {
-            "ID": "mobile_08", "Allowed Discount": 6990, "Back Camera": "50MP + 48MP + 12MP", "Capacity": 256,
-            "Company Name": "Google", "Front Camera": "10.8MP", "Max Price": 69900, "Model Name": "Pixel 8 Pro",
-            "Processor": "Google Tensor G3", "Screen Size": "6.7 inches", "Text": "The Pixel 8 Pro delivers the ultimate Google experience with its pro-level camera, powerful Tensor G3 chip, and stunning display.",
-            "battery": 5050, "ram": 12, "weight": 213, "image_url": "https://lh3.googleusercontent.com/Bk-0c89qThGdgx75jEyOMs-0fwHpyx--gs8a8dsuwFdxrl9pZXj-2V-0TDOBTdQc9kRYOq9TLojjVddEzzY25MQB3eQEIg3bAOo=s6000-w6000-e365-rw-v0-nu"
-        },
-    ]
-
-    vectors_to_upsert = []
-    for item in sample_data:
-        embedding = embeddings_model.embed_query(item['Text'])
-        metadata = {k: v for k, v in item.items() if k not in ['ID', 'Text']}
-        metadata['Text'] = item['Text']
-        vectors_to_upsert.append((item['ID'], embedding, metadata))
-
-    if vectors_to_upsert:
-        print("Upserting sample data to Pinecone...")
-        index.upsert(vectors=vectors_to_upsert, namespace="mobiles")
-        print("Sample data successfully upserted.")
\ No newline at end of file
+class PineconeVectorStore:
+    """Vector store backed by a hosted Pinecone index."""
+
+    def __init__(self):
+        self.index = get_pinecone_index()
+
+    def query(self, vector: Sequence[float], top_k: int, filter: Optional[dict] = None) -> List[dict]:
+        with upstream_sync("pinecone"):
+            results = self.index.query(vector=list(vector), top_k=top_k, include_metadata=True,
+                                       namespace=NAMESPACE, filter=filter)
+        return [
+            {"id": match.get("id"), "score": match.get("score"), "metadata": match.get("metadata", {})}
+            for match in results["matches"]
+        ]
+
+    def upsert(self, vectors: List[VectorRecord]):
+        with upstream_sync("pinecone"):
+            self.index.upsert(vectors=[(i, list(v), m) for i, v, m in vectors], namespace=NAMESPACE)
+
+    def count(self) -> int:
+        stats = self.index.describe_index_stats()
+        namespace = stats.get("namespaces", {}).get(NAMESPACE)
+        return namespace["vector_count"] if namespace else stats["total_vector_count"]
+
+    def list_ids(self) -> Iterator[str]:
+        for page in self.index.list(namespace=NAMESPACE):
+            yield from page
+
+    def fetch_metadata(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        metadata = {}
+        for start in range(0, len(ids), PINECONE_FETCH_BATCH_SIZE):
+            with upstream_sync("pinecone"):
+                response = self.index.fetch(ids=list(ids[start:start + PINECONE_FETCH_BATCH_SIZE]), namespace=NAMESPACE)
+            for vector_id, vector in response.vectors.items():
+                metadata[vector_id] = vector.metadata or {}
+        return metadata
+
+    def delete(self, ids: Sequence[str]):
+        for start in range(0, len(ids), PINECONE_FETCH_BATCH_SIZE):
+            with upstream_sync("pinecone"):
+                self.index.delete(ids=list(ids[start:start + PINECONE_FETCH_BATCH_SIZE]), namespace=NAMESPACE)
+
+    def flush(self):
+        """Writes are durable as soon as Pinecone acknowledges them."""
+
+class LocalVectorStore:
+    """
+    In-process vector store. Embeddings are kept L2-normalized in one contiguous float32
+    matrix (optionally memory-mapped from `embeddings.npy`), so cosine similarity is a single
+    matrix-vector product and top-k is an `argpartition`. Metadata lives in `metadata.json`
+    and is mirrored into per-field column arrays for vectorized Pinecone-style filters.
+    Writes are buffered in memory and applied in one step; call `flush()` to persist them.
+    """
+
+    def __init__(self, directory: str, mmap: bool = False, dimension: int = PINECONE_EMBEDDING_DIMENSION):
+        self.directory = directory
+        self.mmap = mmap
+        self.dimension = dimension
+        self.ids: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.matrix = np.zeros((0, dimension), dtype=np.float32)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._positions: Dict[str, int] = {}
+        self._pending_rows: List[np.ndarray] = []
+        self._columns_stale = False
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._load()
+
+    @property
+    def _matrix_path(self) -> str:
+        return os.path.join(self.directory, "embeddings.npy")
+
+    @property
+    def _metadata_path(self) -> str:
+        return os.path.join(self.directory, "metadata.json")
+
+    def _load(self):
+        if not (os.path.exists(self._matrix_path) and os.path.exists(self._metadata_path)):
+            return
+        with open(self._metadata_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        self.ids = [r["id"] for r in records]
+        self.metadata = [r["metadata"] for r in records]
+        self.matrix = np.load(self._matrix_path, mmap_mode="r" if self.mmap else None)
+        self._positions = {vector_id: row for row, vector_id in enumerate(self.ids)}
+        self._build_columns()
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        np.save(self._matrix_path, self.matrix)
+        with open(self._metadata_path, "w", encoding="utf-8") as f:
+            json.dump([{"id": i, "metadata": m} for i, m in zip(self.ids, self.metadata)], f, ensure_ascii=False)
+        if self.mmap:
+            self.matrix = np.load(self._matrix_path, mmap_mode="r")
+
+    def _build_columns(self):
+        """Precomputes one array per metadata field: float64 (NaN = missing) or object."""
+        fields = {key for m in self.metadata for key in m}
+        columns = {}
+        for field in fields:
+            values = [m.get(field) for m in self.metadata]
+            present = [v for v in values if v is not None]
+            if present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+                columns[field] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                columns[field] = np.array(values, dtype=object)
+        columns["id"] = np.array(self.ids, dtype=object)
+        self._columns = columns
+
+    def _condition_mask(self, field: str, condition: Any) -> np.ndarray:
+        column = self._columns.get(field)
+        if column is None:
+            return np.zeros(len(self.ids), dtype=bool)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        mask = np.ones(len(self.ids), dtype=bool)
+        for op, value in condition.items():
+            if op == "$eq":
+                mask &= column == value
+            elif op == "$ne":
+                mask &= column != value
+            elif op == "$gt":
+                mask &= column > value
+            elif op == "$gte":
+                mask &= column >= value
+            elif op == "$lt":
+                mask &= column < value
+            elif op == "$lte":
+                mask &= column <= value
+            elif op == "$in":
+                mask &= np.isin(column, list(value))
+            elif op == "$nin":
+                mask &= ~np.isin(column, list(value))
+            else:
+                raise ValueError(f"Unsupported filter operator '{op}'")
+        return mask
+
+    def filter_mask(self, filter: Optional[dict]) -> np.ndarray:
+        """Evaluates a Pinecone-style metadata filter into a boolean row mask."""
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, condition in (filter or {}).items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self.filter_mask(clause)
+            elif key == "$or":
+                any_mask = np.zeros(len(self.ids), dtype=bool)
+                for clause in condition:
+                    any_mask |= self.filter_mask(clause)
+                mask &= any_mask
+            else:
+                mask &= self._condition_mask(key, condition)
+        return mask
+
+    def _materialize(self):
+        """Folds buffered new rows into the matrix and refreshes the column arrays."""
+        with self._lock:
+            if self._pending_rows:
+                self.matrix = np.ascontiguousarray(np.vstack([self.matrix, np.stack(self._pending_rows)]))
+                self._pending_rows = []
+                self._columns_stale = True
+            if self._columns_stale:
+                self._build_columns()
+                self._columns_stale = False
+
+    def query(self, vector: Sequence[float], top_k: int, filter: Optional[dict] = None) -> List[dict]:
+        with self._lock:
+            self._materialize()
+            if not self.ids or top_k <= 0:
+                return []
+            query = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm:
+                query = query / norm
+            if filter:
+                # Filter first so only matching rows are scored.
+                candidates = np.flatnonzero(self.filter_mask(filter))
+                scores = self.matrix[candidates] @ query
+            else:
+                candidates = None
+                scores = self.matrix @ query
+
+            k = min(top_k, len(scores))
+            if k == 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            rows = candidates[top] if candidates is not None else top
+            return [
+                {"id": self.ids[row], "score": float(scores[pos]), "metadata": self.metadata[row]}
+                for row, pos in zip(rows, top)
+            ]
+
+    def upsert(self, vectors: List[VectorRecord]):
+        with self._lock:
+            for vector_id, embedding, metadata in vectors:
+                row = np.asarray(embedding, dtype=np.float32)
+                norm = np.linalg.norm(row)
+                if norm:
+                    row = row / norm
+                position = self._positions.get(vector_id)
+                if position is None:
+                    self._positions[vector_id] = len(self.ids)
+                    self.ids.append(vector_id)
+                    self.metadata.append(metadata)
+                    self._pending_rows.append(row)
+                    continue
+                if position >= len(self.matrix):
+                    self._pending_rows[position - len(self.matrix)] = row
+                else:
+                    if not self.matrix.flags.writeable:
+                        self.matrix = np.array(self.matrix, dtype=np.float32)  # copy out of the read-only mmap
+                    self.matrix[position] = row
+                self.metadata[position] = metadata
+                self._columns_stale = True
+            self._dirty = self._dirty or bool(vectors)
+
+    def delete(self, ids: Sequence[str]):
+        with self._lock:
+            self._materialize()
+            doomed = {vector_id for vector_id in ids if vector_id in self._positions}
+            if not doomed:
+                return
+            keep = [row for row, vector_id in enumerate(self.ids) if vector_id not in doomed]
+            self.ids = [self.ids[row] for row in keep]
+            self.metadata = [self.metadata[row] for row in keep]
+            self.matrix = np.ascontiguousarray(self.matrix[keep], dtype=np.float32)
+            self._positions = {vector_id: row for row, vector_id in enumerate(self.ids)}
+            self._build_columns()
+            self._dirty = True
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def list_ids(self) -> Iterator[str]:
+        return iter(list(self.ids))
+
+    def fetch_metadata(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {vector_id: self.metadata[self._positions[vector_id]]
+                    for vector_id in ids if vector_id in self._positions}
+
+    def flush(self):
+        with self._lock:
+            self._materialize()
+            if self._dirty:
+                self._save()
+                self._dirty = False
+
+_vector_store = None
+_vector_store_lock = threading.Lock()
+
+def get_vector_store():
+    """Returns the configured vector store backend ("pinecone" or "local"), created on first use."""
+    global _vector_store
+    if _vector_store is None:
+        # Seeding, tool calls and readiness probes race for the first instance from different threads.
+        with _vector_store_lock:
+            if _vector_store is None:
+                if VECTOR_STORE_BACKEND == "local":
+                    _vector_store = LocalVectorStore(LOCAL_INDEX_DIR, mmap=LOCAL_INDEX_MMAP)
+                elif VECTOR_STORE_BACKEND == "pinecone":
+                    _vector_store = PineconeVectorStore()
+                else:
+                    raise ValueError(f"Unknown VECTOR_STORE_BACKEND '{VECTOR_STORE_BACKEND}' (expected 'pinecone' or 'local')")
+    return _vector_store